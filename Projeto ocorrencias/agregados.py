@@ -0,0 +1,218 @@
+import os
+import sys
+import sqlite3
+from datetime import date, timedelta
+
+from arquivamento import anexar_arquivo, arquivo_disponivel
+
+# Agregados diários para os gráficos do painel (/admin/api/analytics).
+#
+# A tabela `rollup_diario` (migração 013) tem uma linha por dia e categoria
+# com as ocorrências abertas, as resoluções e as primeiras respostas do dia,
+# mais a soma dos tempos (em segundos) para as médias. Triggers a mantêm em
+# cada escrita; uma consulta de intervalo lê no máximo dias x categorias
+# linhas, sem tocar em ocorrencias/respostas/historico_status.
+#
+# Cada evento conta no dia em que aconteceu (datas em UTC, como o
+# CURRENT_TIMESTAMP do SQLite): a abertura pela data da ocorrência, a
+# resolução pela mudança para Resolvido no histórico (uma reabertura
+# resolvida de novo conta outra vez) e a primeira resposta gravada pela
+# data dela. O arquivamento não mexe nos agregados; a reconstrução inclui
+# o arquivo.
+
+GRANULARIDADES = ('dia', 'semana')
+INTERVALO_MAXIMO = 3660     # dias por consulta
+INTERVALO_PADRAO = 30
+
+COLUNAS = ('abertas', 'resolvidas', 'primeiras_respostas', 'soma_resolucao', 'soma_primeira_resposta')
+
+
+def _fontes(conn):
+    """SQL das tabelas de origem: o principal, mais o arquivo quando anexado"""
+    if not arquivo_disponivel(conn):
+        return {'ocorrencias': 'main.ocorrencias', 'respostas': 'main.respostas',
+                'historico_status': 'main.historico_status'}
+    # Uma ocorrência no meio do arquivamento está nos dois bancos: vale a do principal
+    fontes = {}
+    for tabela, colunas, chave in (
+            ('ocorrencias', 'id, categoria, data', 'id'),
+            ('respostas', 'id, ocorrencia_id, data_resposta', 'ocorrencia_id'),
+            ('historico_status', 'ocorrencia_id, status_anterior, status_novo, data_mudanca', 'ocorrencia_id')):
+        fontes[tabela] = f'''(
+            SELECT {colunas} FROM main.{tabela}
+            UNION ALL
+            SELECT {colunas} FROM arquivo.{tabela}
+            WHERE {chave} NOT IN (SELECT id FROM main.ocorrencias)
+        )'''
+    return fontes
+
+
+def calcular_do_zero(conn):
+    """Recalcula os agregados varrendo as tabelas; retorna {(dia, categoria): {coluna: valor}}"""
+    fontes = _fontes(conn)
+    agregados = {}
+
+    def somar(consulta, colunas):
+        for dia, categoria, *valores in conn.execute(consulta):
+            linha = agregados.setdefault((dia, categoria), dict.fromkeys(COLUNAS, 0))
+            for coluna, valor in zip(colunas, valores):
+                linha[coluna] += valor or 0
+
+    somar(f'''
+        SELECT COALESCE(date(data), date('now')), categoria, COUNT(*)
+        FROM {fontes['ocorrencias']} GROUP BY 1, 2
+    ''', ('abertas',))
+
+    somar(f'''
+        SELECT COALESCE(date(h.data_mudanca), date('now')), o.categoria, COUNT(*),
+               SUM(COALESCE((julianday(h.data_mudanca) - julianday(o.data)) * 86400, 0))
+        FROM {fontes['historico_status']} h
+        JOIN {fontes['ocorrencias']} o ON o.id = h.ocorrencia_id
+        WHERE h.status_novo = 'Resolvido' AND h.status_anterior IS NOT 'Resolvido'
+        GROUP BY 1, 2
+    ''', ('resolvidas', 'soma_resolucao'))
+
+    somar(f'''
+        SELECT COALESCE(date(p.primeira), date('now')), o.categoria, COUNT(*),
+               SUM(COALESCE((julianday(p.primeira) - julianday(o.data)) * 86400, 0))
+        FROM (
+            -- A primeira gravada (menor id), como no trigger
+            SELECT ocorrencia_id, data_resposta AS primeira
+            FROM {fontes['respostas']}
+            WHERE id IN (SELECT MIN(id) FROM {fontes['respostas']} GROUP BY ocorrencia_id)
+        ) p
+        JOIN {fontes['ocorrencias']} o ON o.id = p.ocorrencia_id
+        GROUP BY 1, 2
+    ''', ('primeiras_respostas', 'soma_primeira_resposta'))
+
+    return agregados
+
+
+def reconstruir_agregados(conn):
+    """Substitui o conteúdo de `rollup_diario` pelo recálculo completo (backfill).
+
+    Não faz commit: quem chama decide a transação.
+    """
+    agregados = calcular_do_zero(conn)
+    conn.execute('DELETE FROM rollup_diario')
+    conn.executemany(
+        f'''INSERT INTO rollup_diario (dia, categoria, {', '.join(COLUNAS)})
+            VALUES (?, ?, {', '.join('?' * len(COLUNAS))})''',
+        [(dia, categoria, *(valores[coluna] for coluna in COLUNAS))
+         for (dia, categoria), valores in agregados.items()]
+    )
+    return agregados
+
+
+def _iguais(a, b):
+    # Somas de tempo em ponto flutuante: diferença abaixo de um segundo não conta
+    return all(abs(a.get(coluna, 0) - b.get(coluna, 0)) < 1 for coluna in COLUNAS)
+
+
+def verificar_agregados(conn, corrigir=True):
+    """Compara `rollup_diario` com o recálculo; retorna as chaves divergentes.
+
+    Com corrigir=True reconstrói a tabela quando houver divergência.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        armazenados = {
+            (linha[0], linha[1]): dict(zip(COLUNAS, linha[2:]))
+            for linha in conn.execute(f"SELECT dia, categoria, {', '.join(COLUNAS)} FROM rollup_diario")
+        }
+        reais = calcular_do_zero(conn)
+        divergencias = sorted(
+            chave for chave in set(armazenados) | set(reais)
+            if not _iguais(armazenados.get(chave, {}), reais.get(chave, {}))
+        )
+        if divergencias and corrigir:
+            reconstruir_agregados(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return divergencias
+
+
+# ---------- consulta ----------
+
+def _periodo(dia, granularidade):
+    if granularidade == 'semana':
+        return dia - timedelta(days=dia.weekday())   # segunda-feira da semana
+    return dia
+
+
+def _medias(valores):
+    """Totais do bucket com os tempos médios em horas"""
+    def media(soma, quantidade):
+        return round(soma / quantidade / 3600, 2) if quantidade else None
+    return {
+        'abertas': valores['abertas'],
+        'resolvidas': valores['resolvidas'],
+        'primeiras_respostas': valores['primeiras_respostas'],
+        'horas_ate_primeira_resposta': media(valores['soma_primeira_resposta'], valores['primeiras_respostas']),
+        'horas_ate_resolucao': media(valores['soma_resolucao'], valores['resolvidas']),
+    }
+
+
+def consultar(conn, inicio, fim, granularidade='dia', categoria=None, por_categoria=False):
+    """Série de `inicio` a `fim` (datas, inclusive) por dia ou semana, com zeros nos buracos"""
+    condicoes, parametros = ['dia BETWEEN ? AND ?'], [inicio.isoformat(), fim.isoformat()]
+    if categoria:
+        condicoes.append('categoria = ?')
+        parametros.append(categoria)
+
+    buckets = {}
+    categorias = {}
+    totais = dict.fromkeys(COLUNAS, 0)
+    for dia, cat, *valores in conn.execute(f'''
+        SELECT dia, categoria, {', '.join(COLUNAS)} FROM rollup_diario
+        WHERE {' AND '.join(condicoes)}
+    ''', parametros):
+        periodo = _periodo(date.fromisoformat(dia), granularidade)
+        chave = (periodo, cat if por_categoria else None)
+        for destino in (buckets.setdefault(chave, dict.fromkeys(COLUNAS, 0)),
+                        categorias.setdefault(cat, dict.fromkeys(COLUNAS, 0)), totais):
+            for coluna, valor in zip(COLUNAS, valores):
+                destino[coluna] += valor
+
+    passo = timedelta(days=7 if granularidade == 'semana' else 1)
+    nomes = sorted(categorias) if por_categoria else [None]
+    series = []
+    periodo = _periodo(inicio, granularidade)
+    while periodo <= fim:
+        for nome in nomes:
+            item = {'periodo': periodo.isoformat()}
+            if por_categoria:
+                item['categoria'] = nome
+            item.update(_medias(buckets.get((periodo, nome), dict.fromkeys(COLUNAS, 0))))
+            series.append(item)
+        periodo += passo
+
+    return {
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'granularidade': granularidade,
+        'series': series,
+        'por_categoria': [{'categoria': nome, **_medias(valores)} for nome, valores in sorted(categorias.items())],
+        'totais': _medias(totais),
+    }
+
+
+if __name__ == '__main__':
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'database/ocorrencias.db'
+    print(f"🔍 Verificando agregados diários em {db_path}...")
+
+    conn = sqlite3.connect(db_path)
+    arquivo = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(db_path), 'arquivo.db')
+    if os.path.exists(arquivo):
+        anexar_arquivo(conn, arquivo)
+    divergencias = verificar_agregados(conn)
+    conn.close()
+
+    if divergencias:
+        for dia, categoria in divergencias[:20]:
+            print(f"  ⚠️ {dia} {categoria}")
+        print(f"🔧 {len(divergencias)} dia(s)/categoria(s) reconstruído(s)")
+    else:
+        print("✅ Agregados consistentes")
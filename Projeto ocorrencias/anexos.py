@@ -0,0 +1,177 @@
+import os
+import re
+import hashlib
+import mimetypes
+import tempfile
+
+from flask import Request
+from werkzeug.utils import secure_filename
+
+# Anexos endereçados por conteúdo: o arquivo fica em <raiz>/<aa>/<bb>/<sha256><ext>
+# e conteúdo repetido reaproveita o arquivo já existente. Os metadados ficam
+# na tabela `anexos` (migração 008) e ocorrencias/respostas guardam o caminho
+# relativo.
+#
+# Com a classe de requisição de classe_requisicao(), o Werkzeug escreve cada
+# arquivo do multipart direto em <raiz>/tmp por um ArquivoRecebido, que calcula
+# o SHA-256 enquanto o corpo chega: o upload vai ao disco uma vez só e salvar()
+# apenas renomeia o temporário.
+
+TAMANHO_BLOCO = 64 * 1024
+
+ANEXO_ENDERECADO = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.\w+)?$')
+
+
+def sha_do_anexo(caminho):
+    """SHA-256 de um anexo endereçado por conteúdo, ou None para anexos antigos"""
+    encontrado = ANEXO_ENDERECADO.match(caminho or '')
+    return encontrado.group(1) if encontrado else None
+
+
+class AnexoInvalido(ValueError):
+    """Erro de validação do upload; a mensagem pode ser mostrada ao usuário"""
+
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class ArquivoRecebido:
+    """Destino de um arquivo do multipart: grava no temporário e calcula o hash.
+
+    Passado o limite de tamanho, para de gravar (o corpo continua sendo lido
+    pelo Werkzeug) e salvar() recusa o anexo. Ao fechar, apaga o temporário
+    se ninguém o assumiu com entregar().
+    """
+
+    def __init__(self, pasta, tamanho_maximo):
+        descritor, self.caminho = tempfile.mkstemp(dir=pasta)
+        self._arquivo = os.fdopen(descritor, 'w+b')
+        self._hash = hashlib.sha256()
+        self.tamanho_maximo = tamanho_maximo
+        self.tamanho = 0
+
+    def write(self, dados):
+        self.tamanho += len(dados)
+        if self.tamanho > self.tamanho_maximo:
+            return len(dados)
+        self._hash.update(dados)
+        return self._arquivo.write(dados)
+
+    def __getattr__(self, nome):
+        # read/seek/tell/readline... do FileStorage vão para o arquivo
+        return getattr(self._arquivo, nome)
+
+    def entregar(self):
+        """Fecha o arquivo e passa o temporário adiante: (caminho_tmp, sha256, tamanho)"""
+        self._arquivo.close()
+        caminho, self.caminho = self.caminho, None
+        return caminho, self._hash.hexdigest(), self.tamanho
+
+    def close(self):
+        self._arquivo.close()
+        if self.caminho is not None:
+            try:
+                os.unlink(self.caminho)
+            except FileNotFoundError:
+                pass
+            self.caminho = None
+
+
+class ArmazenamentoAnexos:
+    def __init__(self, raiz, tamanho_maximo):
+        self.raiz = raiz
+        self.tamanho_maximo = tamanho_maximo
+        self.pasta_temporaria = os.path.join(raiz, 'tmp')
+        os.makedirs(self.pasta_temporaria, exist_ok=True)
+
+    @staticmethod
+    def caminho_relativo(sha256, extensao):
+        return f"{sha256[:2]}/{sha256[2:4]}/{sha256}{extensao}"
+
+    def caminho_absoluto(self, relativo):
+        return os.path.join(self.raiz, *relativo.split('/'))
+
+    def _grande_demais(self):
+        limite_mb = self.tamanho_maximo // (1024 * 1024)
+        return AnexoInvalido(f'Anexo maior que o limite de {limite_mb} MB', status=413)
+
+    def receber(self):
+        """Destino para o Werkzeug gravar um arquivo do multipart"""
+        return ArquivoRecebido(self.pasta_temporaria, self.tamanho_maximo)
+
+    def classe_requisicao(self):
+        """Request do Flask que grava os uploads direto em `receber()` (app.request_class)"""
+        armazenamento = self
+
+        class RequisicaoComAnexos(Request):
+            def _get_file_stream(self, total_content_length, content_type, filename=None,
+                                 content_length=None):
+                return armazenamento.receber()
+
+        return RequisicaoComAnexos
+
+    def _copiar_com_hash(self, origem):
+        """Copia o fluxo para um temporário; retorna (caminho_tmp, sha256, tamanho)"""
+        hash_conteudo = hashlib.sha256()
+        tamanho = 0
+        descritor, caminho_tmp = tempfile.mkstemp(dir=self.pasta_temporaria)
+        try:
+            with os.fdopen(descritor, 'wb') as destino:
+                while True:
+                    bloco = origem.read(TAMANHO_BLOCO)
+                    if not bloco:
+                        break
+                    tamanho += len(bloco)
+                    if tamanho > self.tamanho_maximo:
+                        raise self._grande_demais()
+                    hash_conteudo.update(bloco)
+                    destino.write(bloco)
+        except BaseException:
+            os.unlink(caminho_tmp)
+            raise
+        return caminho_tmp, hash_conteudo.hexdigest(), tamanho
+
+    def salvar(self, conn, arquivo):
+        """Grava o upload (FileStorage) e registra em `anexos`; retorna o caminho relativo.
+
+        Não faz commit: o registro entra na mesma transação da ocorrência
+        ou resposta que referencia o anexo.
+        """
+        nome_original = secure_filename(arquivo.filename or '') or 'anexo'
+        extensao = os.path.splitext(nome_original)[1].lower()[:10]
+
+        if isinstance(arquivo.stream, ArquivoRecebido):
+            # Já está no disco e com o hash pronto: só falta renomear
+            caminho_tmp, sha256, tamanho = arquivo.stream.entregar()
+            if tamanho > self.tamanho_maximo:
+                os.unlink(caminho_tmp)
+                raise self._grande_demais()
+        else:
+            caminho_tmp, sha256, tamanho = self._copiar_com_hash(arquivo.stream)
+        if tamanho == 0:
+            os.unlink(caminho_tmp)
+            raise AnexoInvalido('Anexo vazio')
+
+        existente = conn.execute('SELECT caminho FROM anexos WHERE sha256 = ?', (sha256,)).fetchone()
+        if existente:
+            os.unlink(caminho_tmp)
+            return existente[0]
+
+        relativo = self.caminho_relativo(sha256, extensao)
+        destino = self.caminho_absoluto(relativo)
+        if os.path.exists(destino):
+            os.unlink(caminho_tmp)
+        else:
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            os.replace(caminho_tmp, destino)
+
+        mime = (mimetypes.guess_type(nome_original)[0]
+                or arquivo.mimetype
+                or 'application/octet-stream')
+
+        conn.execute('''
+            INSERT OR IGNORE INTO anexos (sha256, caminho, tamanho, mime, nome_original)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (sha256, relativo, tamanho, mime, nome_original))
+        return relativo
@@ -1,142 +1,400 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory, session, redirect, url_for
-import sqlite3
+from flask import Flask, Blueprint, current_app, request, jsonify, render_template, send_from_directory, send_file, session, redirect, url_for, g, make_response, Response
 import os
-from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+import math
+import time
+import base64
+import logging
+import re
+import zlib
+import mimetypes
+from functools import wraps
+from datetime import datetime, timedelta
+from werkzeug.security import safe_join
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.middleware.proxy_fix import ProxyFix
+from conexao import PoolConexoes
+from migracoes import aplicar_migracoes, VERSAO_ATUAL
+from eventos import CanalEventos, ler_ultimo_id
+import busca
+import agregados
+import exportacao
+from anexos import ArmazenamentoAnexos, AnexoInvalido, ANEXO_ENDERECADO
+from miniaturas import GeradorMiniaturas
+from ingestao import FilaCheia, FilaIngestao, recuperar_diarios, ticket_valido
+import metricas
+from cache import criar_cache, consultas_cache
+from sessoes import ArmazemSessoes, LimitadorTentativas, conferir_senha, gerar_hash_senha, tentativas_login
+import serializacao
+from compressao import comprimir_resposta, escolher_codificacao
+from estaticos import Manifesto, SUFIXOS
+from arquivamento import (Arquivador, arquivo_anexado, arquivo_disponivel,
+                          garantir_esquema as garantir_esquema_arquivo)
+from estatisticas import STATUS, estatisticas_publicas, estatisticas_admin, verificar_contadores
 
-app = Flask(__name__, static_folder='static')
-app.secret_key = 'sio_admin_secret_key_2025'
-app.config['UPLOAD_FOLDER'] = 'uploads'
+# Serviços do processo (pool, eventos, anexos, miniaturas, ingestão, cache, estáticos,
+# arquivamento, sessões), criados por
+# criar_app(). Cada worker do gunicorn importa o módulo e chama a fábrica
+# uma vez, então cada processo tem o seu próprio pool de conexões.
+pool = None
+canal_eventos = None
+armazenamento = None
+gerador_miniaturas = None
+fila_ingestao = None
+cache_respostas = None
+manifesto_estaticos = None
+arquivador = None
+sessoes_admin = None
+limitador_login = None
 
-# Garante que as pastas existem
-os.makedirs('uploads', exist_ok=True)
-os.makedirs('static', exist_ok=True)
-os.makedirs('database', exist_ok=True)
+SECRET_KEY_PADRAO = 'sio_admin_secret_key_2025'
 
-DB_PATH = 'database/ocorrencias.db'
+rotas = Blueprint('sio', __name__)
+log = logging.getLogger('sio')
+
+def configuracao_padrao():
+    """Configuração lida do ambiente (variáveis SIO_*)"""
+    tamanho_anexo = int(os.environ.get('SIO_ANEXO_MAX_MB', 20)) * 1024 * 1024
+    offload = os.environ.get('SIO_ANEXOS_OFFLOAD', '')
+    return {
+        'SECRET_KEY': os.environ.get('SIO_SECRET_KEY', SECRET_KEY_PADRAO),
+        'DB_PATH': os.environ.get('SIO_DB_PATH', 'database/ocorrencias.db'),
+        'DB_POOL': int(os.environ.get('SIO_DB_POOL', 8)),
+        'UPLOAD_FOLDER': 'uploads',
+        'ANEXO_TAMANHO_MAXIMO': tamanho_anexo,
+        # Rejeita pelo Content-Length antes de ler o corpo; a folga cobre os campos do formulário
+        'MAX_CONTENT_LENGTH': tamanho_anexo + 1024 * 1024,
+        # Entrega de anexos pelo proxy: '' (Flask), 'x-accel' (nginx) ou 'x-sendfile' (Apache/lighttpd)
+        'ANEXOS_OFFLOAD': offload,
+        'ANEXOS_PREFIXO_INTERNO': os.environ.get('SIO_ANEXOS_PREFIXO_INTERNO', '/_anexos/'),
+        'USE_X_SENDFILE': offload == 'x-sendfile',
+        'MINIATURAS_THREADS': int(os.environ.get('SIO_MINIATURAS_THREADS', 2)),
+        # Fluxos SSE abertos ao mesmo tempo por processo; cada um prende uma
+        # thread do servidor, então fique abaixo das threads do worker
+        'SSE_MAXIMO_FLUXOS': int(os.environ.get('SIO_SSE_MAXIMO', 32)),
+        # 'fila': /api/registrar grava num diário e responde com ticket; o
+        # INSERT sai em lote por uma thread escritora (ver ingestao.py).
+        # Com INGESTAO_MAXIMO registros aguardando, o processo responde 503
+        'INGESTAO': os.environ.get('SIO_INGESTAO', ''),
+        'INGESTAO_PASTA': os.environ.get('SIO_INGESTAO_PASTA', 'database/ingestao'),
+        'INGESTAO_MAXIMO': int(os.environ.get('SIO_INGESTAO_MAXIMO', 10000)),
+        # Histogramas por rota/consulta em /metrics; '0' desliga a instrumentação
+        'METRICAS': os.environ.get('SIO_METRICAS', '1') == '1',
+        # Cache das respostas públicas: 'memoria' (por processo), 'arquivo'
+        # (SQLite à parte, compartilhado pelos workers) ou '' para desligar
+        'CACHE': os.environ.get('SIO_CACHE', 'memoria'),
+        'CACHE_TTL': int(os.environ.get('SIO_CACHE_TTL', 60)),
+        'CACHE_TAMANHO_MAXIMO': int(os.environ.get('SIO_CACHE_MB', 32)) * 1024 * 1024,
+        'CACHE_ARQUIVO': os.environ.get('SIO_CACHE_ARQUIVO', 'database/cache.db'),
+        # gzip/brotli negociado nas respostas dinâmicas acima de COMPRESSAO_MINIMO bytes;
+        # '0' deixa a compressão para o proxy
+        'COMPRESSAO': os.environ.get('SIO_COMPRESSAO', '1') == '1',
+        'COMPRESSAO_MINIMO': int(os.environ.get('SIO_COMPRESSAO_MINIMO', 1024)),
+        # Resolvidas há mais de ARQUIVAMENTO_DIAS dias vão para o banco de
+        # arquivo a cada ARQUIVAMENTO_INTERVALO horas; 0 desliga o job
+        'ARQUIVO_DB': os.environ.get('SIO_ARQUIVO_DB', 'database/arquivo.db'),
+        'ARQUIVAMENTO_DIAS': int(os.environ.get('SIO_ARQUIVAMENTO_DIAS', 0)),
+        'ARQUIVAMENTO_INTERVALO': float(os.environ.get('SIO_ARQUIVAMENTO_INTERVALO', 24)),
+        'ARQUIVAMENTO_LOTE': int(os.environ.get('SIO_ARQUIVAMENTO_LOTE', 500)),
+        # Sessões do painel no servidor (ver sessoes.py): duração deslizante e
+        # LRU reconfirmado no banco a cada SESSAO_VALIDACAO segundos
+        'SESSAO_DURACAO': int(os.environ.get('SIO_SESSAO_HORAS', 8)) * 3600,
+        'SESSAO_CACHE': int(os.environ.get('SIO_SESSAO_CACHE', 1024)),
+        'SESSAO_VALIDACAO': int(os.environ.get('SIO_SESSAO_VALIDACAO', 30)),
+        # Login: LOGIN_TENTATIVAS seguidas por usuário em cada IP e LOGIN_TENTATIVAS_IP
+        # por IP (NAT de escritório), depois uma a cada LOGIN_REPOSICAO segundos.
+        # Contados por processo: com N workers o limite real chega a N vezes isso
+        'LOGIN_TENTATIVAS': int(os.environ.get('SIO_LOGIN_TENTATIVAS', 5)),
+        'LOGIN_TENTATIVAS_IP': int(os.environ.get('SIO_LOGIN_TENTATIVAS_IP', 20)),
+        'LOGIN_REPOSICAO': float(os.environ.get('SIO_LOGIN_REPOSICAO', 12)),
+        # Parâmetros do hash das senhas (formato do werkzeug); hashes antigos são refeitos no login
+        'SENHA_METODO': os.environ.get('SIO_SENHA_METODO', 'scrypt:32768:8:1'),
+        # Proxies reversos confiáveis na frente do app (X-Forwarded-For/Proto), ex.: 1 com o nginx
+        'PROXIES': int(os.environ.get('SIO_PROXIES', 0)),
+    }
+
+def criar_app(configuracao=None):
+    """Fábrica da aplicação: monta o Flask e os serviços deste processo.
+
+    Não toca no banco: as migrações rodam em init_db(), uma vez antes de
+    subir os workers (ver gunicorn.conf.py).
+    """
+    global pool, canal_eventos, armazenamento, gerador_miniaturas, fila_ingestao, cache_respostas
+    global manifesto_estaticos, arquivador, sessoes_admin, limitador_login
+
+    app = Flask(__name__, static_folder='static')
+    app.config.update(configuracao_padrao())
+    if configuracao:
+        app.config.update(configuracao)
+    metricas.configurar_logs()
+    if app.config['SECRET_KEY'] == SECRET_KEY_PADRAO:
+        log.warning("⚠️ SECRET_KEY padrão em uso: defina SIO_SECRET_KEY em produção")
+    if app.config['PROXIES']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXIES'], x_proto=app.config['PROXIES'])
+
+    # Garante que as pastas existem
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    os.makedirs(os.path.dirname(app.config['DB_PATH']) or '.', exist_ok=True)
+
+    # Banco de arquivo só com o arquivamento ligado, ou se já existe (as
+    # ocorrências arquivadas antes continuam abrindo pelo detalhe)
+    anexados = {}
+    if app.config['ARQUIVAMENTO_DIAS'] > 0 or os.path.exists(app.config['ARQUIVO_DB']):
+        os.makedirs(os.path.dirname(app.config['ARQUIVO_DB']) or '.', exist_ok=True)
+        anexados['arquivo'] = app.config['ARQUIVO_DB']
+    if app.config['METRICAS']:
+        pool = PoolConexoes(
+            app.config['DB_PATH'], tamanho=app.config['DB_POOL'], bancos_anexados=anexados,
+            fabrica=metricas.ConexaoInstrumentada, ao_obter=metricas.espera_conexao.observar
+        )
+    else:
+        pool = PoolConexoes(app.config['DB_PATH'], tamanho=app.config['DB_POOL'], bancos_anexados=anexados)
+    canal_eventos = CanalEventos(pool, maximo_fluxos=app.config['SSE_MAXIMO_FLUXOS'])
+    armazenamento = ArmazenamentoAnexos(app.config['UPLOAD_FOLDER'], app.config['ANEXO_TAMANHO_MAXIMO'])
+    # Uploads do multipart gravados e com hash calculado enquanto chegam (ver anexos.py)
+    app.request_class = armazenamento.classe_requisicao()
+    gerador_miniaturas = GeradorMiniaturas(pool, armazenamento, threads=app.config['MINIATURAS_THREADS'])
+    fila_ingestao = FilaIngestao(
+        pool, app.config['INGESTAO_PASTA'],
+        ao_gravar=publicar_criadas, apos_commit=canal_eventos.notificar,
+        maximo_fila=app.config['INGESTAO_MAXIMO']
+    )
+    cache_respostas = criar_cache(
+        app.config['CACHE'], ttl=app.config['CACHE_TTL'],
+        limite_bytes=app.config['CACHE_TAMANHO_MAXIMO'], caminho=app.config['CACHE_ARQUIVO']
+    )
+    arquivador = Arquivador(
+        pool, app.config['ARQUIVAMENTO_DIAS'], intervalo=app.config['ARQUIVAMENTO_INTERVALO'] * 3600,
+        tamanho_lote=app.config['ARQUIVAMENTO_LOTE'],
+        trava=os.path.join(os.path.dirname(app.config['DB_PATH']) or '.', 'arquivamento.trava')
+    )
+    sessoes_admin = ArmazemSessoes(
+        duracao=app.config['SESSAO_DURACAO'], tamanho_cache=app.config['SESSAO_CACHE'],
+        validacao_cache=app.config['SESSAO_VALIDACAO']
+    )
+    limitador_login = LimitadorTentativas(app.config['LOGIN_TENTATIVAS'], app.config['LOGIN_REPOSICAO'])
+    manifesto_estaticos = Manifesto()
+    app.jinja_env.globals.update(
+        estatico=manifesto_estaticos.url, estatico_disponivel=manifesto_estaticos.disponivel
+    )
+
+    app.register_blueprint(rotas)
+    app.teardown_appcontext(devolver_conexao)
+    if app.config['METRICAS']:
+        app.before_request(iniciar_medicao)
+        app.after_request(registrar_medicao)
+        registrar_medidores()
+    if app.config['COMPRESSAO']:
+        # Registrado por último para rodar antes da medição (mede os bytes enviados)
+        app.after_request(comprimir_resposta)
+    return app
 
 def get_conn():
-    """Cria conexão com o banco SQLite"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Retorna a conexão da requisição atual, emprestada do pool.
+
+    A conexão é devolvida automaticamente no fim do app context
+    (ver devolver_conexao), então as rotas não devem fechá-la.
+    """
+    if 'conn' not in g:
+        g.conn = pool.obter()
+    return g.conn
+
+def devolver_conexao(exc):
+    conn = g.pop('conn', None)
+    if conn is not None:
+        pool.devolver(conn)
+
+# ========== INSTRUMENTAÇÃO ==========
+def iniciar_medicao():
+    g.inicio_requisicao = time.perf_counter()
+
+def registrar_medicao(resposta):
+    """Latência e tamanho da resposta por endpoint (respostas em fluxo: até o 1º byte)"""
+    inicio = g.pop('inicio_requisicao', None)
+    if inicio is not None:
+        endpoint = request.endpoint or 'nao_encontrado'
+        metricas.requisicoes.observar(
+            time.perf_counter() - inicio, endpoint, request.method, str(resposta.status_code)
+        )
+        if resposta.content_length is not None:
+            metricas.resposta_bytes.observar(resposta.content_length, endpoint)
+    return resposta
+
+def registrar_medidores():
+    """Valores lidos na coleta: pool, fila de ingestão, cache, arquivamento"""
+    registro = metricas.registro
+    registro.registrar(metricas.Medidor(
+        'sio_pool_conexoes_abertas', 'Conexões SQLite abertas neste processo', lambda: pool.abertas()))
+    registro.registrar(metricas.Medidor(
+        'sio_pool_conexoes_livres', 'Conexões SQLite ociosas no pool', lambda: pool.livres()))
+    registro.registrar(metricas.Medidor(
+        'sio_ingestao_fila', 'Registros aguardando a escritora da ingestão',
+        lambda: fila_ingestao.metricas()['profundidade']))
+    registro.registrar(metricas.Medidor(
+        'sio_ingestao_ultimo_lote', 'Tamanho do último lote gravado pela ingestão',
+        lambda: fila_ingestao.metricas()['ultimo_lote']))
+    registro.registrar(metricas.Medidor(
+        'sio_ingestao_gravadas', 'Registros gravados pela ingestão em lote neste processo',
+        lambda: fila_ingestao.metricas()['gravadas']))
+    if cache_respostas is not None:
+        registro.registrar(metricas.Medidor(
+            'sio_cache_entradas', 'Respostas guardadas no cache', lambda: cache_respostas.tamanho()[0]))
+        registro.registrar(metricas.Medidor(
+            'sio_cache_bytes', 'Bytes guardados no cache de respostas', lambda: cache_respostas.tamanho()[1]))
+    registro.registrar(metricas.Medidor(
+        'sio_sse_fluxos', 'Fluxos SSE abertos neste processo', lambda: canal_eventos.fluxos_abertos))
+    registro.registrar(metricas.Medidor(
+        'sio_arquivamento_movidas', 'Ocorrências arquivadas na execução atual/última deste processo',
+        lambda: arquivador.progresso()['movidas']))
+    registro.registrar(metricas.Medidor(
+        'sio_arquivamento_rodando', 'Arquivamento em execução neste processo (0/1)',
+        lambda: int(arquivador.progresso()['rodando'])))
 
 def init_db():
-    """Inicializa o banco de dados com todas as tabelas"""
-    print("🔄 Inicializando banco de dados...")
+    """Aplica as migrações pendentes e garante o administrador padrão.
+
+    Roda uma vez por implantação (on_starting do gunicorn ou python app.py).
+    Migrações e criação do admin acontecem sob BEGIN IMMEDIATE, então dois
+    processos iniciando juntos não aplicam nada em dobro.
+    """
+    log.info("🔄 Inicializando banco de dados...")
     
     try:
-        conn = get_conn()
-        
-        # Tabela de ocorrências
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS ocorrencias (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                titulo TEXT NOT NULL,
-                descricao TEXT NOT NULL,
-                categoria TEXT NOT NULL,
-                anexo TEXT,
-                status TEXT DEFAULT 'Pendente',
-                data DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # VERIFICA E ADICIONA COLUNA STATUS SE NÃO EXISTIR
-        cursor = conn.execute("PRAGMA table_info(ocorrencias)")
-        colunas = [coluna[1] for coluna in cursor.fetchall()]
-        if 'status' not in colunas:
-            print("➕ Adicionando coluna 'status' à tabela ocorrências...")
-            conn.execute('ALTER TABLE ocorrencias ADD COLUMN status TEXT DEFAULT "Pendente"')
-        
-        # Tabela de administradores
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS administradores (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                usuario TEXT UNIQUE NOT NULL,
-                senha_hash TEXT NOT NULL,
-                nome TEXT NOT NULL,
-                email TEXT,
-                data_criacao DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Tabela de respostas
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS respostas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ocorrencia_id INTEGER NOT NULL,
-                administrador_id INTEGER NOT NULL,
-                mensagem TEXT NOT NULL,
-                anexo TEXT,
-                data_resposta DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Tabela de histórico de status
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS historico_status (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ocorrencia_id INTEGER NOT NULL,
-                status_anterior TEXT NOT NULL,
-                status_novo TEXT NOT NULL,
-                administrador_id INTEGER NOT NULL,
-                data_mudanca DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        
-        # Cria um administrador padrão se não existir
-        cursor = conn.execute("SELECT COUNT(*) as total FROM administradores")
-        if cursor.fetchone()['total'] == 0:
-            senha_hash = generate_password_hash('admin123')
-            conn.execute('''
-                INSERT INTO administradores (usuario, senha_hash, nome, email)
-                VALUES (?, ?, ?, ?)
-            ''', ('admin', senha_hash, 'Administrador Principal', 'admin@sio.com'))
-            conn.commit()
-            print("👤 Administrador padrão criado: usuario='admin', senha='admin123'")
-        
-        # Verifica tabelas criadas
-        tabelas = ['ocorrencias', 'administradores', 'respostas', 'historico_status']
-        for tabela in tabelas:
-            cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (tabela,))
-            if cursor.fetchone():
-                print(f"✅ Tabela '{tabela}' criada/verificada")
-            else:
-                print(f"❌ ERRO: Tabela '{tabela}' não foi criada!")
-        
-        conn.close()
-        print("✅ Banco de dados inicializado com sucesso!")
+        with pool.conexao() as conn:
+            aplicadas = aplicar_migracoes(conn)
+            if aplicadas:
+                log.info("✅ Migrações aplicadas: %s", aplicadas)
+            if arquivo_anexado(conn):
+                garantir_esquema_arquivo(conn)
+            criar_admin_padrao(conn)
+            # Diários de ingestão que sobraram de uma execução anterior
+            recuperadas = recuperar_diarios(conn, fila_ingestao.pasta, ao_gravar=publicar_criadas)
+            if recuperadas:
+                log.warning("♻️ %d ocorrências recuperadas do diário de ingestão", recuperadas)
+        log.info("✅ Banco de dados inicializado com sucesso! (versão %d)", VERSAO_ATUAL)
         
     except Exception as e:
-        print(f"❌ Erro grave ao inicializar banco: {e}")
+        log.exception("❌ Erro grave ao inicializar banco: %s", e)
+
+def criar_admin_padrao(conn):
+    """Cria um administrador padrão se não existir nenhum"""
+    conn.execute('BEGIN IMMEDIATE')
+    cursor = conn.execute("SELECT COUNT(*) as total FROM administradores")
+    if cursor.fetchone()['total'] == 0:
+        # Com outro SIO_SENHA_METODO, o hash é refeito no primeiro login
+        senha_hash = gerar_hash_senha('admin123')
+        conn.execute('''
+            INSERT INTO administradores (usuario, senha_hash, nome, email)
+            VALUES (?, ?, ?, ?)
+        ''', ('admin', senha_hash, 'Administrador Principal', 'admin@sio.com'))
+        log.warning("👤 Administrador padrão criado: usuario='admin', senha='admin123'")
+    conn.commit()
 
 # ========== DECORATOR ADMIN REQUIRED ==========
+def sessao_admin_atual():
+    """Sessão do servidor ligada ao cookie, ou None (cookie sem sessão ativa é limpo)"""
+    if 'sessao_admin' not in g:
+        sessao = sessoes_admin.validar(session.get('sessao'), get_conn)
+        if sessao is None or sessao['administrador_id'] != session.get('admin_id'):
+            sessao = None
+            session.clear()
+        g.sessao_admin = sessao
+    return g.sessao_admin
+
 def admin_required(f):
-    from functools import wraps
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'admin_id' not in session:
+        if sessao_admin_atual() is None:
             return redirect('/admin')
         return f(*args, **kwargs)
     return decorated_function
 
+# ========== REQUISIÇÕES CONDICIONAIS ==========
+def versao_atual(conn):
+    """Versão global dos dados, incrementada por triggers a cada escrita"""
+    return conn.execute('SELECT versao FROM versao_dados WHERE id = 1').fetchone()[0]
+
+def condicional_por_versao(f):
+    """Responde 304 quando o If-None-Match do cliente ainda é a versão atual.
+
+    O ETag combina a versão dos dados com a URL completa (filtros, cursor),
+    então a consulta só é executada quando algo mudou desde o último poll.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        versao = g.versao_dados = versao_atual(get_conn())
+        chave = zlib.crc32(f"{request.endpoint}|{request.full_path}".encode('utf-8'))
+        etag = f"v{versao}-{chave:08x}"
+
+        # Comparação fraca: a resposta comprimida leva o ETag como W/"..."
+        if request.if_none_match.contains_weak(etag):
+            resposta = current_app.response_class(status=304)
+        else:
+            resposta = make_response(f(*args, **kwargs))
+            if resposta.status_code != 200:
+                return resposta
+
+        resposta.set_etag(etag)
+        resposta.headers['Cache-Control'] = 'no-cache'
+        return resposta
+    return decorated_function
+
+def em_cache(*etiquetas):
+    """Serve a resposta do cache_respostas e guarda as respostas 200.
+
+    As etiquetas dizem quais escritas invalidam a rota e aceitam os
+    argumentos da URL (ex.: 'ocorrencia:{ocorrencia_id}'). Abaixo de
+    condicional_por_versao, reaproveita a versão que ele já leu.
+    """
+    def decorador(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if cache_respostas is None:
+                return f(*args, **kwargs)
+
+            conn = get_conn()
+            versao = g.get('versao_dados')
+            if versao is None:
+                versao = versao_atual(conn)
+            cache_respostas.sincronizar(conn, versao)
+
+            # O caminho separa as rotas com argumentos na URL (/api/ocorrencia/<id>)
+            chave = cache_respostas.chave(
+                request.path, request.args, [e.format(**kwargs) for e in etiquetas]
+            )
+            guardada = cache_respostas.obter(chave)
+            if guardada is not None:
+                consultas_cache.inc(request.endpoint, 'acerto')
+                corpo, mimetype = guardada
+                return current_app.response_class(corpo, mimetype=mimetype)
+
+            consultas_cache.inc(request.endpoint, 'falta')
+            resposta = make_response(f(*args, **kwargs))
+            if resposta.status_code == 200 and not resposta.is_streamed:
+                cache_respostas.guardar(chave, resposta.get_data(), resposta.mimetype)
+            return resposta
+        return decorated_function
+    return decorador
+
+def invalidar_cache(etiquetas, evento_id):
+    """Chame após o commit de uma escrita que publicou o evento evento_id (ou a lista de ids)"""
+    if cache_respostas is not None:
+        cache_respostas.invalidar(etiquetas, evento_id)
+
 # ========== ROTAS PRINCIPAIS ==========
-@app.route('/')
+@rotas.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/registrar')
+@rotas.route('/registrar')
 def registrar():
     return render_template('registrar.html')
 
-@app.route('/consultar')
+@rotas.route('/consultar')
 def consultar():
     return render_template('consultar.html')
 
 # ========== APIs PÚBLICAS ==========
-@app.route('/api/registrar', methods=['POST'])
+@rotas.route('/api/registrar', methods=['POST'])
 def registrar_ocorrencia():
     try:
         titulo = request.form.get('titulo', '').strip()
@@ -147,140 +405,440 @@ def registrar_ocorrencia():
         if not titulo or not descricao or not categoria:
             return jsonify({'erro': 'Preencha todos os campos obrigatórios!'}), 400
 
-        nome_arquivo = None
-        if anexo and anexo.filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            nome_arquivo = f"{timestamp}_{anexo.filename}"
-            caminho_arquivo = os.path.join(app.config['UPLOAD_FOLDER'], nome_arquivo)
-            anexo.save(caminho_arquivo)
+        # Modo fila: só o diário é gravado agora; anexos seguem o caminho normal
+        if current_app.config['INGESTAO'] == 'fila' and not (anexo and anexo.filename):
+            ticket = fila_ingestao.enfileirar(titulo, descricao, categoria)
+            return jsonify({
+                'mensagem': 'Ocorrência recebida com sucesso!',
+                'ticket': ticket,
+                'acompanhar': f'/api/registrar/{ticket}'
+            }), 202
 
         conn = get_conn()
         cursor = conn.cursor()
+
+        nome_arquivo = None
+        if anexo and anexo.filename:
+            nome_arquivo = armazenamento.salvar(conn, anexo)
         
         cursor.execute('''
             INSERT INTO ocorrencias (titulo, descricao, categoria, anexo, status)
             VALUES (?, ?, ?, ?, 'Pendente')
         ''', (titulo, descricao, categoria, nome_arquivo))
+        id_gerado = cursor.lastrowid
         
+        miniatura_agendada = gerador_miniaturas.enfileirar(conn, nome_arquivo)
+        evento_id = canal_eventos.publicar(conn, 'ocorrencia_criada', id_gerado, buscar_item_lista(conn, id_gerado))
         conn.commit()
-        id_gerado = cursor.lastrowid
-        conn.close()
+        canal_eventos.notificar()
+        invalidar_cache(['lista', 'estatisticas'], evento_id)
+        if miniatura_agendada:
+            gerador_miniaturas.acordar()
         
         return jsonify({
             'mensagem': 'Ocorrência registrada com sucesso!',
             'id': id_gerado
         }), 201
 
+    except AnexoInvalido as e:
+        return jsonify({'erro': str(e)}), e.status
+
+    except FilaCheia:
+        # A escritora está atrasada: o cliente tenta de novo em instantes
+        resposta = jsonify({'erro': 'Sistema sobrecarregado, tente novamente em instantes'})
+        resposta.status_code = 503
+        resposta.headers['Retry-After'] = '5'
+        return resposta
+
+    except RequestEntityTooLarge:
+        raise
+
     except Exception as e:
-        print(f"❌ Erro ao registrar ocorrência: {e}")
+        log.exception("❌ Erro ao registrar ocorrência: %s", e)
         return jsonify({'erro': f'Erro interno: {str(e)}'}), 500
 
-@app.route('/api/ocorrencias', methods=['GET'])
+@rotas.route('/api/registrar/<ticket>')
+def situacao_registro(ticket):
+    """Situação de um registro feito no modo fila"""
+    if not ticket_valido(ticket):
+        return jsonify({'erro': 'Ticket inválido'}), 404
+
+    conn = get_conn()
+    ocorrencia_id = fila_ingestao.consultar(conn, ticket)
+    if ocorrencia_id is None:
+        # No diário deste ou de outro worker: ainda na fila
+        if fila_ingestao.pendente(ticket):
+            return jsonify({'ticket': ticket, 'status': 'na_fila'}), 202
+        # A escritora pode ter gravado e limpado o diário entre as duas consultas
+        ocorrencia_id = fila_ingestao.consultar(conn, ticket)
+        if ocorrencia_id is None:
+            # Inventado, descartado ou mais antigo que a retenção dos tickets
+            return jsonify({'erro': 'Ticket não encontrado'}), 404
+    return jsonify({'ticket': ticket, 'status': 'registrada', 'id': ocorrencia_id})
+
+# ========== PAGINAÇÃO E FILTROS ==========
+LIMITE_PADRAO = 20
+LIMITE_MAXIMO = 100
+
+def codificar_cursor(data, ocorrencia_id):
+    """Gera o cursor opaco da paginação por chave (data, id)"""
+    bruto = f"{data}|{ocorrencia_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(bruto).decode('ascii')
+
+def decodificar_cursor(cursor):
+    """Lê o cursor gerado por codificar_cursor; retorna (data, id)"""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        data, ocorrencia_id = bruto.rsplit('|', 1)
+        return data, int(ocorrencia_id)
+    except (ValueError, UnicodeError):
+        raise ValueError('Cursor inválido')
+
+def ler_limite():
+    """Lê ?limite= respeitando o teto de página"""
+    try:
+        limite = int(request.args.get('limite', LIMITE_PADRAO))
+    except ValueError:
+        raise ValueError('Limite inválido')
+    return max(1, min(limite, LIMITE_MAXIMO))
+
+def ler_data(nome):
+    """Lê um parâmetro de data no formato AAAA-MM-DD"""
+    valor = request.args.get(nome, '').strip()
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f'Data inválida em {nome} (use AAAA-MM-DD)')
+
+def montar_filtros(alias='o'):
+    """Monta a cláusula WHERE dos filtros de listagem (categoria, status e período)"""
+    condicoes = []
+    parametros = []
+
+    categoria = request.args.get('categoria', '').strip()
+    if categoria:
+        condicoes.append(f'{alias}.categoria = ?')
+        parametros.append(categoria)
+
+    status = request.args.get('status', '').strip()
+    if status:
+        condicoes.append(f'{alias}.status = ?')
+        parametros.append(status)
+
+    data_inicio = ler_data('data_inicio')
+    if data_inicio:
+        condicoes.append(f'{alias}.data >= ?')
+        parametros.append(data_inicio)
+
+    data_fim = ler_data('data_fim')
+    if data_fim:
+        condicoes.append(f"{alias}.data < date(?, '+1 day')")
+        parametros.append(data_fim)
+
+    return condicoes, parametros
+
+# Campos das listas -> expressão SQL (ver serializacao.py). A URL do anexo e
+# a data exibida saem prontas do banco.
+URL_ANEXO_SQL = "CASE WHEN o.anexo <> '' THEN '/uploads/' || o.anexo END"
+DATA_EXIBICAO_SQL = "strftime('%d/%m/%Y às %H:%M', o.data)"
+CAMPOS_LISTA = {
+    'id': 'o.id',
+    'titulo': 'o.titulo',
+    'descricao': 'o.descricao',
+    'categoria': 'o.categoria',
+    'anexo': URL_ANEXO_SQL,
+    'status': 'o.status',
+    'data': DATA_EXIBICAO_SQL,
+}
+# Painel admin: filtros, ordem e contagens vêm da fila_admin (migração 012)
+CAMPOS_ADMIN = {
+    'id': 'o.id',
+    'titulo': 'o.titulo',
+    'descricao': 'o.descricao',
+    'categoria': 'o.categoria',
+    'anexo': URL_ANEXO_SQL,
+    'data': DATA_EXIBICAO_SQL,
+    'status': 'f.status',
+    'resposta_count': 'f.resposta_count',
+    'ultima_resposta_em': "strftime('%d/%m/%Y às %H:%M', f.ultima_resposta_em)",
+    'status_alterado_em': "strftime('%d/%m/%Y às %H:%M', f.status_alterado_em)",
+}
+# ?ordem= do painel: (direção, comparação do cursor)
+ORDENS_ADMIN = {
+    'recentes': ('DESC', '<'),
+    'antigas': ('ASC', '>'),
+}
+
+def formatar_item_lista(linha):
+    item = dict(linha)
+    if item.get('anexo'):
+        item['anexo'] = f"/uploads/{item['anexo']}"
+    return item
+
+def buscar_item_lista(conn, ocorrencia_id):
+    """Uma ocorrência no mesmo formato dos itens de /api/ocorrencias"""
+    linha = conn.execute('''
+        SELECT id, titulo, descricao, categoria, anexo, status,
+               strftime('%d/%m/%Y às %H:%M', data) AS data
+        FROM ocorrencias
+        WHERE id = ?
+    ''', (ocorrencia_id,)).fetchone()
+    return formatar_item_lista(linha) if linha else None
+
+# ========== DETALHES ==========
+def ler_ids():
+    """Lê ?ids=1,2,3 (sem repetições, na ordem dada, até LIMITE_MAXIMO)"""
+    ids = []
+    for parte in request.args.get('ids', '').split(','):
+        parte = parte.strip()
+        if not parte:
+            continue
+        if not parte.isdigit():
+            raise ValueError('Lista de ids inválida')
+        if int(parte) not in ids:
+            ids.append(int(parte))
+    if not ids:
+        raise ValueError('Informe os ids em ?ids=')
+    if len(ids) > LIMITE_MAXIMO:
+        raise ValueError(f'Máximo de {LIMITE_MAXIMO} ids por requisição')
+    return ids
+
+def formatar_anexo(item):
+    """Troca o caminho do anexo pela URL pública e acrescenta miniatura/prévia"""
+    if item.get('anexo'):
+        item.update(gerador_miniaturas.urls(item['anexo']))
+        item['anexo'] = f"/uploads/{item['anexo']}"
+    return item
+
+def carregar_detalhes(conn, ids, admin=False):
+    """Ocorrências com respostas (e histórico, no admin) de vários ids.
+
+    Uma consulta por tabela com IN (...) e agrupamento em Python, em vez
+    de 2-3 consultas por ocorrência. Retorna {id: detalhes}; o painel
+    recebe respostas e histórico do mais recente para o mais antigo.
+    Ids que não estão no banco principal são procurados no arquivo
+    (ver arquivamento.py) e voltam com 'arquivada': True.
+    """
+    detalhes = _carregar_detalhes(conn, 'main', ids, admin)
+    faltando = [ocorrencia_id for ocorrencia_id in ids if ocorrencia_id not in detalhes]
+    if faltando and arquivo_disponivel(conn):
+        arquivadas = _carregar_detalhes(conn, 'arquivo', faltando, admin)
+        for item in arquivadas.values():
+            item['ocorrencia']['arquivada'] = True
+        detalhes.update(arquivadas)
+    return detalhes
+
+def _carregar_detalhes(conn, banco, ids, admin):
+    marcadores = ','.join('?' * len(ids))
+    ordem = 'DESC' if admin else 'ASC'
+
+    detalhes = {}
+    for o in conn.execute(f'''
+        SELECT o.*, strftime('%d/%m/%Y às %H:%M', o.data) AS data_formatada
+        FROM {banco}.ocorrencias o
+        WHERE o.id IN ({marcadores})
+    ''', ids):
+        detalhes[o['id']] = {'ocorrencia': formatar_anexo(dict(o)), 'respostas': []}
+        if admin:
+            detalhes[o['id']]['historico'] = []
+    if not detalhes:
+        return detalhes
+
+    for r in conn.execute(f'''
+        SELECT r.*, a.nome AS admin_nome,
+               strftime('%d/%m/%Y às %H:%M', r.data_resposta) AS data_resposta_formatada
+        FROM {banco}.respostas r
+        JOIN main.administradores a ON r.administrador_id = a.id
+        WHERE r.ocorrencia_id IN ({marcadores})
+        ORDER BY r.data_resposta {ordem}
+    ''', ids):
+        detalhes[r['ocorrencia_id']]['respostas'].append(formatar_anexo(dict(r)))
+
+    if admin:
+        for h in conn.execute(f'''
+            SELECT h.*, a.nome AS admin_nome,
+                   strftime('%d/%m/%Y às %H:%M', h.data_mudanca) AS data_mudanca_formatada
+            FROM {banco}.historico_status h
+            JOIN main.administradores a ON h.administrador_id = a.id
+            WHERE h.ocorrencia_id IN ({marcadores})
+            ORDER BY h.data_mudanca DESC
+        ''', ids):
+            detalhes[h['ocorrencia_id']]['historico'].append(dict(h))
+
+    return detalhes
+
+def publicar_criadas(conn, ids):
+    """Eventos 'ocorrencia_criada' das ocorrências gravadas em lote pela ingestão"""
+    for ocorrencia_id in ids:
+        canal_eventos.publicar(conn, 'ocorrencia_criada', ocorrencia_id, buscar_item_lista(conn, ocorrencia_id))
+
+@rotas.route('/api/ocorrencias', methods=['GET'])
+@condicional_por_versao
+@em_cache('lista')
 def listar_ocorrencias():
+    """Lista ocorrências por página, do mais recente para o mais antigo.
+
+    Parâmetros: categoria, status, data_inicio, data_fim (AAAA-MM-DD),
+    limite (máx. LIMITE_MAXIMO) e cursor (valor de proximo_cursor da página anterior).
+    Saída: campos (?campos=id,titulo,...), formato (objetos ou colunas) e
+    descricao_max (trunca a descrição no servidor), ver serializacao.py.
+    """
     try:
-        conn = get_conn()
-        
-        ocorrencias = conn.execute('''
-            SELECT id, titulo, descricao, categoria, anexo, status,
-                   strftime('%d/%m/%Y às %H:%M', data) AS data
-            FROM ocorrencias 
-            ORDER BY data DESC
-        ''').fetchall()
-        
-        conn.close()
-
-        lista = []
-        for o in ocorrencias:
-            item = dict(o)
-            if item.get('anexo'):
-                item['anexo'] = f"/uploads/{item['anexo']}"
-            lista.append(item)
-            
-        print(f"✅ Enviando {len(lista)} ocorrências para o frontend")
-        return jsonify(lista)
+        limite = ler_limite()
+        condicoes, parametros = montar_filtros()
+        campos = serializacao.ler_projecao(CAMPOS_LISTA, CAMPOS_LISTA)
+        formato = serializacao.ler_formato()
+        descricao_max = serializacao.ler_descricao_max()
+
+        cursor = request.args.get('cursor', '').strip()
+        if cursor:
+            data_cursor, id_cursor = decodificar_cursor(cursor)
+            condicoes.append('(o.data < ? OR (o.data = ? AND o.id < ?))')
+            parametros.extend([data_cursor, data_cursor, id_cursor])
+
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+
+    try:
+        consulta = get_conn().cursor()
+        consulta.row_factory = None   # tuplas: serializam sem montar um dict por linha
+
+        # Busca uma linha a mais para saber se existe próxima página; data e id
+        # vão no fim de cada linha para montar o cursor
+        linhas = consulta.execute(f'''
+            SELECT {serializacao.montar_select(CAMPOS_LISTA, campos, descricao_max)},
+                   o.data, o.id
+            FROM ocorrencias o
+            {where}
+            ORDER BY o.data DESC, o.id DESC
+            LIMIT ?
+        ''', (*parametros, limite + 1)).fetchall()
+
+        proximo_cursor = None
+        if len(linhas) > limite:
+            linhas = linhas[:limite]
+            proximo_cursor = codificar_cursor(linhas[-1][-2], linhas[-1][-1])
+        linhas = [linha[:-2] for linha in linhas]
+
+        log.debug("✅ Enviando %d ocorrências para o frontend", len(linhas))
+        pagina = serializacao.linhas_ou_objetos(campos, linhas, formato)
+        if formato == 'objetos':
+            pagina = {'ocorrencias': pagina}
+        pagina.update(proximo_cursor=proximo_cursor, limite=limite)
+        return serializacao.resposta_json(pagina)
         
     except Exception as e:
-        print(f"❌ ERRO ao buscar ocorrências: {e}")
+        log.exception("❌ ERRO ao buscar ocorrências: %s", e)
         return jsonify({'erro': 'Erro ao carregar ocorrências'}), 500
 
-@app.route('/api/estatisticas')
+@rotas.route('/api/estatisticas')
+@condicional_por_versao
+@em_cache('estatisticas')
 def estatisticas():
     try:
         conn = get_conn()
-        
-        total = conn.execute("SELECT COUNT(*) as total FROM ocorrencias").fetchone()['total']
-        
-        categorias = conn.execute("""
-            SELECT categoria, COUNT(*) as count 
-            FROM ocorrencias 
-            GROUP BY categoria
-        """).fetchall()
-        
-        conn.close()
-        
-        return jsonify({
-            'total': total,
-            'categorias': [dict(cat) for cat in categorias],
-            'total_categorias': len(categorias)
-        })
+        return jsonify(estatisticas_publicas(conn))
         
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
-@app.route('/api/ocorrencia/<int:ocorrencia_id>')
+@rotas.route('/api/ocorrencia/<int:ocorrencia_id>')
+@em_cache('ocorrencia:{ocorrencia_id}')
 def detalhes_ocorrencia(ocorrencia_id):
     """API para usuários verem detalhes de uma ocorrência específica com respostas"""
     try:
-        conn = get_conn()
-        
-        # Busca a ocorrência
-        ocorrencia = conn.execute('''
-            SELECT o.*, strftime('%d/%m/%Y às %H:%M', o.data) AS data_formatada
-            FROM ocorrencias o
-            WHERE o.id = ?
-        ''', (ocorrencia_id,)).fetchone()
-        
-        if not ocorrencia:
+        detalhes = carregar_detalhes(get_conn(), [ocorrencia_id])
+        if ocorrencia_id not in detalhes:
             return jsonify({'erro': 'Ocorrência não encontrada'}), 404
-            
-        # Busca as respostas
-        respostas = conn.execute('''
-            SELECT r.*, a.nome as admin_nome, 
-                   strftime('%d/%m/%Y às %H:%M', r.data_resposta) AS data_resposta_formatada
-            FROM respostas r
-            JOIN administradores a ON r.administrador_id = a.id
-            WHERE r.ocorrencia_id = ?
-            ORDER BY r.data_resposta ASC
-        ''', (ocorrencia_id,)).fetchall()
-        
-        conn.close()
-
-        ocorrencia_dict = dict(ocorrencia)
-        if ocorrencia_dict.get('anexo'):
-            ocorrencia_dict['anexo'] = f"/uploads/{ocorrencia_dict['anexo']}"
-            
-        respostas_list = []
-        for r in respostas:
-            resposta_dict = dict(r)
-            if resposta_dict.get('anexo'):
-                resposta_dict['anexo'] = f"/uploads/{resposta_dict['anexo']}"
-            respostas_list.append(resposta_dict)
+        return jsonify(detalhes[ocorrencia_id])
+        
+    except Exception as e:
+        log.exception("❌ ERRO ao buscar detalhes da ocorrência: %s", e)
+        return jsonify({'erro': 'Erro ao carregar detalhes'}), 500
+
+@rotas.route('/api/busca')
+@condicional_por_versao
+def buscar_ocorrencias():
+    """Busca textual em título, descrição e respostas, ordenada por relevância.
+
+    Parâmetros: q, categoria, status, limite e pagina (a partir de 1).
+    """
+    texto = request.args.get('q', '').strip()
+    if not texto:
+        return jsonify({'erro': 'Informe o texto da busca (q)'}), 400
+
+    try:
+        limite = ler_limite()
+        pagina = max(1, int(request.args.get('pagina', 1)))
+    except ValueError:
+        return jsonify({'erro': 'Parâmetros de paginação inválidos'}), 400
+
+    # Páginas muito profundas custam caro no FTS; refine a busca em vez disso
+    if (pagina - 1) * limite >= 1000:
+        return jsonify({'erro': 'Página muito distante; refine a busca'}), 400
+
+    try:
+        conn = get_conn()
+        resultados = busca.buscar(
+            conn, texto,
+            limite=limite + 1,
+            deslocamento=(pagina - 1) * limite,
+            categoria=request.args.get('categoria', '').strip() or None,
+            status=request.args.get('status', '').strip() or None
+        )
+
+        proxima_pagina = None
+        if len(resultados) > limite:
+            resultados = resultados[:limite]
+            proxima_pagina = pagina + 1
 
         return jsonify({
-            'ocorrencia': ocorrencia_dict,
-            'respostas': respostas_list
+            'resultados': resultados,
+            'proxima_pagina': proxima_pagina,
+            'limite': limite
         })
         
     except Exception as e:
-        print(f"❌ ERRO ao buscar detalhes da ocorrência: {e}")
-        return jsonify({'erro': 'Erro ao carregar detalhes'}), 500
+        log.exception("❌ ERRO na busca: %s", e)
+        return jsonify({'erro': 'Erro ao realizar a busca'}), 500
+
+# ========== EVENTOS AO VIVO (SSE) ==========
+def resposta_sse(somente_publicos):
+    if not canal_eventos.reservar():
+        # Processo no limite de fluxos: o EventSource desiste e a página fica no poll
+        resposta = jsonify({'erro': 'Muitas conexões ao vivo, tente mais tarde'})
+        resposta.status_code = 503
+        resposta.headers['Retry-After'] = '60'
+        return resposta
+
+    fluxo = canal_eventos.fluxo(ler_ultimo_id(request), somente_publicos)
+    resposta = Response(fluxo, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Chamado quando o servidor fecha a resposta, mesmo que o fluxo nem tenha começado
+    resposta.call_on_close(canal_eventos.liberar)
+    return resposta
+
+@rotas.route('/api/eventos')
+def eventos_publicos():
+    """Fluxo SSE com ocorrências novas, mudanças de status e novas respostas"""
+    return resposta_sse(somente_publicos=True)
+
+@rotas.route('/admin/api/eventos')
+@admin_required
+def eventos_admin():
+    return resposta_sse(somente_publicos=False)
 
 # ========== ROTAS DE ADMIN ==========
-@app.route('/admin')
+@rotas.route('/admin')
 def admin_login_page():
     return render_template('admin_login.html')
 
-@app.route('/admin/login', methods=['POST'])
+@rotas.route('/admin/login', methods=['POST'])
 def admin_login():
     try:
         dados = request.json
@@ -290,14 +848,30 @@ def admin_login():
         if not usuario or not senha:
             return jsonify({'erro': 'Usuário e senha são obrigatórios!'}), 400
 
+        # Antes do hash: rajadas de tentativas não chegam a gastar CPU
+        # O balde do usuário é por IP: errar a senha de outra máquina não bloqueia o dono da conta
+        ip = request.remote_addr
+        espera = limitador_login.consumir(
+            (f'ip:{ip}', current_app.config['LOGIN_TENTATIVAS_IP']),
+            f'usuario:{usuario.lower()}@{ip}'
+        )
+        if espera:
+            tentativas_login.inc('limitada')
+            resposta = jsonify({'erro': 'Muitas tentativas de login. Aguarde e tente novamente.'})
+            resposta.headers['Retry-After'] = str(math.ceil(espera))
+            return resposta, 429
+
         conn = get_conn()
         admin = conn.execute(
             'SELECT * FROM administradores WHERE usuario = ?', 
             (usuario,)
         ).fetchone()
-        conn.close()
 
-        if admin and check_password_hash(admin['senha_hash'], senha):
+        if admin and conferir_senha(conn, admin, senha, current_app.config['SENHA_METODO']):
+            token = sessoes_admin.criar(conn, admin, request.remote_addr, request.user_agent.string)
+            tentativas_login.inc('sucesso')
+            session.clear()
+            session['sessao'] = token
             session['admin_id'] = admin['id']
             session['admin_usuario'] = admin['usuario']
             session['admin_nome'] = admin['nome']
@@ -311,133 +885,284 @@ def admin_login():
                 }
             })
         else:
+            tentativas_login.inc('falha')
             return jsonify({'erro': 'Usuário ou senha incorretos!'}), 401
 
     except Exception as e:
-        print(f"❌ Erro no login admin: {e}")
+        log.exception("❌ Erro no login admin: %s", e)
         return jsonify({'erro': 'Erro interno do servidor'}), 500
 
-@app.route('/admin/dashboard')
+@rotas.route('/admin/dashboard')
 @admin_required
 def admin_dashboard():
     return render_template('admin_dashboard.html')
 
-@app.route('/admin/logout')
+@rotas.route('/admin/logout')
 def admin_logout():
+    token = session.get('sessao')
+    if token:
+        sessoes_admin.revogar_token(get_conn(), token)
     session.clear()
     return redirect('/admin')
 
+@rotas.route('/admin/api/sessoes')
+@admin_required
+def admin_sessoes():
+    """Sessões ativas do administrador logado (a atual vem marcada)"""
+    sessoes = sessoes_admin.listar(get_conn(), session['admin_id'])
+    atual = sessoes_admin.id_do_token(session.get('sessao'))
+    for item in sessoes:
+        item['atual'] = item['id'] == atual
+    return jsonify({'sessoes': sessoes})
+
+@rotas.route('/admin/api/sessoes/<sessao_id>', methods=['DELETE'])
+@admin_required
+def admin_revogar_sessao(sessao_id):
+    """Encerra uma sessão do próprio administrador (ex.: outro navegador)"""
+    if not sessoes_admin.revogar(get_conn(), sessao_id, administrador_id=session['admin_id']):
+        return jsonify({'erro': 'Sessão não encontrada'}), 404
+    return jsonify({'mensagem': 'Sessão encerrada'})
+
 # ========== APIs DO PAINEL ADMIN ==========
-@app.route('/admin/api/estatisticas')
+@rotas.route('/admin/api/estatisticas')
 @admin_required
+@condicional_por_versao
 def admin_estatisticas():
     try:
         conn = get_conn()
+        return jsonify(estatisticas_admin(conn))
         
-        total = conn.execute("SELECT COUNT(*) as total FROM ocorrencias").fetchone()['total']
-        pendentes = conn.execute("SELECT COUNT(*) as count FROM ocorrencias WHERE status = 'Pendente'").fetchone()['count']
-        em_andamento = conn.execute("SELECT COUNT(*) as count FROM ocorrencias WHERE status = 'Em Andamento'").fetchone()['count']
-        resolvidas = conn.execute("SELECT COUNT(*) as count FROM ocorrencias WHERE status = 'Resolvido'").fetchone()['count']
-        
-        ocorrencias_com_resposta = conn.execute("""
-            SELECT COUNT(DISTINCT ocorrencia_id) as count 
-            FROM respostas
-        """).fetchone()['count']
-        
-        conn.close()
+    except Exception as e:
+        log.exception("❌ Erro ao buscar estatísticas admin: %s", e)
+        return jsonify({'erro': 'Erro ao carregar estatísticas'}), 500
+
+@rotas.route('/admin/api/estatisticas/verificar', methods=['POST'])
+@admin_required
+def admin_verificar_estatisticas():
+    """Confere os contadores com um recálculo completo e os reconstrói se divergirem"""
+    try:
+        conn = get_conn()
+        divergencias = verificar_contadores(conn)
+        if divergencias and cache_respostas is not None:
+            cache_respostas.invalidar(['estatisticas'], origem='verificacao')
         
         return jsonify({
-            'total': total,
-            'pendentes': pendentes,
-            'em_andamento': em_andamento,
-            'resolvidas': resolvidas,
-            'com_resposta': ocorrencias_com_resposta
+            'consistente': not divergencias,
+            'divergencias': [
+                {'dimensao': dimensao, 'valor': valor, 'armazenado': armazenado, 'real': real}
+                for (dimensao, valor), armazenado, real in divergencias
+            ]
         })
         
     except Exception as e:
-        print(f"❌ Erro ao buscar estatísticas admin: {e}")
-        return jsonify({'erro': 'Erro ao carregar estatísticas'}), 500
+        log.exception("❌ Erro ao verificar estatísticas: %s", e)
+        return jsonify({'erro': str(e)}), 500
 
-@app.route('/admin/api/ocorrencias')
+@rotas.route('/admin/api/analytics')
 @admin_required
-def admin_ocorrencias():
+@condicional_por_versao
+def admin_analytics():
+    """Abertas, resolvidas e tempos médios por dia ou semana, lidos dos agregados diários.
+
+    Parâmetros: data_inicio e data_fim (AAAA-MM-DD, padrão: últimos 30 dias),
+    granularidade (dia ou semana), categoria e por_categoria=1 (uma série
+    por categoria).
+    """
+    try:
+        fim = ler_data('data_fim')
+        fim = datetime.strptime(fim, '%Y-%m-%d').date() if fim else datetime.utcnow().date()
+        inicio = ler_data('data_inicio')
+        inicio = (datetime.strptime(inicio, '%Y-%m-%d').date() if inicio
+                  else fim - timedelta(days=agregados.INTERVALO_PADRAO - 1))
+        if inicio > fim:
+            raise ValueError('data_inicio depois de data_fim')
+        if (fim - inicio).days >= agregados.INTERVALO_MAXIMO:
+            raise ValueError(f'Intervalo máximo de {agregados.INTERVALO_MAXIMO} dias')
+
+        granularidade = request.args.get('granularidade', 'dia')
+        if granularidade not in agregados.GRANULARIDADES:
+            raise ValueError(f"Granularidade inválida (use {' ou '.join(agregados.GRANULARIDADES)})")
+        categoria = request.args.get('categoria', '').strip() or None
+        por_categoria = request.args.get('por_categoria') == '1'
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+
+    try:
+        return serializacao.resposta_json(agregados.consultar(
+            get_conn(), inicio, fim, granularidade, categoria=categoria, por_categoria=por_categoria
+        ))
+
+    except Exception as e:
+        log.exception("❌ Erro ao calcular as análises: %s", e)
+        return jsonify({'erro': 'Erro ao carregar as análises'}), 500
+
+@rotas.route('/admin/api/ingestao')
+@admin_required
+def admin_metricas_ingestao():
+    """Profundidade da fila e tamanho dos lotes da ingestão deste worker"""
+    return jsonify({
+        'modo': current_app.config['INGESTAO'] or 'direto',
+        'pid': os.getpid(),
+        **fila_ingestao.metricas()
+    })
+
+@rotas.route('/admin/api/arquivamento', methods=['GET', 'POST'])
+@admin_required
+def admin_arquivamento():
+    """Progresso do arquivamento (GET) ou execução imediata em segundo plano (POST {"dias": N})"""
+    if request.method == 'POST':
+        dados = request.get_json(silent=True) or {}
+        dias = dados.get('dias', current_app.config['ARQUIVAMENTO_DIAS'])
+        if not isinstance(dias, int) or dias <= 0:
+            return jsonify({'erro': 'Informe "dias" (arquivamento desligado em SIO_ARQUIVAMENTO_DIAS)'}), 400
+        if not arquivo_disponivel(get_conn()):
+            return jsonify({'erro': 'Sem banco de arquivo: ligue SIO_ARQUIVAMENTO_DIAS e reinicie'}), 400
+        if not arquivador.executar_agora(dias):
+            return jsonify({'erro': 'Arquivamento já em execução'}), 409
+        return jsonify({'mensagem': 'Arquivamento iniciado', 'corte': arquivador.corte(dias)}), 202
+
     try:
         conn = get_conn()
-        
-        ocorrencias = conn.execute('''
-            SELECT o.*, 
-                   strftime('%d/%m/%Y às %H:%M', o.data) AS data,
-                   COUNT(r.id) as resposta_count
-            FROM ocorrencias o
-            LEFT JOIN respostas r ON o.id = r.ocorrencia_id
-            GROUP BY o.id
-            ORDER BY o.data DESC
-        ''').fetchall()
-        
-        conn.close()
-
-        lista = []
-        for o in ocorrencias:
-            item = dict(o)
-            if item.get('anexo'):
-                item['anexo'] = f"/uploads/{item['anexo']}"
-            lista.append(item)
-            
-        print(f"✅ Enviando {len(lista)} ocorrências para o painel admin")
-        return jsonify(lista)
+        execucoes, arquivadas = [], 0
+        if arquivo_disponivel(conn):
+            # Execuções de todos os processos ficam registradas no próprio arquivo
+            execucoes = [dict(linha) for linha in conn.execute(
+                'SELECT * FROM arquivo.execucoes ORDER BY id DESC LIMIT 10')]
+            arquivadas = conn.execute('SELECT COUNT(*) FROM arquivo.ocorrencias').fetchone()[0]
+        return jsonify({
+            'dias': current_app.config['ARQUIVAMENTO_DIAS'],
+            'progresso': arquivador.progresso(),
+            'arquivadas': arquivadas,
+            'execucoes': execucoes
+        })
+
+    except Exception as e:
+        log.exception("❌ Erro ao consultar o arquivamento: %s", e)
+        return jsonify({'erro': 'Erro ao consultar o arquivamento'}), 500
+
+@rotas.route('/admin/api/ocorrencias')
+@admin_required
+@condicional_por_versao
+def admin_ocorrencias():
+    """Fila do painel, por página.
+
+    Filtros como /api/ocorrencias (categoria, status, data_inicio,
+    data_fim), ordem=recentes|antigas (status=Pendente&ordem=antigas é a
+    fila de atendimento), limite e cursor. Aceita campos, formato e
+    descricao_max. Filtro, ordem e página saem dos índices da fila_admin;
+    ocorrencias só é lida para as linhas da página.
+    """
+    try:
+        limite = ler_limite()
+        condicoes, parametros = montar_filtros(alias='f')
+        campos = serializacao.ler_projecao(CAMPOS_ADMIN, CAMPOS_ADMIN)
+        formato = serializacao.ler_formato()
+        descricao_max = serializacao.ler_descricao_max()
+
+        ordem = request.args.get('ordem', 'recentes')
+        if ordem not in ORDENS_ADMIN:
+            raise ValueError(f"Ordem inválida (use {' ou '.join(ORDENS_ADMIN)})")
+        direcao, comparacao = ORDENS_ADMIN[ordem]
+
+        cursor = request.args.get('cursor', '').strip()
+        if cursor:
+            data_cursor, id_cursor = decodificar_cursor(cursor)
+            condicoes.append(f'(f.data {comparacao} ? OR (f.data = ? AND f.ocorrencia_id {comparacao} ?))')
+            parametros.extend([data_cursor, data_cursor, id_cursor])
+
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+
+    try:
+        consulta = get_conn().cursor()
+        consulta.row_factory = None
+
+        linhas = consulta.execute(f'''
+            SELECT {serializacao.montar_select(CAMPOS_ADMIN, campos, descricao_max)},
+                   f.data, f.ocorrencia_id
+            FROM fila_admin f
+            JOIN ocorrencias o ON o.id = f.ocorrencia_id
+            {where}
+            ORDER BY f.data {direcao}, f.ocorrencia_id {direcao}
+            LIMIT ?
+        ''', (*parametros, limite + 1)).fetchall()
+
+        proximo_cursor = None
+        if len(linhas) > limite:
+            linhas = linhas[:limite]
+            proximo_cursor = codificar_cursor(linhas[-1][-2], linhas[-1][-1])
+        linhas = [linha[:-2] for linha in linhas]
+
+        log.debug("✅ Enviando %d ocorrências para o painel admin", len(linhas))
+        pagina = serializacao.linhas_ou_objetos(campos, linhas, formato)
+        if formato == 'objetos':
+            pagina = {'ocorrencias': pagina}
+        pagina.update(proximo_cursor=proximo_cursor, limite=limite, ordem=ordem)
+        return serializacao.resposta_json(pagina)
         
     except Exception as e:
-        print(f"❌ ERRO ao buscar ocorrências para admin: {e}")
+        log.exception("❌ ERRO ao buscar ocorrências para admin: %s", e)
         return jsonify({'erro': 'Erro ao carregar ocorrências'}), 500
 
-@app.route('/admin/api/ocorrencias/<int:ocorrencia_id>')
+@rotas.route('/admin/api/exportar')
+@admin_required
+def admin_exportar():
+    """Exporta ocorrências com respostas e histórico em fluxo (NDJSON ou CSV).
+
+    Aceita os mesmos filtros da listagem: categoria, status, data_inicio e data_fim.
+    """
+    formato = request.args.get('formato', 'ndjson')
+    if formato not in exportacao.FORMATOS:
+        return jsonify({'erro': 'Formato inválido (use ndjson ou csv)'}), 400
+
+    try:
+        condicoes, parametros = montar_filtros()
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+
+    fluxo, tipo, extensao = exportacao.FORMATOS[formato]
+    nome = f"ocorrencias_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extensao}"
+    return Response(fluxo(pool, condicoes, parametros), mimetype=tipo, headers={
+        'Content-Disposition': f'attachment; filename="{nome}"'
+    })
+
+@rotas.route('/admin/api/ocorrencias/<int:ocorrencia_id>')
 @admin_required
 def admin_detalhes_ocorrencia(ocorrencia_id):
     try:
-        conn = get_conn()
-        
-        ocorrencia = conn.execute('''
-            SELECT o.*, strftime('%d/%m/%Y às %H:%M', o.data) as data_formatada
-            FROM ocorrencias o WHERE o.id = ?
-        ''', (ocorrencia_id,)).fetchone()
-        
-        if not ocorrencia:
+        detalhes = carregar_detalhes(get_conn(), [ocorrencia_id], admin=True)
+        if ocorrencia_id not in detalhes:
             return jsonify({'erro': 'Ocorrência não encontrada'}), 404
+        return jsonify(detalhes[ocorrencia_id])
         
-        respostas = conn.execute('''
-            SELECT r.*, a.nome as admin_nome, 
-                   strftime('%d/%m/%Y às %H:%M', r.data_resposta) as data_resposta_formatada
-            FROM respostas r
-            JOIN administradores a ON r.administrador_id = a.id
-            WHERE r.ocorrencia_id = ?
-            ORDER BY r.data_resposta DESC
-        ''', (ocorrencia_id,)).fetchall()
-        
-        historico = conn.execute('''
-            SELECT h.*, a.nome as admin_nome,
-                   strftime('%d/%m/%Y às %H:%M', h.data_mudanca) as data_mudanca_formatada
-            FROM historico_status h
-            JOIN administradores a ON h.administrador_id = a.id
-            WHERE h.ocorrencia_id = ?
-            ORDER BY h.data_mudanca DESC
-        ''', (ocorrencia_id,)).fetchall()
-        
-        conn.close()
-        
-        ocorrencia_dict = dict(ocorrencia)
-        if ocorrencia_dict.get('anexo'):
-            ocorrencia_dict['anexo'] = f"/uploads/{ocorrencia_dict['anexo']}"
-            
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
+
+@rotas.route('/admin/api/ocorrencias/detalhes')
+@admin_required
+def admin_detalhes_lote():
+    """Detalhes de várias ocorrências numa ida só (?ids=1,2,3), para o pré-carregamento do painel.
+
+    Responde na ordem pedida; ids inexistentes vão em nao_encontradas.
+    """
+    try:
+        ids = ler_ids()
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+
+    try:
+        detalhes = carregar_detalhes(get_conn(), ids, admin=True)
         return jsonify({
-            'ocorrencia': ocorrencia_dict,
-            'respostas': [dict(r) for r in respostas],
-            'historico': [dict(h) for h in historico]
+            'detalhes': [detalhes[i] for i in ids if i in detalhes],
+            'nao_encontradas': [i for i in ids if i not in detalhes]
         })
         
     except Exception as e:
-        return jsonify({'erro': str(e)}), 500
+        log.exception("❌ Erro ao buscar detalhes em lote: %s", e)
+        return jsonify({'erro': 'Erro ao carregar detalhes'}), 500
 
-@app.route('/admin/api/ocorrencias/<int:ocorrencia_id>/status', methods=['PUT'])
+@rotas.route('/admin/api/ocorrencias/<int:ocorrencia_id>/status', methods=['PUT'])
 @admin_required  
 def admin_alterar_status(ocorrencia_id):
     try:
@@ -470,8 +1195,14 @@ def admin_alterar_status(ocorrencia_id):
             VALUES (?, ?, ?, ?)
         ''', (ocorrencia_id, status_atual['status'], novo_status, session['admin_id']))
         
+        evento_id = canal_eventos.publicar(conn, 'status_alterado', ocorrencia_id, {
+            'id': ocorrencia_id,
+            'status_anterior': status_atual['status'],
+            'status': novo_status
+        })
         conn.commit()
-        conn.close()
+        canal_eventos.notificar()
+        invalidar_cache(['lista', f'ocorrencia:{ocorrencia_id}'], evento_id)
         
         return jsonify({
             'mensagem': f'Status alterado de {status_atual["status"]} para {novo_status}',
@@ -482,7 +1213,136 @@ def admin_alterar_status(ocorrencia_id):
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
-@app.route('/admin/api/responder', methods=['POST'])
+LOTE_ADMIN_MAXIMO = 500
+
+def ler_lote_admin(dados):
+    """Valida o corpo de /admin/api/ocorrencias/lote; retorna (ids, status, mensagem)"""
+    ids = []
+    for ocorrencia_id in dados.get('ids') or []:
+        if not isinstance(ocorrencia_id, int) or isinstance(ocorrencia_id, bool) or ocorrencia_id <= 0:
+            raise ValueError('Lista de ids inválida')
+        if ocorrencia_id not in ids:
+            ids.append(ocorrencia_id)
+    if not ids:
+        raise ValueError('Informe os ids das ocorrências')
+    if len(ids) > LOTE_ADMIN_MAXIMO:
+        raise ValueError(f'Máximo de {LOTE_ADMIN_MAXIMO} ocorrências por lote')
+
+    status = dados.get('status') or None
+    if status is not None and status not in STATUS:
+        raise ValueError('Status inválido')
+    mensagem = (dados.get('mensagem') or '').strip()
+    if not status and not mensagem:
+        raise ValueError('Informe o novo status e/ou a mensagem')
+    return ids, status, mensagem
+
+@rotas.route('/admin/api/ocorrencias/lote', methods=['POST'])
+@admin_required
+def admin_alterar_lote():
+    """Altera o status e/ou responde várias ocorrências numa única transação.
+
+    Corpo JSON: {"ids": [...], "status": "Resolvido", "mensagem": "..."}.
+    Mesmas regras das rotas individuais: a mudança de status entra no
+    histórico; a resposta sem status tira as pendentes para Em Andamento.
+    Responde o resultado por id: alterada, sem_alteracao ou nao_encontrada.
+    """
+    try:
+        ids, status, mensagem = ler_lote_admin(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+
+    admin_id = session['admin_id']
+    conn = get_conn()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        marcadores = ','.join('?' * len(ids))
+        atuais = dict(conn.execute(
+            f'SELECT id, status FROM ocorrencias WHERE id IN ({marcadores})', ids).fetchall())
+        encontradas = [i for i in ids if i in atuais]
+
+        destino = status
+        if status:
+            alterar = [i for i in encontradas if atuais[i] != status]
+        else:
+            # Só a mensagem: como /admin/api/responder
+            destino = 'Em Andamento'
+            alterar = [i for i in encontradas if atuais[i] == 'Pendente']
+
+        if alterar:
+            conn.execute(
+                f"UPDATE ocorrencias SET status = ? WHERE id IN ({','.join('?' * len(alterar))})",
+                (destino, *alterar)
+            )
+            if status:
+                conn.executemany('''
+                    INSERT INTO historico_status
+                    (ocorrencia_id, status_anterior, status_novo, administrador_id)
+                    VALUES (?, ?, ?, ?)
+                ''', [(i, atuais[i], status, admin_id) for i in alterar])
+
+        respostas = {}
+        if mensagem and encontradas:
+            anterior = conn.execute('SELECT COALESCE(MAX(id), 0) FROM respostas').fetchone()[0]
+            conn.executemany(
+                'INSERT INTO respostas (ocorrencia_id, administrador_id, mensagem) VALUES (?, ?, ?)',
+                [(i, admin_id, mensagem) for i in encontradas]
+            )
+            respostas = {
+                ocorrencia_id: resposta_id
+                for resposta_id, ocorrencia_id in conn.execute(
+                    'SELECT id, ocorrencia_id FROM respostas WHERE id > ?', (anterior,))
+            }
+
+        # Os mesmos eventos das rotas individuais, para o painel e o cache
+        eventos = []
+        if status:
+            eventos += [('status_alterado', i, {'id': i, 'status_anterior': atuais[i], 'status': status})
+                        for i in alterar]
+        for i in encontradas:
+            if i in respostas:
+                evento = {'ocorrencia_id': i, 'resposta_id': respostas[i]}
+                if not status and i in alterar:
+                    evento['status'] = destino
+                eventos.append(('resposta_criada', i, evento))
+        evento_ids = canal_eventos.publicar_lote(conn, eventos)
+        conn.commit()
+
+    except Exception as e:
+        conn.rollback()
+        log.exception("❌ Erro na alteração em lote: %s", e)
+        return jsonify({'erro': f'Erro interno: {str(e)}'}), 500
+
+    canal_eventos.notificar()
+    etiquetas = [f'ocorrencia:{i}' for i in encontradas if i in respostas or i in alterar]
+    if alterar:
+        etiquetas.append('lista')
+    if etiquetas:
+        invalidar_cache(etiquetas, evento_ids)
+
+    resultados = []
+    for i in ids:
+        if i not in atuais:
+            resultados.append({'id': i, 'resultado': 'nao_encontrada'})
+            continue
+        item = {
+            'id': i,
+            'resultado': 'alterada' if i in alterar or i in respostas else 'sem_alteracao',
+            'status_anterior': atuais[i],
+            'status': destino if i in alterar else atuais[i],
+        }
+        if i in respostas:
+            item['resposta_id'] = respostas[i]
+        resultados.append(item)
+
+    log.info("📦 Lote do admin %s: %d status alterados, %d respostas", admin_id, len(alterar), len(respostas))
+    return jsonify({
+        'mensagem': f'{len(alterar)} status alterado(s), {len(respostas)} resposta(s) enviada(s)',
+        'alteradas': len(alterar),
+        'respostas': len(respostas),
+        'resultados': resultados
+    })
+
+@rotas.route('/admin/api/responder', methods=['POST'])
 @admin_required
 def admin_responder():
     try:
@@ -492,21 +1352,22 @@ def admin_responder():
         
         if not ocorrencia_id or not mensagem:
             return jsonify({'erro': 'Ocorrência e mensagem são obrigatórios!'}), 400
-
-        nome_arquivo = None
-        if anexo and anexo.filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            nome_arquivo = f"resposta_{timestamp}_{anexo.filename}"
-            caminho_arquivo = os.path.join(app.config['UPLOAD_FOLDER'], nome_arquivo)
-            anexo.save(caminho_arquivo)
+        if not ocorrencia_id.isdigit():
+            return jsonify({'erro': 'Ocorrência inválida'}), 400
+        ocorrencia_id = int(ocorrencia_id)
 
         conn = get_conn()
         cursor = conn.cursor()
+
+        nome_arquivo = None
+        if anexo and anexo.filename:
+            nome_arquivo = armazenamento.salvar(conn, anexo)
         
         cursor.execute('''
             INSERT INTO respostas (ocorrencia_id, administrador_id, mensagem, anexo)
             VALUES (?, ?, ?, ?)
         ''', (ocorrencia_id, session['admin_id'], mensagem, nome_arquivo))
+        resposta_id = cursor.lastrowid
         
         cursor.execute('''
             UPDATE ocorrencias 
@@ -514,48 +1375,165 @@ def admin_responder():
             WHERE id = ? AND status = 'Pendente'
         ''', (ocorrencia_id,))
         
+        evento = {'ocorrencia_id': ocorrencia_id, 'resposta_id': resposta_id}
+        if cursor.rowcount:
+            evento['status'] = 'Em Andamento'
+        miniatura_agendada = gerador_miniaturas.enfileirar(conn, nome_arquivo)
+        evento_id = canal_eventos.publicar(conn, 'resposta_criada', ocorrencia_id, evento)
         conn.commit()
-        resposta_id = cursor.lastrowid
-        conn.close()
+        canal_eventos.notificar()
+        # A lista só muda se a resposta tirou a ocorrência de Pendente
+        invalidar_cache(
+            ['lista', f'ocorrencia:{ocorrencia_id}'] if 'status' in evento else [f'ocorrencia:{ocorrencia_id}'],
+            evento_id
+        )
+        if miniatura_agendada:
+            gerador_miniaturas.acordar()
         
         return jsonify({
             'mensagem': 'Resposta enviada com sucesso!',
             'id': resposta_id
         }), 201
 
+    except AnexoInvalido as e:
+        return jsonify({'erro': str(e)}), e.status
+
+    except RequestEntityTooLarge:
+        raise
+
     except Exception as e:
         return jsonify({'erro': f'Erro interno: {str(e)}'}), 500
 
 # ========== SERVIÇOS DE ARQUIVOS ==========
-@app.route('/uploads/<filename>')
+@rotas.app_errorhandler(413)
+def upload_muito_grande(e):
+    limite_mb = current_app.config['ANEXO_TAMANHO_MAXIMO'] // (1024 * 1024)
+    return jsonify({'erro': f'Anexo maior que o limite de {limite_mb} MB'}), 413
+
+# Anexos novos ficam em subpastas (aa/bb/<sha256>.ext); os antigos, na raiz
+UM_ANO = 365 * 24 * 3600
+
+@rotas.route('/uploads/<path:filename>')
 def servir_arquivo(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    """Entrega anexos com suporte a Range e cache condicional.
 
-# ========== ROTAS DE DEBUG ==========
-@app.route('/debug/banco')
-def debug_banco():
+    Anexos endereçados por conteúdo nunca mudam: recebem o SHA-256 como
+    ETag forte e Cache-Control immutable. Com ANEXOS_OFFLOAD a transferência
+    fica a cargo do proxy (X-Accel-Redirect ou X-Sendfile).
+    """
+    enderecado = ANEXO_ENDERECADO.match(filename)
+    etag = enderecado.group(1) if enderecado else True
+    max_age = UM_ANO if enderecado else 3600
+
+    if current_app.config['ANEXOS_OFFLOAD'] == 'x-accel':
+        caminho = safe_join(current_app.config['UPLOAD_FOLDER'], filename)
+        if caminho is None or not os.path.isfile(caminho):
+            return jsonify({'erro': 'Arquivo não encontrado'}), 404
+
+        if enderecado and request.if_none_match.contains(etag):
+            resposta = current_app.response_class(status=304)
+        else:
+            # Corpo vazio: o nginx lê o arquivo do location interno e trata o Range
+            resposta = current_app.response_class(
+                mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            )
+            resposta.headers['X-Accel-Redirect'] = current_app.config['ANEXOS_PREFIXO_INTERNO'] + filename
+        if enderecado:
+            resposta.set_etag(etag)
+    else:
+        resposta = send_from_directory(
+            current_app.config['UPLOAD_FOLDER'], filename,
+            etag=etag, max_age=max_age, conditional=True
+        )
+        resposta.accept_ranges = 'bytes'
+
+    resposta.cache_control.public = True
+    resposta.cache_control.max_age = max_age
+    if enderecado:
+        resposta.cache_control.immutable = True
+    return resposta
+
+@rotas.route('/miniaturas/<sha256>/<variante>')
+def servir_miniatura(sha256, variante):
+    """Miniatura/prévia WebP de um anexo de imagem (gerada sob demanda se faltar)"""
+    if not re.fullmatch(r'[0-9a-f]{64}', sha256):
+        return jsonify({'erro': 'Miniatura não encontrada'}), 404
+
+    caminho = gerador_miniaturas.garantir(sha256, variante)
+    if caminho is None:
+        # Sem derivado (Pillow ausente, imagem que não dá para reduzir): vale o original
+        with pool.conexao() as conn:
+            linha = conn.execute('SELECT caminho FROM anexos WHERE sha256 = ?', (sha256,)).fetchone()
+        if linha is None:
+            return jsonify({'erro': 'Miniatura não encontrada'}), 404
+        return redirect(url_for('sio.servir_arquivo', filename=linha['caminho']))
+
+    # O nome inclui o SHA-256 do original, então o conteúdo nunca muda
+    resposta = send_file(
+        os.path.abspath(caminho), mimetype='image/webp',
+        etag=f'{sha256}-{variante}', max_age=UM_ANO, conditional=True
+    )
+    resposta.cache_control.public = True
+    resposta.cache_control.immutable = True
+    return resposta
+
+@rotas.route('/estaticos/<path:nome>')
+def servir_estatico(nome):
+    """Estáticos versionados de static/dist (ver estaticos.py), com a cópia .br/.gz aceita pelo cliente"""
+    caminho = safe_join(manifesto_estaticos.pasta, nome)
+    if caminho is None or not os.path.isfile(caminho):
+        return jsonify({'erro': 'Arquivo não encontrado'}), 404
+
+    codificacao = escolher_codificacao(manifesto_estaticos.variantes(nome))
+    resposta = send_file(
+        os.path.abspath(caminho + SUFIXOS[codificacao] if codificacao else caminho),
+        mimetype=mimetypes.guess_type(nome)[0] or 'application/octet-stream',
+        etag=f"{nome}-{codificacao or 'identity'}", max_age=UM_ANO, conditional=True
+    )
+    if codificacao:
+        resposta.headers['Content-Encoding'] = codificacao
+    resposta.vary.add('Accept-Encoding')
+    # O hash do conteúdo está no nome: nunca muda
+    resposta.cache_control.public = True
+    resposta.cache_control.immutable = True
+    return resposta
+
+@rotas.route('/metrics')
+def expor_metricas():
+    """Métricas deste processo no formato texto do Prometheus"""
+    if not current_app.config['METRICAS']:
+        return jsonify({'erro': 'Métricas desativadas'}), 404
+    return Response(metricas.registro.expor(), mimetype='text/plain; version=0.0.4')
+
+# ========== SAÚDE (liveness/readiness) ==========
+@rotas.route('/saude/vivo')
+def saude_vivo():
+    """Liveness: o processo responde; não consulta o banco"""
+    return jsonify({'status': 'ok', 'pid': os.getpid()})
+
+@rotas.route('/saude/pronto')
+def saude_pronto():
+    """Readiness: há conexão livre e o banco já está na versão do código"""
     try:
-        conn = get_conn()
-        
-        cursor = conn.execute("SELECT COUNT(*) as total FROM ocorrencias")
-        total = cursor.fetchone()['total']
-        
-        ocorrencias = conn.execute('SELECT * FROM ocorrencias ORDER BY data DESC').fetchall()
-        conn.close()
-        
-        resultado = []
-        for o in ocorrencias:
-            resultado.append(dict(o))
-            
-        return jsonify({
-            'status': 'ok',
-            'total_ocorrencias': total,
-            'ocorrencias': resultado
-        })
+        versao = get_conn().execute('PRAGMA user_version').fetchone()[0]
     except Exception as e:
-        return jsonify({'erro': str(e)})
+        return jsonify({'status': 'indisponivel', 'erro': str(e)}), 503
+
+    if versao < VERSAO_ATUAL:
+        return jsonify({
+            'status': 'migrando', 'versao_banco': versao, 'versao_codigo': VERSAO_ATUAL
+        }), 503
+    return jsonify({'status': 'pronto', 'versao_banco': versao})
+
+# ========== ROTAS DE DEBUG ==========
+@rotas.route('/debug/banco')
+@admin_required
+def debug_banco():
+    """Despejo completo do banco, agora em NDJSON pelo mesmo caminho da exportação"""
+    fluxo, tipo, _ = exportacao.FORMATOS['ndjson']
+    return Response(fluxo(pool), mimetype=tipo)
 
-@app.route('/debug/adicionar-teste')
+@rotas.route('/debug/adicionar-teste')
 def adicionar_teste():
     try:
         conn = get_conn()
@@ -572,7 +1550,6 @@ def adicionar_teste():
         ))
         
         conn.commit()
-        conn.close()
         
         return jsonify({'mensagem': 'Ocorrência de teste adicionada!'})
         
@@ -580,11 +1557,19 @@ def adicionar_teste():
         return jsonify({'erro': str(e)})
 
 # --- INICIALIZAÇÃO ---
+# Produção: gunicorn -c gunicorn.conf.py "app:criar_app()"
+# Desenvolvimento: python app.py (servidor do Flask, um processo)
 if __name__ == '__main__':  
     print("  ⚠️ INICIANDO SISTEMA SIO...")  
+    app = criar_app()
     init_db()  
+    gerador_miniaturas.iniciar()
+    if app.config['INGESTAO'] == 'fila':
+        fila_ingestao.iniciar()
+    if app.config['ARQUIVAMENTO_DIAS'] > 0:
+        arquivador.iniciar()
     print("  🔴 Sistema pronto!")  
     print("  💡 Servidor: http://localhost:5000")  # ✅ MUDOU AQUI
     print("  🔴 Admin: http://localhost:5000/admin")  # ✅ MUDOU AQUI  
     print("  🔴 Credenciais: usuario='admin', senha='admin123'")  
-    app.run(debug=True, host='0.0.0.0', port=5000)  # ✅ Este está correto!
\ No newline at end of file
+    app.run(debug=os.environ.get('SIO_DEBUG', '1') == '1', host='0.0.0.0', port=5000)  # ✅ Este está correto!
\ No newline at end of file
@@ -0,0 +1,396 @@
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:   # Windows: sem trava entre processos
+    fcntl = None
+
+# Arquivamento das ocorrências resolvidas antigas.
+#
+# O banco de arquivo (database/arquivo.db) é anexado a toda conexão do pool
+# como `arquivo` quando o arquivamento está ligado ou o arquivo já existe, e
+# tem as mesmas tabelas ocorrencias/respostas/historico_status.
+# As listagens, a busca e os filtros só enxergam o banco principal; o
+# detalhe por id cai no arquivo quando não acha a ocorrência (ver
+# carregar_detalhes em app.py). As estatísticas continuam contando as
+# arquivadas (migração 011).
+#
+# A idade conta a partir da resolução (a última mudança para Resolvido no
+# histórico, ou a data de registro se não houver histórico): uma ocorrência
+# antiga resolvida ontem ainda não vai para o arquivo.
+#
+# Cada lote é movido em duas transações: primeiro a cópia para o arquivo
+# (INSERT OR REPLACE), depois a remoção do principal, só do que está igual
+# nos dois lados. Em WAL o commit de bancos anexados não é atômico entre
+# arquivos, então a ordem garante que nada se perde: uma queda entre as
+# duas deixa a ocorrência nos dois bancos e a próxima execução termina a
+# remoção. Uma ocorrência alterada no meio do caminho (nova resposta,
+# reaberta) fica no principal e a cópia é descartada.
+
+APELIDO = 'arquivo'
+TAMANHO_LOTE = 500
+
+# Resolvida antes do corte: pela última resolução registrada, senão pela data de registro
+RESOLVIDA_ANTES = '''
+    status = 'Resolvido'
+    AND COALESCE((
+        SELECT MAX(h.data_mudanca) FROM historico_status h
+        WHERE h.ocorrencia_id = ocorrencias.id AND h.status_novo = 'Resolvido'
+    ), data) < ?
+'''
+PAUSA_LOTE = 0.05      # segundos entre lotes, para as escritas da aplicação passarem
+
+log = logging.getLogger('sio.arquivamento')
+
+
+def anexar_arquivo(conn, caminho):
+    """ATTACH do banco de arquivo numa conexão avulsa (scripts)"""
+    conn.execute(f'ATTACH DATABASE ? AS {APELIDO}', (caminho,))
+    conn.execute(f'PRAGMA {APELIDO}.journal_mode = WAL')
+
+
+def arquivo_anexado(conn):
+    return any(linha[1] == APELIDO for linha in conn.execute('PRAGMA database_list'))
+
+
+def arquivo_disponivel(conn):
+    """O banco de arquivo está anexado e tem o esquema?"""
+    if not arquivo_anexado(conn):
+        return False
+    return conn.execute(
+        f"SELECT 1 FROM {APELIDO}.sqlite_master WHERE type = 'table' AND name = 'ocorrencias'"
+    ).fetchone() is not None
+
+
+def garantir_esquema(conn):
+    """Cria as tabelas do arquivo se faltarem (o arquivo não passa pelas migrações)"""
+    conn.executescript(f'''
+        CREATE TABLE IF NOT EXISTS {APELIDO}.ocorrencias (
+            id INTEGER PRIMARY KEY,
+            titulo TEXT NOT NULL,
+            descricao TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            anexo TEXT,
+            status TEXT,
+            data DATETIME,
+            arquivado_em DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS {APELIDO}.respostas (
+            id INTEGER PRIMARY KEY,
+            ocorrencia_id INTEGER NOT NULL,
+            administrador_id INTEGER NOT NULL,
+            mensagem TEXT NOT NULL,
+            anexo TEXT,
+            data_resposta DATETIME
+        );
+        CREATE TABLE IF NOT EXISTS {APELIDO}.historico_status (
+            id INTEGER PRIMARY KEY,
+            ocorrencia_id INTEGER NOT NULL,
+            status_anterior TEXT NOT NULL,
+            status_novo TEXT NOT NULL,
+            administrador_id INTEGER NOT NULL,
+            data_mudanca DATETIME
+        );
+        CREATE INDEX IF NOT EXISTS {APELIDO}.idx_respostas_ocorrencia
+            ON respostas (ocorrencia_id, data_resposta);
+        CREATE INDEX IF NOT EXISTS {APELIDO}.idx_historico_ocorrencia
+            ON historico_status (ocorrencia_id, data_mudanca);
+        CREATE TABLE IF NOT EXISTS {APELIDO}.execucoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            inicio DATETIME NOT NULL,
+            fim DATETIME,
+            corte DATETIME NOT NULL,
+            movidas INTEGER NOT NULL DEFAULT 0,
+            situacao TEXT NOT NULL DEFAULT 'rodando'
+        );
+    ''')
+
+
+def _marcadores(ids):
+    return ','.join('?' * len(ids))
+
+
+def copiar_lote(conn, ids):
+    """Fase 1: copia ocorrências, respostas e histórico para o arquivo"""
+    marcadores = _marcadores(ids)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute(f'''
+            INSERT OR REPLACE INTO {APELIDO}.ocorrencias (id, titulo, descricao, categoria, anexo, status, data)
+            SELECT id, titulo, descricao, categoria, anexo, status, data
+            FROM main.ocorrencias WHERE id IN ({marcadores})
+        ''', ids)
+        conn.execute(f'''
+            INSERT OR REPLACE INTO {APELIDO}.respostas
+            SELECT id, ocorrencia_id, administrador_id, mensagem, anexo, data_resposta
+            FROM main.respostas WHERE ocorrencia_id IN ({marcadores})
+        ''', ids)
+        conn.execute(f'''
+            INSERT OR REPLACE INTO {APELIDO}.historico_status
+            SELECT id, ocorrencia_id, status_anterior, status_novo, administrador_id, data_mudanca
+            FROM main.historico_status WHERE ocorrencia_id IN ({marcadores})
+        ''', ids)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def remover_lote(conn, ids):
+    """Fase 2: remove do principal o que já está no arquivo; retorna quantas saíram.
+
+    Só sai a ocorrência ainda resolvida, com a mesma situação no arquivo e
+    sem resposta/histórico que não tenha sido copiado. As demais continuam
+    no principal e a cópia delas é descartada.
+    """
+    marcadores = _marcadores(ids)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute(f'''
+            INSERT INTO arquivando (ocorrencia_id)
+            SELECT o.id FROM main.ocorrencias o
+            JOIN {APELIDO}.ocorrencias a ON a.id = o.id
+            WHERE o.id IN ({marcadores})
+              AND o.status = 'Resolvido' AND a.status IS o.status
+              AND NOT EXISTS (
+                  SELECT 1 FROM main.respostas r
+                  WHERE r.ocorrencia_id = o.id
+                    AND r.id NOT IN (SELECT id FROM {APELIDO}.respostas WHERE ocorrencia_id = o.id)
+              )
+              AND NOT EXISTS (
+                  SELECT 1 FROM main.historico_status h
+                  WHERE h.ocorrencia_id = o.id
+                    AND h.id NOT IN (SELECT id FROM {APELIDO}.historico_status WHERE ocorrencia_id = o.id)
+              )
+        ''', ids)
+
+        # Respostas e histórico saem antes da ocorrência: os bancos antigos
+        # declaram FOREIGN KEY nessas tabelas. Os triggers de busca, fila e
+        # contadores das respostas ignoram os ids em `arquivando` (migrações
+        # 011 e 015); o da ocorrência tira a linha do índice e da fila
+        for tabela in ('respostas', 'historico_status'):
+            conn.execute(f'''
+                DELETE FROM main.{tabela}
+                WHERE ocorrencia_id IN (SELECT ocorrencia_id FROM arquivando)
+            ''')
+        movidas = conn.execute(
+            'DELETE FROM main.ocorrencias WHERE id IN (SELECT ocorrencia_id FROM arquivando)'
+        ).rowcount
+
+        # Cópias de ocorrências que ficaram no principal
+        for tabela, coluna in (('respostas', 'ocorrencia_id'), ('historico_status', 'ocorrencia_id'),
+                               ('ocorrencias', 'id')):
+            conn.execute(f'''
+                DELETE FROM {APELIDO}.{tabela}
+                WHERE {coluna} IN ({marcadores})
+                  AND {coluna} NOT IN (SELECT ocorrencia_id FROM arquivando)
+            ''', ids)
+
+        conn.execute('DELETE FROM arquivando')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return movidas
+
+
+class Arquivador:
+    """Job periódico que move as resolvidas com mais de `dias` dias para o arquivo"""
+
+    def __init__(self, pool, dias, intervalo=24 * 3600, tamanho_lote=TAMANHO_LOTE,
+                 pausa=PAUSA_LOTE, trava=None):
+        self.pool = pool
+        self.dias = dias
+        self.intervalo = intervalo
+        self.tamanho_lote = tamanho_lote
+        self.pausa = pausa
+        self.trava = trava          # arquivo de trava: um processo por vez entre os workers
+        self._lock = threading.Lock()
+        self._execucao = threading.Lock()
+        self._acordar = threading.Event()
+        self._thread = None
+        self._progresso = {
+            'rodando': False, 'inicio': None, 'fim': None, 'corte': None,
+            'candidatas': 0, 'movidas': 0, 'mantidas': 0, 'lotes': 0, 'erro': None,
+        }
+
+    def progresso(self):
+        with self._lock:
+            dados = dict(self._progresso)
+        if dados['candidatas']:
+            dados['percentual'] = round(100 * (dados['movidas'] + dados['mantidas']) / dados['candidatas'], 1)
+        return dados
+
+    def _atualizar(self, **campos):
+        with self._lock:
+            self._progresso.update(campos)
+
+    def corte(self, dias=None):
+        """Data limite (UTC, formato do SQLite): resolvidas antes dela são arquivadas"""
+        instante = datetime.now(timezone.utc).timestamp() - (self.dias if dias is None else dias) * 86400
+        return datetime.fromtimestamp(instante, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+    def executar(self, dias=None):
+        """Uma execução completa; retorna quantas ocorrências foram movidas (None se já há outra rodando)"""
+        if not self._execucao.acquire(blocking=False):
+            return None
+        try:
+            trava = self._travar()
+            if trava is False:
+                log.info("⏭️ Arquivamento já em execução em outro processo")
+                return None
+            try:
+                return self._executar(self.corte(dias))
+            finally:
+                if trava is not None:
+                    trava.close()
+        finally:
+            self._execucao.release()
+
+    def _travar(self):
+        if not self.trava or fcntl is None:
+            return None
+        arquivo = open(self.trava, 'a')
+        try:
+            fcntl.flock(arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            arquivo.close()
+            return False
+        return arquivo
+
+    def _executar(self, corte):
+        inicio = time.monotonic()
+        self._atualizar(rodando=True, inicio=datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                        fim=None, corte=corte, candidatas=0, movidas=0, mantidas=0, lotes=0, erro=None)
+
+        with self.pool.conexao() as conn:
+            garantir_esquema(conn)
+            execucao = conn.execute(
+                f"INSERT INTO {APELIDO}.execucoes (inicio, corte) VALUES (datetime('now'), ?)", (corte,)
+            ).lastrowid
+            conn.commit()
+
+            try:
+                # Sobra de uma execução interrompida entre cópia e remoção
+                pendentes = [linha[0] for linha in conn.execute(
+                    f'SELECT o.id FROM main.ocorrencias o JOIN {APELIDO}.ocorrencias a ON a.id = o.id'
+                )]
+                candidatas = conn.execute(f'''
+                    SELECT COUNT(*) FROM ocorrencias
+                    WHERE {RESOLVIDA_ANTES}
+                      AND id NOT IN (SELECT id FROM {APELIDO}.ocorrencias)
+                ''', (corte,)).fetchone()[0]
+                self._atualizar(candidatas=candidatas + len(pendentes))
+                if pendentes:
+                    log.info("♻️ Retomando %d ocorrências de um arquivamento interrompido", len(pendentes))
+
+                ultimo_id = 0
+                while True:
+                    if pendentes:
+                        ids, pendentes = pendentes[:self.tamanho_lote], pendentes[self.tamanho_lote:]
+                    else:
+                        ids = [linha[0] for linha in conn.execute(f'''
+                            SELECT id FROM ocorrencias
+                            WHERE {RESOLVIDA_ANTES} AND id > ?
+                            ORDER BY id LIMIT ?
+                        ''', (corte, ultimo_id, self.tamanho_lote))]
+                        if not ids:
+                            break
+                        ultimo_id = ids[-1]
+
+                    copiar_lote(conn, ids)
+                    movidas = remover_lote(conn, ids)
+                    with self._lock:
+                        self._progresso['lotes'] += 1
+                        self._progresso['movidas'] += movidas
+                        self._progresso['mantidas'] += len(ids) - movidas
+                        total = self._progresso['movidas']
+                    conn.execute(f'UPDATE {APELIDO}.execucoes SET movidas = ? WHERE id = ?', (total, execucao))
+                    conn.commit()
+                    log.debug("📦 Lote arquivado: %d de %d (total %d)", movidas, len(ids), total)
+                    time.sleep(self.pausa)
+
+                situacao = 'concluida'
+            except Exception as e:
+                situacao = 'falhou'
+                self._atualizar(erro=str(e))
+                log.exception("❌ Falha no arquivamento: %s", e)
+            finally:
+                conn.execute(f"UPDATE {APELIDO}.execucoes SET fim = datetime('now'), situacao = ? WHERE id = ?",
+                             (situacao, execucao))
+                conn.commit()
+
+        movidas = self.progresso()['movidas']
+        self._atualizar(rodando=False, fim=datetime.now(timezone.utc).isoformat(timespec='seconds'))
+        if movidas:
+            log.info("🗄️ %d ocorrências arquivadas em %.1fs (corte %s)", movidas, time.monotonic() - inicio, corte)
+        return movidas
+
+    # ---------- agendamento ----------
+
+    def iniciar(self):
+        """Sobe a thread que executa a cada `intervalo` segundos"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._agendar, name='arquivamento', daemon=True)
+            self._thread.start()
+
+    def executar_agora(self, dias=None):
+        """Execução fora do horário, em segundo plano; False se já há uma rodando"""
+        if self._execucao.locked():
+            return False
+        if self._thread is not None and dias is None:
+            self._acordar.set()
+        else:
+            threading.Thread(target=self.executar, args=(dias,), name='arquivamento-manual', daemon=True).start()
+        return True
+
+    def _agendar(self):
+        while True:
+            try:
+                self.executar()
+            except Exception as e:
+                log.exception("❌ Falha no arquivamento: %s", e)
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Move as ocorrências resolvidas antigas para o banco de arquivo')
+    parser.add_argument('--banco', default='database/ocorrencias.db')
+    parser.add_argument('--arquivo', default='database/arquivo.db')
+    parser.add_argument('--dias', type=int, default=365, help='dias desde a resolução')
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE)
+    args = parser.parse_args(argv)
+
+    from conexao import PoolConexoes
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    pool = PoolConexoes(args.banco, tamanho=1, bancos_anexados={APELIDO: args.arquivo})
+    arquivador = Arquivador(pool, args.dias, tamanho_lote=args.lote, pausa=0,
+                            trava=os.path.join(os.path.dirname(args.arquivo) or '.', 'arquivamento.trava'))
+
+    print(f"🗄️ Arquivando resolvidas anteriores a {arquivador.corte()} em {args.arquivo}")
+    threading.Thread(target=arquivador.executar, daemon=True).start()
+    time.sleep(0.1)
+    while arquivador.progresso()['rodando']:
+        progresso = arquivador.progresso()
+        print(f"  📦 {progresso['movidas']}/{progresso['candidatas']} ({progresso.get('percentual', 0)}%)",
+              end='\r', flush=True)
+        time.sleep(0.5)
+
+    progresso = arquivador.progresso()
+    print(f"\n✅ {progresso['movidas']} arquivadas, {progresso['mantidas']} mantidas")
+    pool.fechar_todas()
+    return 1 if progresso['erro'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,477 @@
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import platform
+import threading
+import subprocess
+import http.client
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit, urlencode
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+try:
+    import resource
+except ImportError:   # Windows: sem pico de RSS do próprio processo
+    resource = None
+
+# Gerador de carga e relatório de latência das rotas quentes.
+#
+#   python benchmark/carga.py --banco benchmark/dados/bench-10000.db                # test client
+#   python benchmark/carga.py --banco ... --servidor gunicorn --workers 4           # servidor real
+#   python benchmark/carga.py --banco ... --url http://127.0.0.1:5000               # servidor já no ar
+#   python benchmark/carga.py ... --salvar base.json
+#   python benchmark/carga.py ... --comparar base.json --tolerancia 0.2              # sai com 1 se piorou
+#
+# Cada thread de carga escolhe um cenário pelo peso do perfil, mede a
+# requisição inteira (incluindo a leitura do corpo) e guarda a latência.
+
+ADMIN = ('admin', 'admin123')
+CATEGORIAS = ('Infraestrutura', 'Equipamento', 'Limpeza', 'Segurança', 'Outros')
+STATUS = ('Pendente', 'Em Andamento', 'Resolvido')
+TERMOS_BUSCA = ('vazamento', 'projetor', 'bloco', 'lampada', 'extintor', 'wifi', 'limpeza banheiro')
+
+
+# ---------- cenários ----------
+# Cada cenário recebe (aleatorio, contexto) e devolve (metodo, caminho, corpo, admin)
+
+def _lista(aleatorio, ctx):
+    return 'GET', '/api/ocorrencias?limite=20', None, False
+
+def _lista_filtrada(aleatorio, ctx):
+    parametros = {'categoria': aleatorio.choice(CATEGORIAS), 'status': aleatorio.choice(STATUS)}
+    return 'GET', '/api/ocorrencias?' + urlencode(parametros), None, False
+
+def _lista_pagina_profunda(aleatorio, ctx):
+    return 'GET', '/api/ocorrencias?' + urlencode({'cursor': aleatorio.choice(ctx['cursores'])}), None, False
+
+def _detalhe(aleatorio, ctx):
+    return 'GET', f"/api/ocorrencia/{aleatorio.randint(1, ctx['max_id'])}", None, False
+
+def _estatisticas(aleatorio, ctx):
+    return 'GET', '/api/estatisticas', None, False
+
+def _busca(aleatorio, ctx):
+    return 'GET', '/api/busca?' + urlencode({'q': aleatorio.choice(TERMOS_BUSCA)}), None, False
+
+def _registrar(aleatorio, ctx):
+    corpo = {'titulo': 'Ocorrência de carga', 'descricao': 'Gerada pelo benchmark de carga.',
+             'categoria': aleatorio.choice(CATEGORIAS)}
+    return 'POST', '/api/registrar', corpo, False
+
+def _admin_lista(aleatorio, ctx):
+    return 'GET', '/admin/api/ocorrencias?' + urlencode({'status': aleatorio.choice(STATUS)}), None, True
+
+def _admin_estatisticas(aleatorio, ctx):
+    return 'GET', '/admin/api/estatisticas', None, True
+
+def _admin_detalhe(aleatorio, ctx):
+    return 'GET', f"/admin/api/ocorrencias/{aleatorio.randint(1, ctx['max_id'])}", None, True
+
+
+CENARIOS = {
+    'lista': _lista,
+    'lista_filtrada': _lista_filtrada,
+    'lista_pagina_profunda': _lista_pagina_profunda,
+    'detalhe': _detalhe,
+    'estatisticas': _estatisticas,
+    'busca': _busca,
+    'registrar': _registrar,
+    'admin_lista': _admin_lista,
+    'admin_estatisticas': _admin_estatisticas,
+    'admin_detalhe': _admin_detalhe,
+}
+
+PERFIS = {
+    'leitura': {'lista': 30, 'lista_filtrada': 15, 'lista_pagina_profunda': 5, 'detalhe': 25,
+                'estatisticas': 10, 'busca': 15},
+    'misto': {'lista': 25, 'lista_filtrada': 10, 'lista_pagina_profunda': 5, 'detalhe': 20,
+              'estatisticas': 10, 'busca': 10, 'registrar': 5, 'admin_lista': 8,
+              'admin_estatisticas': 4, 'admin_detalhe': 3},
+    'admin': {'admin_lista': 50, 'admin_estatisticas': 20, 'admin_detalhe': 30},
+    'escrita': {'registrar': 100},
+}
+
+
+def preparar_contexto(banco):
+    """Dados do banco usados pelos cenários (maior id, cursores de páginas fundas)"""
+    conn = sqlite3.connect(banco)
+    max_id = conn.execute('SELECT COALESCE(MAX(id), 1) FROM ocorrencias').fetchone()[0]
+    total = conn.execute('SELECT COUNT(*) FROM ocorrencias').fetchone()[0]
+
+    import app as aplicacao
+    cursores = []
+    for fracao in (0.1, 0.25, 0.5, 0.75, 0.9):
+        linha = conn.execute('''
+            SELECT data, id FROM ocorrencias ORDER BY data DESC, id DESC LIMIT 1 OFFSET ?
+        ''', (int(total * fracao),)).fetchone()
+        if linha:
+            cursores.append(aplicacao.codificar_cursor(*linha))
+    conn.close()
+    return {'max_id': max_id, 'total': total, 'cursores': cursores or ['']}
+
+
+# ---------- clientes ----------
+
+class ClienteTeste:
+    """Flask test client (sem rede): mede só a aplicação"""
+
+    def __init__(self, aplicacao):
+        self.aplicacao = aplicacao
+        login = aplicacao.test_client()
+        resposta = login.post('/admin/login', json={'usuario': ADMIN[0], 'senha': ADMIN[1]})
+        if resposta.status_code != 200:
+            raise RuntimeError(f'Login admin falhou: {resposta.status_code}')
+        self.sessao_admin = login.get_cookie(aplicacao.config['SESSION_COOKIE_NAME']).value
+        self._local = threading.local()
+
+    def _clientes(self):
+        # Um par de clientes por thread: o test client não é feito para uso concorrente
+        if not hasattr(self._local, 'publico'):
+            self._local.publico = self.aplicacao.test_client()
+            self._local.admin = self.aplicacao.test_client()
+            self._local.admin.set_cookie(self.aplicacao.config['SESSION_COOKIE_NAME'], self.sessao_admin)
+        return self._local.publico, self._local.admin
+
+    def requisitar(self, metodo, caminho, corpo, admin):
+        publico, privado = self._clientes()
+        cliente = privado if admin else publico
+        resposta = cliente.open(caminho, method=metodo, data=corpo)
+        tamanho = len(resposta.get_data())
+        resposta.close()
+        return resposta.status_code, tamanho
+
+
+class ClienteHttp:
+    """Conexão keep-alive por thread contra um servidor de verdade"""
+
+    def __init__(self, url):
+        partes = urlsplit(url)
+        self.host, self.porta = partes.hostname, partes.port or 80
+        self.cookie_admin = self._login()
+        self._local = threading.local()
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = self._local.conexao = http.client.HTTPConnection(self.host, self.porta, timeout=30)
+        return conexao
+
+    def _login(self):
+        conexao = http.client.HTTPConnection(self.host, self.porta, timeout=30)
+        conexao.request('POST', '/admin/login', json.dumps({'usuario': ADMIN[0], 'senha': ADMIN[1]}),
+                        {'Content-Type': 'application/json'})
+        resposta = conexao.getresponse()
+        resposta.read()
+        if resposta.status != 200:
+            raise RuntimeError(f'Login admin falhou: {resposta.status}')
+        cookie = SimpleCookie(resposta.getheader('Set-Cookie', ''))
+        conexao.close()
+        return '; '.join(f'{nome}={valor.value}' for nome, valor in cookie.items())
+
+    def requisitar(self, metodo, caminho, corpo, admin):
+        cabecalhos = {}
+        dados = None
+        if corpo is not None:
+            dados = urlencode(corpo)
+            cabecalhos['Content-Type'] = 'application/x-www-form-urlencoded'
+        if admin:
+            cabecalhos['Cookie'] = self.cookie_admin
+
+        for tentativa in (1, 2):
+            conexao = self._conexao()
+            try:
+                conexao.request(metodo, caminho, dados, cabecalhos)
+                resposta = conexao.getresponse()
+                tamanho = len(resposta.read())
+                return resposta.status, tamanho
+            except (http.client.HTTPException, ConnectionError):
+                # Keep-alive fechado pelo servidor (ex.: max_requests): reconecta uma vez
+                conexao.close()
+                self._local.conexao = None
+                if tentativa == 2:
+                    raise
+
+
+# ---------- servidor real ----------
+
+def _rss_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as arquivo:
+            for linha in arquivo:
+                if linha.startswith('VmRSS:'):
+                    return int(linha.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _filhos(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as arquivo:
+            return [int(p) for p in arquivo.read().split()]
+    except OSError:
+        return []
+
+
+class ServidorGunicorn:
+    """Sobe o gunicorn do projeto contra o banco do benchmark e acompanha o RSS"""
+
+    def __init__(self, banco, workers, threads, porta):
+        self.url = f'http://127.0.0.1:{porta}'
+        ambiente = dict(os.environ, SIO_DB_PATH=os.path.abspath(banco), SIO_WORKERS=str(workers),
+                        SIO_THREADS=str(threads), SIO_BIND=f'127.0.0.1:{porta}',
+                        SIO_LOG_NIVEL='WARNING')
+        self.processo = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:criar_app()'],
+            cwd=RAIZ, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self.pico_rss_kb = 0
+        self._parar = threading.Event()
+        self._aguardar_pronto()
+        threading.Thread(target=self._amostrar_rss, daemon=True).start()
+
+    def _aguardar_pronto(self, limite=30):
+        partes = urlsplit(self.url)
+        fim = time.monotonic() + limite
+        while time.monotonic() < fim:
+            try:
+                conexao = http.client.HTTPConnection(partes.hostname, partes.port, timeout=2)
+                conexao.request('GET', '/saude/pronto')
+                if conexao.getresponse().status == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        self.parar()
+        raise RuntimeError('Servidor não ficou pronto a tempo')
+
+    def _amostrar_rss(self):
+        while not self._parar.wait(0.2):
+            pids = [self.processo.pid] + _filhos(self.processo.pid)
+            self.pico_rss_kb = max(self.pico_rss_kb, sum(_rss_kb(pid) for pid in pids))
+
+    def parar(self):
+        self._parar.set()
+        self.processo.terminate()
+        try:
+            self.processo.wait(15)
+        except subprocess.TimeoutExpired:
+            self.processo.kill()
+
+
+# ---------- execução e relatório ----------
+
+def percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return 0.0
+    indice = min(len(valores_ordenados) - 1, max(0, int(round(p / 100 * len(valores_ordenados))) - 1))
+    return valores_ordenados[indice]
+
+
+def executar(cliente, contexto, perfil, concorrencia, duracao, aquecimento, semente):
+    nomes = list(perfil)
+    pesos = [perfil[n] for n in nomes]
+    amostras = {nome: [] for nome in nomes}
+    erros = {nome: 0 for nome in nomes}
+    bytes_recebidos = [0]
+    lock = threading.Lock()
+    inicio_medicao = time.monotonic() + aquecimento
+    fim = inicio_medicao + duracao
+
+    def trabalhar(numero):
+        aleatorio = random.Random(semente + numero)
+        locais = {nome: [] for nome in nomes}
+        locais_erros = {nome: 0 for nome in nomes}
+        recebidos = 0
+        while True:
+            agora = time.monotonic()
+            if agora >= fim:
+                break
+            nome = aleatorio.choices(nomes, weights=pesos)[0]
+            metodo, caminho, corpo, admin = CENARIOS[nome](aleatorio, contexto)
+            inicio = time.perf_counter()
+            try:
+                status, tamanho = cliente.requisitar(metodo, caminho, corpo, admin)
+            except Exception:
+                status, tamanho = 0, 0
+            decorrido = time.perf_counter() - inicio
+            if agora < inicio_medicao:
+                continue
+            if status >= 400 or status == 0:
+                locais_erros[nome] += 1
+            else:
+                locais[nome].append(decorrido)
+                recebidos += tamanho
+        with lock:
+            for nome in nomes:
+                amostras[nome].extend(locais[nome])
+                erros[nome] += locais_erros[nome]
+            bytes_recebidos[0] += recebidos
+
+    threads = [threading.Thread(target=trabalhar, args=(i,)) for i in range(concorrencia)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    cenarios = {}
+    for nome in nomes:
+        valores = sorted(amostras[nome])
+        cenarios[nome] = {
+            'requisicoes': len(valores),
+            'erros': erros[nome],
+            'rps': round(len(valores) / duracao, 1),
+            'p50_ms': round(percentil(valores, 50) * 1000, 2),
+            'p95_ms': round(percentil(valores, 95) * 1000, 2),
+            'p99_ms': round(percentil(valores, 99) * 1000, 2),
+        }
+    todas = sorted(v for lista in amostras.values() for v in lista)
+    total = {
+        'requisicoes': len(todas),
+        'erros': sum(erros.values()),
+        'rps': round(len(todas) / duracao, 1),
+        'p50_ms': round(percentil(todas, 50) * 1000, 2),
+        'p95_ms': round(percentil(todas, 95) * 1000, 2),
+        'p99_ms': round(percentil(todas, 99) * 1000, 2),
+        'mb_recebidos': round(bytes_recebidos[0] / 1024 / 1024, 2),
+    }
+    return cenarios, total
+
+
+def imprimir(resultado):
+    print(f"\n📊 {resultado['alvo']} | perfil {resultado['perfil']} | "
+          f"{resultado['concorrencia']} threads | {resultado['duracao']}s | "
+          f"{resultado['banco_ocorrencias']} ocorrências")
+    print(f"{'cenário':<24}{'req':>8}{'erros':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for nome, dados in sorted(resultado['cenarios'].items()):
+        print(f"{nome:<24}{dados['requisicoes']:>8}{dados['erros']:>7}{dados['rps']:>9}"
+              f"{dados['p50_ms']:>9}{dados['p95_ms']:>9}{dados['p99_ms']:>9}")
+    total = resultado['total']
+    print(f"{'TOTAL':<24}{total['requisicoes']:>8}{total['erros']:>7}{total['rps']:>9}"
+          f"{total['p50_ms']:>9}{total['p95_ms']:>9}{total['p99_ms']:>9}")
+    if resultado.get('pico_rss_mb'):
+        print(f"💾 Pico de RSS: {resultado['pico_rss_mb']} MB")
+
+
+def comparar(resultado, base, tolerancia, folga_ms=2.0):
+    """Lista de regressões (p95 ou p99 acima da base além da tolerância, ou rps abaixo)"""
+    regressoes = []
+    for nome, atual in resultado['cenarios'].items():
+        anterior = base.get('cenarios', {}).get(nome)
+        if not anterior or not atual['requisicoes']:
+            continue
+        for chave in ('p95_ms', 'p99_ms'):
+            limite = anterior[chave] * (1 + tolerancia) + folga_ms
+            if atual[chave] > limite:
+                regressoes.append(f"{nome}: {chave} {anterior[chave]} -> {atual[chave]} (limite {limite:.2f})")
+        if anterior['rps'] and atual['rps'] < anterior['rps'] * (1 - tolerancia):
+            regressoes.append(f"{nome}: rps {anterior['rps']} -> {atual['rps']}")
+        if atual['erros'] > anterior['erros']:
+            regressoes.append(f"{nome}: erros {anterior['erros']} -> {atual['erros']}")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de carga do SIO')
+    parser.add_argument('--banco', required=True, help='banco gerado por benchmark/semear.py')
+    parser.add_argument('--perfil', choices=sorted(PERFIS), default='misto')
+    parser.add_argument('--concorrencia', type=int, default=8)
+    parser.add_argument('--duracao', type=float, default=20.0, help='segundos medidos')
+    parser.add_argument('--aquecimento', type=float, default=2.0)
+    parser.add_argument('--semente', type=int, default=42)
+    alvo = parser.add_mutually_exclusive_group()
+    alvo.add_argument('--url', help='servidor já em execução')
+    alvo.add_argument('--servidor', choices=['gunicorn'], help='sobe o servidor para o teste')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--porta', type=int, default=5055)
+    parser.add_argument('--salvar', help='grava o resultado em JSON (ex.: linha de base)')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior')
+    parser.add_argument('--tolerancia', type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.banco):
+        parser.error(f'{args.banco} não existe; gere com benchmark/semear.py')
+
+    # Os cenários de escrita alteram o banco: roda numa cópia para manter a base reprodutível
+    banco = args.banco
+    if 'registrar' in PERFIS[args.perfil]:
+        banco = args.banco + '.carga.db'
+        origem = sqlite3.connect(args.banco)
+        destino = sqlite3.connect(banco)
+        origem.backup(destino)
+        origem.close()
+        destino.close()
+
+    contexto = preparar_contexto(banco)
+    servidor = None
+    os.environ.setdefault('SIO_LOG_NIVEL', 'WARNING')
+
+    if args.servidor:
+        servidor = ServidorGunicorn(banco, args.workers, args.threads, args.porta)
+        cliente, nome_alvo = ClienteHttp(servidor.url), f'gunicorn ({args.workers}x{args.threads})'
+    elif args.url:
+        cliente, nome_alvo = ClienteHttp(args.url), args.url
+    else:
+        import app as aplicacao
+        flask_app = aplicacao.criar_app({'DB_PATH': banco, 'DB_POOL': max(8, args.concorrencia)})
+        aplicacao.init_db()
+        cliente, nome_alvo = ClienteTeste(flask_app), 'test client'
+
+    try:
+        cenarios, total = executar(cliente, contexto, PERFIS[args.perfil], args.concorrencia,
+                                   args.duracao, args.aquecimento, args.semente)
+    finally:
+        if servidor:
+            servidor.parar()
+
+    if servidor:
+        pico_kb = servidor.pico_rss_kb
+    elif resource and not args.url:
+        pico_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            pico_kb //= 1024
+    else:
+        pico_kb = 0
+
+    resultado = {
+        'alvo': nome_alvo,
+        'perfil': args.perfil,
+        'concorrencia': args.concorrencia,
+        'duracao': args.duracao,
+        'banco_ocorrencias': contexto['total'],
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'quando': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'pico_rss_mb': round(pico_kb / 1024, 1),
+        'cenarios': cenarios,
+        'total': total,
+    }
+    imprimir(resultado)
+
+    if args.salvar:
+        with open(args.salvar, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+        print(f"💾 Resultado salvo em {args.salvar}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            base = json.load(arquivo)
+        regressoes = comparar(resultado, base, args.tolerancia)
+        if regressoes:
+            print(f"\n❌ {len(regressoes)} regressão(ões) em relação a {args.comparar}:")
+            for linha in regressoes:
+                print(f"  - {linha}")
+            return 1
+        print(f"\n✅ Sem regressões em relação a {args.comparar} (tolerância {args.tolerancia:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
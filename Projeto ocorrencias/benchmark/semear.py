@@ -0,0 +1,191 @@
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+
+from migracoes import aplicar_migracoes
+
+# Gera um banco sintético para os benchmarks, com distribuição parecida com
+# a de produção: categorias desiguais, ~60% das ocorrências respondidas,
+# histórico de status coerente com o status final e datas espalhadas pelos
+# últimos dois anos. A mesma semente gera sempre o mesmo banco.
+#
+#   python benchmark/semear.py --ocorrencias 10000 --destino benchmark/dados/bench-10k.db
+#
+# O banco passa pelas migrações normais, então triggers de contadores,
+# versão e índice de busca rodam como em produção.
+
+CATEGORIAS = (
+    ('Infraestrutura', 35), ('Equipamento', 25), ('Limpeza', 20),
+    ('Segurança', 12), ('Outros', 8),
+)
+
+# status final -> probabilidade
+STATUS = (('Pendente', 30), ('Em Andamento', 25), ('Resolvido', 45))
+
+ADMINS = (
+    ('admin', 'Administrador Principal'),
+    ('suporte1', 'Suporte Predial'),
+    ('suporte2', 'Suporte de TI'),
+    ('seguranca', 'Equipe de Segurança'),
+)
+SENHA_ADMINS = 'admin123'
+
+LOCAIS = ('bloco A', 'bloco B', 'bloco C', 'biblioteca', 'refeitório', 'estacionamento',
+          'laboratório 3', 'auditório', 'sala 204', 'recepção', 'ginásio', 'corredor do 2º andar')
+PROBLEMAS = {
+    'Infraestrutura': ('vazamento de água', 'lâmpada queimada', 'porta emperrada',
+                       'infiltração no teto', 'ar-condicionado pingando', 'tomada solta'),
+    'Equipamento': ('projetor sem imagem', 'computador não liga', 'impressora atolando papel',
+                    'mouse quebrado', 'rede Wi-Fi instável', 'monitor piscando'),
+    'Limpeza': ('lixo acumulado', 'banheiro sem papel', 'piso escorregadio',
+                'mau cheiro', 'bebedouro sujo'),
+    'Segurança': ('câmera desligada', 'extintor vencido', 'portão aberto à noite',
+                  'iluminação externa apagada', 'saída de emergência bloqueada'),
+    'Outros': ('barulho excessivo', 'sugestão de melhoria', 'objeto perdido',
+               'sinalização confusa'),
+}
+FRASES = ('O problema começou hoje de manhã.', 'Já aconteceu outras vezes nesta semana.',
+          'Está atrapalhando as aulas.', 'Vários colegas notaram também.',
+          'Precisa de atenção urgente.', 'Acontece principalmente no fim da tarde.',
+          'Segue foto em anexo para referência.', 'Não há aviso no local.')
+RESPOSTAS = ('Recebemos sua ocorrência e a equipe já foi acionada.',
+             'Técnico agendado para amanhã pela manhã.',
+             'Peça solicitada ao fornecedor, prazo de 5 dias úteis.',
+             'Problema resolvido, obrigado pelo aviso.',
+             'Pode confirmar se o problema persiste?',
+             'Encaminhado para a equipe responsável.')
+
+TAMANHO_LOTE = 5000
+
+
+def _escolher(aleatorio, pesos):
+    return aleatorio.choices([v for v, _ in pesos], weights=[p for _, p in pesos])[0]
+
+
+def _data(base, segundos):
+    return (base + timedelta(seconds=segundos)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def gerar_ocorrencia(aleatorio, inicio, criada):
+    """Retorna (ocorrencia, respostas, historico) de uma ocorrência criada `criada` segundos após `inicio`"""
+    categoria = _escolher(aleatorio, CATEGORIAS)
+    problema = aleatorio.choice(PROBLEMAS[categoria])
+    local = aleatorio.choice(LOCAIS)
+    status = _escolher(aleatorio, STATUS)
+
+    titulo = f'{problema.capitalize()} no {local}'
+    descricao = ' '.join([f'Há {problema} no {local}.'] + aleatorio.sample(FRASES, aleatorio.randint(1, 3)))
+    ocorrencia = (titulo, descricao, categoria, status, _data(inicio, criada))
+
+    # Em Andamento/Resolvido sempre têm resposta; parte das pendentes também
+    if status == 'Pendente':
+        quantidade = 1 if aleatorio.random() < 0.15 else 0
+    else:
+        quantidade = min(1 + int(aleatorio.expovariate(0.9)), 8)
+
+    respostas, historico = [], []
+    momento = criada
+    for _ in range(quantidade):
+        momento += aleatorio.randint(600, 3 * 86400)
+        admin_id = aleatorio.randint(1, len(ADMINS))
+        respostas.append((admin_id, aleatorio.choice(RESPOSTAS), _data(inicio, momento)))
+
+    anterior = 'Pendente'
+    for proximo in {'Pendente': (), 'Em Andamento': ('Em Andamento',),
+                    'Resolvido': ('Em Andamento', 'Resolvido')}[status]:
+        momento += aleatorio.randint(300, 86400)
+        historico.append((anterior, proximo, aleatorio.randint(1, len(ADMINS)), _data(inicio, momento)))
+        anterior = proximo
+
+    return ocorrencia, respostas, historico
+
+
+def criar_admins(conn):
+    senha_hash = generate_password_hash(SENHA_ADMINS)
+    conn.executemany('''
+        INSERT OR IGNORE INTO administradores (usuario, senha_hash, nome, email)
+        VALUES (?, ?, ?, ?)
+    ''', [(usuario, senha_hash, nome, f'{usuario}@sio.com') for usuario, nome in ADMINS])
+    conn.commit()
+
+
+def semear(destino, ocorrencias=10000, semente=42, dias=730, tamanho_lote=TAMANHO_LOTE):
+    """Cria (ou completa) o banco em `destino` com `ocorrencias` ocorrências"""
+    os.makedirs(os.path.dirname(destino) or '.', exist_ok=True)
+    conn = sqlite3.connect(destino)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = OFF')   # só para a carga inicial
+    aplicar_migracoes(conn)
+    criar_admins(conn)
+
+    existentes = conn.execute('SELECT COUNT(*) FROM ocorrencias').fetchone()[0]
+    aleatorio = random.Random(semente + existentes)
+    # Datas em UTC, como o CURRENT_TIMESTAMP do SQLite, crescendo com o id
+    inicio = datetime.now(timezone.utc) - timedelta(days=dias)
+    passo = dias * 86400 / max(ocorrencias, 1)
+
+    inicio_carga = time.perf_counter()
+    restantes = ocorrencias - existentes
+    while restantes > 0:
+        feitas = ocorrencias - restantes
+        lote = [
+            gerar_ocorrencia(aleatorio, inicio, int((feitas + i) * passo) + aleatorio.randrange(int(passo) + 1))
+            for i in range(min(tamanho_lote, restantes))
+        ]
+
+        conn.execute('BEGIN')
+        conn.executemany('''
+            INSERT INTO ocorrencias (titulo, descricao, categoria, status, data)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [o for o, _, _ in lote])
+        ultimo_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+        primeiro_id = ultimo_id - len(lote) + 1
+
+        conn.executemany('''
+            INSERT INTO respostas (ocorrencia_id, administrador_id, mensagem, data_resposta)
+            VALUES (?, ?, ?, ?)
+        ''', [(primeiro_id + i, *r) for i, (_, respostas, _) in enumerate(lote) for r in respostas])
+        conn.executemany('''
+            INSERT INTO historico_status (ocorrencia_id, status_anterior, status_novo,
+                                          administrador_id, data_mudanca)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(primeiro_id + i, *h) for i, (_, _, historico) in enumerate(lote) for h in historico])
+        conn.commit()
+
+        restantes -= len(lote)
+        feitas = ocorrencias - restantes
+        taxa = (feitas - existentes) / (time.perf_counter() - inicio_carga)
+        print(f"  🌱 {feitas}/{ocorrencias} ocorrências ({taxa:,.0f}/s)", end='\r', flush=True)
+
+    print()
+    conn.execute('PRAGMA optimize')
+    conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Gera um banco sintético para benchmarks')
+    parser.add_argument('--ocorrencias', type=int, default=10000)
+    parser.add_argument('--destino', default=None,
+                        help='padrão: benchmark/dados/bench-<ocorrencias>.db')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--dias', type=int, default=730, help='janela de datas das ocorrências')
+    args = parser.parse_args(argv)
+
+    destino = args.destino or os.path.join(os.path.dirname(__file__), 'dados', f'bench-{args.ocorrencias}.db')
+    print(f"🌱 Semeando {args.ocorrencias} ocorrências em {destino} (semente {args.semente})")
+    inicio = time.perf_counter()
+    semear(destino, args.ocorrencias, args.semente, args.dias)
+    print(f"✅ Pronto em {time.perf_counter() - inicio:.1f}s")
+    return destino
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+import re
+import sys
+import html
+import sqlite3
+
+# Índice FTS5 `busca_fts` (migração 007): uma linha por ocorrência, com
+# rowid = ocorrencias.id e as mensagens das respostas concatenadas.
+# O tokenizador remove acentos, então "agua" encontra "água".
+
+PESOS_BM25 = (10.0, 4.0, 1.0)   # titulo, descricao, respostas
+MARCA_INICIO = '\x02'
+MARCA_FIM = '\x03'
+TAMANHO_LOTE_BACKFILL = 5000
+
+
+def montar_consulta_fts(texto):
+    """Converte o texto digitado numa expressão MATCH segura.
+
+    Cada palavra vira um termo entre aspas (operadores do FTS5 não passam)
+    e as palavras com 2+ letras casam por prefixo: "vaza bloc" encontra
+    "vazamento no bloco". Todas as palavras são obrigatórias.
+    """
+    termos = []
+    for palavra in re.findall(r'\w+', texto, re.UNICODE):
+        termo = '"' + palavra.replace('"', '') + '"'
+        termos.append(termo + '*' if len(palavra) >= 2 else termo)
+    return ' '.join(termos)
+
+
+def _destacar(texto):
+    """Escapa o HTML e troca os marcadores do FTS5 por <mark>"""
+    if texto is None:
+        return None
+    return (html.escape(texto)
+            .replace(MARCA_INICIO, '<mark>')
+            .replace(MARCA_FIM, '</mark>'))
+
+
+def buscar(conn, texto, limite=20, deslocamento=0, categoria=None, status=None):
+    """Retorna as ocorrências mais relevantes para `texto` (ordenadas por bm25)"""
+    consulta = montar_consulta_fts(texto)
+    if not consulta:
+        return []
+
+    condicoes = ['busca_fts MATCH ?']
+    parametros = [consulta]
+    if categoria:
+        condicoes.append('o.categoria = ?')
+        parametros.append(categoria)
+    if status:
+        condicoes.append('o.status = ?')
+        parametros.append(status)
+
+    linhas = conn.execute(f'''
+        SELECT o.id, o.titulo, o.categoria, o.anexo, o.status,
+               strftime('%d/%m/%Y às %H:%M', o.data) AS data,
+               highlight(busca_fts, 0, ?, ?) AS titulo_destacado,
+               snippet(busca_fts, -1, ?, ?, '…', 16) AS trecho,
+               bm25(busca_fts, ?, ?, ?) AS relevancia
+        FROM busca_fts
+        JOIN ocorrencias o ON o.id = busca_fts.rowid
+        WHERE {' AND '.join(condicoes)}
+        ORDER BY relevancia
+        LIMIT ? OFFSET ?
+    ''', (MARCA_INICIO, MARCA_FIM, MARCA_INICIO, MARCA_FIM, *PESOS_BM25,
+          *parametros, limite, deslocamento)).fetchall()
+
+    resultados = []
+    for linha in linhas:
+        item = dict(linha)
+        item['titulo_destacado'] = _destacar(item['titulo_destacado'])
+        item['trecho'] = _destacar(item['trecho'])
+        if item.get('anexo'):
+            item['anexo'] = f"/uploads/{item['anexo']}"
+        resultados.append(item)
+    return resultados
+
+
+def reconstruir_indice(conn, tamanho_lote=TAMANHO_LOTE_BACKFILL, commit=True):
+    """Recria o índice a partir de ocorrencias/respostas, em lotes de ids.
+
+    Cada lote apaga e reinsere só a sua faixa de rowids na mesma transação,
+    então a busca continua respondendo com o índice antigo durante a
+    reconstrução e uma ocorrência gravada pelo app no meio dela (indexada
+    pelo trigger) não colide com o INSERT do lote. Com commit=True cada
+    lote é confirmado separadamente, para não segurar o lock de escrita
+    por muito tempo em bancos grandes. Só os ids que já existiam no início
+    são percorridos: os seguintes chegam ao índice pelos triggers.
+    """
+    maior_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM ocorrencias').fetchone()[0]
+    ultimo_id = 0
+    total = 0
+    while True:
+        ids = [linha[0] for linha in conn.execute(
+            'SELECT id FROM ocorrencias WHERE id > ? AND id <= ? ORDER BY id LIMIT ?',
+            (ultimo_id, maior_id, tamanho_lote))]
+        if not ids:
+            break
+
+        conn.execute('DELETE FROM busca_fts WHERE rowid > ? AND rowid <= ?',
+                     (ultimo_id, ids[-1]))
+        conn.execute('''
+            INSERT INTO busca_fts (rowid, titulo, descricao, respostas)
+            SELECT o.id, o.titulo, o.descricao,
+                   COALESCE((SELECT group_concat(r.mensagem, ' ')
+                             FROM respostas r WHERE r.ocorrencia_id = o.id), '')
+            FROM ocorrencias o
+            WHERE o.id > ? AND o.id <= ?
+        ''', (ultimo_id, ids[-1]))
+        if commit:
+            conn.commit()
+
+        ultimo_id = ids[-1]
+        total += len(ids)
+
+    # Sobras do índice antigo depois do último lote (ocorrências apagadas).
+    # O NOT IN preserva o que os triggers indexaram durante a reconstrução.
+    conn.execute('''
+        DELETE FROM busca_fts
+        WHERE rowid > ? AND rowid NOT IN (SELECT id FROM ocorrencias WHERE id > ?)
+    ''', (ultimo_id, ultimo_id))
+    conn.execute("INSERT INTO busca_fts (busca_fts) VALUES ('optimize')")
+    if commit:
+        conn.commit()
+    return total
+
+
+if __name__ == '__main__':
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'database/ocorrencias.db'
+    print(f"🔎 Reconstruindo índice de busca em {db_path}...")
+
+    conn = sqlite3.connect(db_path)
+    total = reconstruir_indice(conn)
+    conn.close()
+
+    print(f"✅ {total} ocorrências indexadas")
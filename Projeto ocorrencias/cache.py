@@ -0,0 +1,272 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import metricas
+
+# Cache das respostas das rotas públicas de leitura (lista, estatísticas e
+# detalhe). Guarda os bytes já serializados, por rota + parâmetros.
+#
+# Invalidação por geração: cada entrada depende de etiquetas ('lista',
+# 'estatisticas', 'ocorrencia:<id>' e '*', que vale para tudo) e a chave
+# inclui a geração atual de cada uma. Invalidar é avançar a geração; as
+# entradas antigas ficam inalcançáveis e saem pelo LRU/TTL. Como as gerações
+# são lidas antes de montar a resposta, uma escrita que acontece no meio não
+# deixa uma resposta velha guardada sob a geração nova.
+#
+# As rotas de escrita invalidam na hora as etiquetas que alteraram. Escritas
+# de outros processos (workers do gunicorn, ingestão em lote) chegam pela
+# tabela `eventos`: quando a versão dos dados muda, o cache relê os eventos
+# novos e aplica as mesmas regras. Versão nova sem evento (escrita fora da
+# aplicação) invalida tudo.
+
+TTL_PADRAO = 60
+LIMITE_PADRAO = 32 * 1024 * 1024
+MAXIMO_ETIQUETAS = 10000
+
+consultas_cache = metricas.registro.registrar(metricas.Contador(
+    'sio_cache_consultas_total', 'Consultas ao cache de respostas', ('endpoint', 'resultado')))
+invalidacoes_cache = metricas.registro.registrar(metricas.Contador(
+    'sio_cache_invalidacoes_total', 'Etiquetas invalidadas no cache de respostas', ('origem',)))
+
+
+def etiquetas_do_evento(tipo, ocorrencia_id, dados):
+    """Etiquetas afetadas por uma escrita, a partir do seu evento"""
+    if tipo == 'ocorrencia_criada':
+        return ['lista', 'estatisticas']
+    if tipo == 'status_alterado':
+        return ['lista', f'ocorrencia:{ocorrencia_id}']
+    if tipo == 'resposta_criada':
+        # A resposta só muda a lista quando tira a ocorrência de Pendente
+        if dados.get('status'):
+            return ['lista', f'ocorrencia:{ocorrencia_id}']
+        return [f'ocorrencia:{ocorrencia_id}']
+    return ['*']
+
+
+class BackendMemoria:
+    """LRU em memória, limitado pelo total de bytes guardados (por processo)"""
+
+    def __init__(self, limite_bytes=LIMITE_PADRAO):
+        self.limite_bytes = limite_bytes
+        self._entradas = OrderedDict()   # chave -> (valor, expira)
+        self._geracoes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            valor, expira = entrada
+            if expira < time.monotonic():
+                self._descartar(chave)
+                return None
+            self._entradas.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave, valor, ttl):
+        if len(valor) > self.limite_bytes // 8:
+            return
+        with self._lock:
+            if chave in self._entradas:
+                self._descartar(chave)
+            self._entradas[chave] = (valor, time.monotonic() + ttl)
+            self._bytes += len(valor)
+            while self._bytes > self.limite_bytes:
+                self._descartar(next(iter(self._entradas)))
+
+    def _descartar(self, chave):
+        valor, _ = self._entradas.pop(chave)
+        self._bytes -= len(valor)
+
+    def geracoes(self, etiquetas):
+        with self._lock:
+            return [self._geracoes.get(etiqueta, 0) for etiqueta in etiquetas]
+
+    def avancar(self, etiquetas):
+        with self._lock:
+            # Etiquetas de detalhe acumulam com o tempo: ao passar do limite,
+            # recomeça do zero e avança '*' para não reaproveitar gerações
+            if len(self._geracoes) > MAXIMO_ETIQUETAS:
+                geral = self._geracoes.get('*', 0)
+                self._geracoes = {'*': geral + 1}
+            for etiqueta in etiquetas:
+                self._geracoes[etiqueta] = self._geracoes.get(etiqueta, 0) + 1
+
+    def tamanho(self):
+        return len(self._entradas), self._bytes
+
+
+class BackendArquivo:
+    """Cache num arquivo SQLite à parte, compartilhado pelos workers da máquina.
+
+    Faz o papel de um memcached/Redis local: as gerações também ficam no
+    arquivo, então uma invalidação vale para todos os processos. A remoção
+    por tamanho é FIFO aproximada (descarta a metade mais antiga).
+    """
+
+    def __init__(self, caminho, limite_bytes=LIMITE_PADRAO):
+        self.caminho = caminho
+        self.limite_bytes = limite_bytes
+        self._local = threading.local()
+        self._gravacoes = 0
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        conn = self._conexao()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS entradas (
+                id INTEGER PRIMARY KEY,
+                chave TEXT NOT NULL UNIQUE,
+                valor BLOB NOT NULL,
+                expira REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS geracoes (
+                etiqueta TEXT PRIMARY KEY,
+                geracao INTEGER NOT NULL
+            ) WITHOUT ROWID;
+        ''')
+
+    def _conexao(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')   # perder o cache não é problema
+            self._local.conn = conn
+        return conn
+
+    def obter(self, chave):
+        linha = self._conexao().execute(
+            'SELECT valor FROM entradas WHERE chave = ? AND expira >= ?', (chave, time.time())
+        ).fetchone()
+        return linha[0] if linha else None
+
+    def guardar(self, chave, valor, ttl):
+        if len(valor) > self.limite_bytes // 8:
+            return
+        conn = self._conexao()
+        conn.execute('INSERT OR REPLACE INTO entradas (chave, valor, expira) VALUES (?, ?, ?)',
+                     (chave, valor, time.time() + ttl))
+        self._gravacoes += 1
+        if self._gravacoes % 50 == 0:
+            self._podar(conn)
+
+    def _podar(self, conn):
+        conn.execute('DELETE FROM entradas WHERE expira < ?', (time.time(),))
+        quantidade, total = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(length(valor)), 0) FROM entradas').fetchone()
+        if total > self.limite_bytes:
+            conn.execute('''
+                DELETE FROM entradas WHERE id <= (
+                    SELECT id FROM entradas ORDER BY id LIMIT 1 OFFSET ?
+                )
+            ''', (quantidade // 2,))
+
+    def geracoes(self, etiquetas):
+        marcadores = ','.join('?' * len(etiquetas))
+        atuais = dict(self._conexao().execute(
+            f'SELECT etiqueta, geracao FROM geracoes WHERE etiqueta IN ({marcadores})', etiquetas
+        ).fetchall())
+        return [atuais.get(etiqueta, 0) for etiqueta in etiquetas]
+
+    def avancar(self, etiquetas):
+        self._conexao().executemany('''
+            INSERT INTO geracoes (etiqueta, geracao) VALUES (?, 1)
+            ON CONFLICT (etiqueta) DO UPDATE SET geracao = geracao + 1
+        ''', [(etiqueta,) for etiqueta in etiquetas])
+
+    def tamanho(self):
+        return tuple(self._conexao().execute(
+            'SELECT COUNT(*), COALESCE(SUM(length(valor)), 0) FROM entradas').fetchone())
+
+
+class CacheRespostas:
+    def __init__(self, backend, ttl=TTL_PADRAO):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._versao = None          # versão dos dados já refletida nas gerações
+        self._ultimo_evento = 0
+        self._aplicados = set()      # eventos deste processo já invalidados na escrita
+
+    def chave(self, caminho, argumentos, etiquetas):
+        """Chave da entrada: caminho da URL, parâmetros e as gerações atuais das etiquetas"""
+        parametros = '&'.join(f'{nome}={valor}' for nome, valor in sorted(argumentos.items(multi=True)))
+        geracoes = '.'.join(map(str, self.backend.geracoes(['*', *etiquetas])))
+        return f'{caminho}?{parametros}#{geracoes}'
+
+    def obter(self, chave):
+        """(corpo, mimetype) ou None"""
+        valor = self.backend.obter(chave)
+        if valor is None:
+            return None
+        mimetype, _, corpo = bytes(valor).partition(b'\n')
+        return corpo, mimetype.decode('ascii')
+
+    def guardar(self, chave, corpo, mimetype):
+        self.backend.guardar(chave, mimetype.encode('ascii') + b'\n' + corpo, self.ttl)
+
+    def invalidar(self, etiquetas, evento_id=None, origem='escrita'):
+        """Avança as etiquetas; evento_id (um id ou uma lista) evita reaplicar os eventos na sincronização"""
+        self.backend.avancar(etiquetas)
+        invalidacoes_cache.inc(origem, quantidade=len(etiquetas))
+        if evento_id is not None:
+            ids = [evento_id] if isinstance(evento_id, int) else evento_id
+            with self._lock:
+                self._aplicados.update(i for i in ids if i > self._ultimo_evento)
+
+    def sincronizar(self, conn, versao):
+        """Aplica as escritas de outros processos quando a versão dos dados muda"""
+        if self._versao is not None and versao <= self._versao:
+            return
+        with self._lock:
+            if self._versao is not None and versao <= self._versao:
+                return
+            if self._versao is None:
+                self._ultimo_evento = conn.execute(
+                    'SELECT COALESCE(MAX(id), 0) FROM eventos').fetchone()[0]
+                self._versao = versao
+                return
+
+            eventos = conn.execute('''
+                SELECT id, tipo, ocorrencia_id, dados FROM eventos
+                WHERE id > ? ORDER BY id
+            ''', (self._ultimo_evento,)).fetchall()
+            mais_antigo = conn.execute('SELECT MIN(id) FROM eventos').fetchone()[0]
+
+            if not eventos or (mais_antigo is not None and mais_antigo > self._ultimo_evento + 1):
+                etiquetas = {'*'}
+            else:
+                etiquetas = set()
+                for evento_id, tipo, ocorrencia_id, dados in eventos:
+                    if evento_id in self._aplicados:
+                        continue
+                    etiquetas.update(etiquetas_do_evento(tipo, ocorrencia_id, json.loads(dados)))
+
+            if eventos:
+                self._ultimo_evento = eventos[-1][0]
+            self._aplicados = {e for e in self._aplicados if e > self._ultimo_evento}
+            self._versao = versao
+
+        if etiquetas:
+            self.backend.avancar(sorted(etiquetas))
+            invalidacoes_cache.inc('sincronizacao', quantidade=len(etiquetas))
+
+    def tamanho(self):
+        """(entradas, bytes) guardados no backend"""
+        return self.backend.tamanho()
+
+
+def criar_cache(tipo, ttl=TTL_PADRAO, limite_bytes=LIMITE_PADRAO, caminho=None):
+    """'memoria' (padrão), 'arquivo' (compartilhado entre workers) ou '' (desligado)"""
+    if not tipo:
+        return None
+    if tipo == 'arquivo':
+        return CacheRespostas(BackendArquivo(caminho, limite_bytes), ttl)
+    if tipo == 'memoria':
+        return CacheRespostas(BackendMemoria(limite_bytes), ttl)
+    raise ValueError(f'Backend de cache desconhecido: {tipo}')
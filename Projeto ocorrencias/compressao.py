@@ -0,0 +1,108 @@
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:   # opcional: sem ele, só gzip
+    brotli = None
+
+# Compressão negociada (Accept-Encoding) das respostas dinâmicas.
+#
+# Respostas com corpo pronto só são comprimidas acima de COMPRESSAO_MINIMO
+# bytes. Respostas em fluxo (SSE, exportação) são comprimidas pedaço a
+# pedaço com flush ao fim de cada um, então cada evento continua chegando
+# na hora. Arquivos enviados com send_file (anexos, miniaturas, estáticos
+# pré-comprimidos) passam direto.
+#
+# O ETag de uma resposta comprimida vira fraco (W/"..."), como faz o nginx:
+# o If-None-Match usa comparação fraca, então o 304 continua funcionando.
+
+NIVEL_GZIP = 6
+QUALIDADE_BROTLI = 5    # níveis altos do brotli são lentos demais para conteúdo dinâmico
+
+TIPOS_COMPRIMIVEIS = {
+    'application/json', 'application/x-ndjson', 'application/javascript',
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript',
+    'text/event-stream', 'image/svg+xml',
+}
+
+
+def codificacoes_disponiveis():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def escolher_codificacao(disponiveis=None):
+    """Melhor codificação aceita pelo cliente entre as disponíveis, ou None"""
+    if disponiveis is None:
+        disponiveis = codificacoes_disponiveis()
+    return request.accept_encodings.best_match(disponiveis)
+
+
+def comprimir(dados, codificacao):
+    if codificacao == 'br':
+        return brotli.compress(dados, quality=QUALIDADE_BROTLI)
+    compressor = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(dados) + compressor.flush()
+
+
+class _CompressorFluxo:
+    def __init__(self, codificacao):
+        self.brotli = codificacao == 'br'
+        if self.brotli:
+            self._obj = brotli.Compressor(quality=QUALIDADE_BROTLI)
+        else:
+            self._obj = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def pedaco(self, dados):
+        if self.brotli:
+            return self._obj.process(dados) + self._obj.flush()
+        return self._obj.compress(dados) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def fim(self):
+        return self._obj.finish() if self.brotli else self._obj.flush()
+
+
+def comprimir_fluxo(iteravel, codificacao):
+    """Comprime um corpo em fluxo sem segurar pedaços (flush a cada um)"""
+    compressor = _CompressorFluxo(codificacao)
+    try:
+        for pedaco in iteravel:
+            if isinstance(pedaco, str):
+                pedaco = pedaco.encode('utf-8')
+            if pedaco:
+                yield compressor.pedaco(pedaco)
+        yield compressor.fim()
+    finally:
+        # Cliente desconectou (SSE): fecha o gerador original
+        if hasattr(iteravel, 'close'):
+            iteravel.close()
+
+
+def comprimir_resposta(resposta):
+    """after_request: comprime a resposta se o cliente aceitar e valer a pena"""
+    if (resposta.status_code < 200 or resposta.status_code in (204, 304)
+            or resposta.direct_passthrough
+            or 'Content-Encoding' in resposta.headers
+            or resposta.mimetype not in TIPOS_COMPRIMIVEIS):
+        return resposta
+
+    resposta.vary.add('Accept-Encoding')
+    if not resposta.is_streamed and (resposta.content_length or 0) < current_app.config['COMPRESSAO_MINIMO']:
+        return resposta
+
+    codificacao = escolher_codificacao()
+    if codificacao is None:
+        return resposta
+
+    if resposta.is_streamed:
+        resposta.response = comprimir_fluxo(resposta.response, codificacao)
+        resposta.headers.pop('Content-Length', None)
+    else:
+        resposta.set_data(comprimir(resposta.get_data(), codificacao))
+    resposta.headers['Content-Encoding'] = codificacao
+
+    etag, fraco = resposta.get_etag()
+    if etag and not fraco:
+        resposta.set_etag(etag, weak=True)
+    return resposta
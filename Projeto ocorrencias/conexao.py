@@ -0,0 +1,132 @@
+import time
+import sqlite3
+import queue
+import threading
+from contextlib import contextmanager
+
+# Pragmas aplicados em toda conexão nova
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',       # leitores não bloqueiam o escritor
+    'PRAGMA synchronous = NORMAL',     # seguro com WAL e bem mais barato que FULL
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -16000',      # ~16 MB de cache de páginas por conexão
+    'PRAGMA mmap_size = 134217728',    # 128 MB de leitura via mmap
+)
+
+
+class PoolConexoes:
+    """Pool limitado de conexões SQLite reaproveitadas entre requisições.
+
+    Cada conexão é usada por uma thread de cada vez; ao ser devolvida volta
+    para a fila e mantém o cache de statements preparados.
+    """
+
+    def __init__(self, caminho, tamanho=8, busy_timeout_ms=5000,
+                 statements_em_cache=256, espera_maxima=10,
+                 fabrica=sqlite3.Connection, ao_obter=None, bancos_anexados=None):
+        self.caminho = caminho
+        self.bancos_anexados = bancos_anexados or {}   # apelido -> caminho (ATTACH em cada conexão)
+        self.fabrica = fabrica          # classe da conexão (ver metricas.ConexaoInstrumentada)
+        self.ao_obter = ao_obter        # callback(segundos) com o tempo de espera
+        self.tamanho = tamanho
+        self.busy_timeout_ms = busy_timeout_ms
+        self.statements_em_cache = statements_em_cache
+        self.espera_maxima = espera_maxima
+        self._livres = queue.LifoQueue()
+        self._abertas = 0
+        self._lock = threading.Lock()
+
+    def _abrir(self):
+        conn = sqlite3.connect(
+            self.caminho,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            cached_statements=self.statements_em_cache,
+            factory=self.fabrica,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        for apelido, caminho in self.bancos_anexados.items():
+            conn.execute(f'ATTACH DATABASE ? AS {apelido}', (caminho,))
+            conn.execute(f'PRAGMA {apelido}.journal_mode = WAL')
+            conn.execute(f'PRAGMA {apelido}.synchronous = NORMAL')
+        return conn
+
+    def obter(self):
+        """Retorna uma conexão livre, abrindo outra se o limite permitir"""
+        if self.ao_obter is None:
+            return self._obter()
+        inicio = time.perf_counter()
+        try:
+            return self._obter()
+        finally:
+            self.ao_obter(time.perf_counter() - inicio)
+
+    def _obter(self):
+        try:
+            return self._livres.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._abertas < self.tamanho:
+                self._abertas += 1
+                criar = True
+            else:
+                criar = False
+
+        if criar:
+            try:
+                return self._abrir()
+            except Exception:
+                with self._lock:
+                    self._abertas -= 1
+                raise
+
+        try:
+            return self._livres.get(timeout=self.espera_maxima)
+        except queue.Empty:
+            raise RuntimeError('Tempo esgotado aguardando conexão livre com o banco')
+
+    def devolver(self, conn):
+        """Devolve a conexão ao pool, descartando transações não finalizadas"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._descartar(conn)
+            return
+        self._livres.put(conn)
+
+    def _descartar(self, conn):
+        try:
+            conn.close()
+        finally:
+            with self._lock:
+                self._abertas -= 1
+
+    @contextmanager
+    def conexao(self):
+        """Uso fora de requisições: with pool.conexao() as conn: ..."""
+        conn = self.obter()
+        try:
+            yield conn
+        finally:
+            self.devolver(conn)
+
+    def livres(self):
+        return self._livres.qsize()
+
+    def abertas(self):
+        return self._abertas
+
+    def fechar_todas(self):
+        """Fecha as conexões livres (usado no encerramento do processo)"""
+        while True:
+            try:
+                conn = self._livres.get_nowait()
+            except queue.Empty:
+                break
+            self._descartar(conn)
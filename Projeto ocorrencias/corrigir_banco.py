@@ -1,48 +1,26 @@
 # corrigir_banco.py
+import sys
 import sqlite3
-import os
 
-def corrigir_banco():
-    print("🔧 CORRIGINDO BANCO DE DADOS...")
-    
-    DB_PATH = 'database/ocorrencias.db'
+from migracoes import aplicar_migracoes, versao_do_banco, VERSAO_ATUAL
+from metricas import configurar_logs
+
+def corrigir_banco(db_path='database/ocorrencias.db'):
+    """Atualiza um banco existente para o esquema atual via migrações"""
+    print(f"🔧 CORRIGINDO BANCO DE DADOS... ({db_path})")
     
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Verifica se a coluna status existe
-        cursor.execute("PRAGMA table_info(ocorrencias)")
-        colunas = [coluna[1] for coluna in cursor.fetchall()]
-        
-        print("📊 Colunas atuais na tabela ocorrências:", colunas)
+        conn = sqlite3.connect(db_path)
         
-        # Se a coluna status não existe, adiciona
-        if 'status' not in colunas:
-            print("➕ Adicionando coluna 'status'...")
-            cursor.execute('''
-                ALTER TABLE ocorrencias 
-                ADD COLUMN status TEXT DEFAULT 'Pendente'
-            ''')
-            print("✅ Coluna 'status' adicionada!")
+        versao = versao_do_banco(conn)
+        print(f"📊 Versão atual do esquema: {versao} (mais recente: {VERSAO_ATUAL})")
         
-        # Verifica se a tabela historico_status existe
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='historico_status'")
-        if not cursor.fetchone():
-            print("➕ Criando tabela 'historico_status'...")
-            cursor.execute('''
-                CREATE TABLE historico_status (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    ocorrencia_id INTEGER NOT NULL,
-                    status_anterior TEXT NOT NULL,
-                    status_novo TEXT NOT NULL,
-                    administrador_id INTEGER NOT NULL,
-                    data_mudanca DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            print("✅ Tabela 'historico_status' criada!")
+        aplicadas = aplicar_migracoes(conn)
+        if aplicadas:
+            print(f"✅ Migrações aplicadas: {aplicadas}")
+        else:
+            print("✅ Nenhuma migração pendente")
         
-        conn.commit()
         conn.close()
         
         print("🎉 Banco de dados corrigido com sucesso!")
@@ -51,4 +29,5 @@ def corrigir_banco():
         print(f"❌ Erro ao corrigir banco: {e}")
 
 if __name__ == "__main__":
-    corrigir_banco()
\ No newline at end of file
+    configurar_logs()
+    corrigir_banco(*sys.argv[1:2])
\ No newline at end of file
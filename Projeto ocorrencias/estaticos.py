@@ -0,0 +1,173 @@
+import os
+import sys
+import gzip
+import json
+import shlex
+import shutil
+import hashlib
+import logging
+import argparse
+import subprocess
+
+from flask import url_for
+
+try:
+    import brotli
+except ImportError:   # opcional: sem ele, só as cópias .gz
+    brotli = None
+
+# Estáticos versionados e pré-comprimidos.
+#
+#   python estaticos.py
+#
+# gera static/dist/ com uma cópia de cada arquivo com o hash do conteúdo no
+# nome (script.3f9a1c2b7d.js), as versões .gz/.br ao lado e o manifest.json
+# que liga o nome original ao versionado. Como o nome muda junto com o
+# conteúdo, /estaticos/ responde com cache de um ano (immutable) e escolhe
+# a cópia comprimida pelo Accept-Encoding, sem comprimir nada na hora.
+#
+# O CSS do Tailwind é compilado aqui pelo CLI do Tailwind (só as classes
+# usadas nos templates e no script.js). Sem static/dist, ou com um arquivo
+# alterado depois do build, os templates voltam para /static/ e para o
+# Tailwind do CDN — prático no desenvolvimento.
+
+PASTA_ESTATICOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+PASTA_DIST = os.path.join(PASTA_ESTATICOS, 'dist')
+ARQUIVO_MANIFESTO = 'manifest.json'
+
+ENTRADA_TAILWIND = os.path.join(PASTA_ESTATICOS, 'tailwind.entrada.css')
+CONFIG_TAILWIND = os.path.join(os.path.dirname(PASTA_ESTATICOS), 'tailwind.config.js')
+
+ARQUIVOS = ('style.css', 'lista_virtual.js', 'script.js', 'logo.png')
+COMPRIMIVEIS = ('.css', '.js', '.svg', '.json', '.txt')
+SUFIXOS = {'br': '.br', 'gzip': '.gz'}
+
+log = logging.getLogger('sio.estaticos')
+
+
+def _sha256(caminho):
+    with open(caminho, 'rb') as arquivo:
+        return hashlib.sha256(arquivo.read()).hexdigest()
+
+
+def compilar_tailwind(destino, comando=None):
+    """Roda o CLI do Tailwind (SIO_TAILWIND, tailwindcss no PATH ou npx); retorna se gerou"""
+    comando = comando or os.environ.get('SIO_TAILWIND')
+    if comando:
+        base = shlex.split(comando)
+    elif shutil.which('tailwindcss'):
+        base = ['tailwindcss']
+    elif shutil.which('npx'):
+        base = ['npx', '--yes', 'tailwindcss@3']
+    else:
+        return False
+
+    try:
+        subprocess.run(
+            base + ['-c', CONFIG_TAILWIND, '-i', ENTRADA_TAILWIND, '-o', destino, '--minify'],
+            check=True, cwd=os.path.dirname(CONFIG_TAILWIND)
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        log.warning("⚠️ Tailwind não compilado (%s); as páginas usarão o CDN", e)
+        return False
+    return os.path.isfile(destino)
+
+
+def _versionar(origem, nome, destino_dir):
+    """Copia `origem` como <nome>.<hash><ext> (+ .gz/.br); retorna o nome versionado"""
+    with open(origem, 'rb') as arquivo:
+        dados = arquivo.read()
+    raiz, extensao = os.path.splitext(nome)
+    versionado = f'{raiz}.{hashlib.sha256(dados).hexdigest()[:10]}{extensao}'
+    caminho = os.path.join(destino_dir, versionado)
+    with open(caminho, 'wb') as arquivo:
+        arquivo.write(dados)
+
+    if extensao in COMPRIMIVEIS:
+        variantes = {'.gz': gzip.compress(dados, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variantes['.br'] = brotli.compress(dados, quality=11)
+        for sufixo, comprimido in variantes.items():
+            if len(comprimido) < len(dados):
+                with open(caminho + sufixo, 'wb') as arquivo:
+                    arquivo.write(comprimido)
+    return versionado
+
+
+def construir(pasta_dist=PASTA_DIST, tailwind=True):
+    """Gera a pasta de estáticos versionados; retorna o manifesto"""
+    if os.path.isdir(pasta_dist):
+        shutil.rmtree(pasta_dist)
+    os.makedirs(pasta_dist)
+
+    manifesto = {}
+    for nome in ARQUIVOS:
+        origem = os.path.join(PASTA_ESTATICOS, nome)
+        manifesto[nome] = {'arquivo': _versionar(origem, nome, pasta_dist), 'sha256': _sha256(origem)}
+
+    if tailwind:
+        compilado = os.path.join(pasta_dist, 'tailwind.css')
+        if compilar_tailwind(compilado):
+            # Gerado: não há original em static/ para conferir
+            manifesto['tailwind.css'] = {'arquivo': _versionar(compilado, 'tailwind.css', pasta_dist),
+                                         'sha256': None}
+            os.unlink(compilado)
+
+    with open(os.path.join(pasta_dist, ARQUIVO_MANIFESTO), 'w', encoding='utf-8') as arquivo:
+        json.dump(manifesto, arquivo, indent=2, sort_keys=True)
+    return manifesto
+
+
+class Manifesto:
+    """Nome original -> URL versionada, lido uma vez na criação do app"""
+
+    def __init__(self, pasta_dist=PASTA_DIST):
+        self.pasta = pasta_dist
+        self.arquivos = {}
+        try:
+            with open(os.path.join(pasta_dist, ARQUIVO_MANIFESTO), encoding='utf-8') as arquivo:
+                entradas = json.load(arquivo)
+        except (OSError, ValueError):
+            return
+
+        for nome, entrada in entradas.items():
+            origem = os.path.join(PASTA_ESTATICOS, nome)
+            # Original editado depois do build: serve o atual por /static/
+            if entrada['sha256'] and (not os.path.isfile(origem) or _sha256(origem) != entrada['sha256']):
+                log.warning("⚠️ %s mudou desde o último build dos estáticos; servindo sem versão", nome)
+                continue
+            self.arquivos[nome] = entrada['arquivo']
+
+    def disponivel(self, nome):
+        return nome in self.arquivos
+
+    def url(self, nome):
+        versionado = self.arquivos.get(nome)
+        if versionado is None:
+            return url_for('static', filename=nome)
+        return url_for('sio.servir_estatico', nome=versionado)
+
+    def variantes(self, nome):
+        """Codificações com cópia pré-comprimida para um arquivo versionado"""
+        caminho = os.path.join(self.pasta, nome)
+        return [codificacao for codificacao, sufixo in SUFIXOS.items() if os.path.isfile(caminho + sufixo)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Gera os estáticos versionados e pré-comprimidos')
+    parser.add_argument('--sem-tailwind', action='store_true', help='não compila o CSS do Tailwind')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    manifesto = construir(tailwind=not args.sem_tailwind)
+    for nome, entrada in sorted(manifesto.items()):
+        print(f"  📦 {nome} -> {entrada['arquivo']}")
+    if 'tailwind.css' not in manifesto and not args.sem_tailwind:
+        print("⚠️ Tailwind não compilado: as páginas continuarão usando o CDN")
+        return 1
+    print(f"✅ Estáticos gerados em {PASTA_DIST}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import os
+import sys
+import sqlite3
+
+from arquivamento import anexar_arquivo, arquivo_disponivel
+
+# Os contadores ficam na tabela `contadores`, mantida por triggers criados na
+# migração 004. Ler estatísticas custa uma varredura dessa tabela pequena,
+# independente do tamanho de ocorrencias/respostas.
+
+STATUS = ('Pendente', 'Em Andamento', 'Resolvido')
+
+
+def ler_contadores(conn):
+    """Retorna {(dimensao, valor): total} a partir da tabela de resumo"""
+    return {
+        (linha[0], linha[1]): linha[2]
+        for linha in conn.execute('SELECT dimensao, valor, total FROM contadores')
+    }
+
+
+def calcular_do_zero(conn):
+    """Recalcula os contadores varrendo as tabelas (usado na verificação).
+
+    Com o banco de arquivo anexado, as ocorrências arquivadas também
+    contam (os contadores as preservam, ver migração 011).
+    """
+    ocorrencias, respostas = 'main.ocorrencias', 'main.respostas'
+    if arquivo_disponivel(conn):
+        # Uma ocorrência no meio do arquivamento está nos dois bancos: conta a do principal
+        ocorrencias = '''(
+            SELECT status, categoria FROM main.ocorrencias
+            UNION ALL
+            SELECT status, categoria FROM arquivo.ocorrencias
+            WHERE id NOT IN (SELECT id FROM main.ocorrencias)
+        )'''
+        respostas = '''(
+            SELECT ocorrencia_id FROM main.respostas
+            UNION ALL
+            SELECT ocorrencia_id FROM arquivo.respostas
+        )'''
+
+    contadores = {('total', ''): conn.execute(f'SELECT COUNT(*) FROM {ocorrencias}').fetchone()[0]}
+
+    for status, total in conn.execute(
+            f"SELECT COALESCE(status, ''), COUNT(*) FROM {ocorrencias} GROUP BY 1"):
+        contadores[('status', status)] = total
+
+    for categoria, total in conn.execute(
+            f'SELECT categoria, COUNT(*) FROM {ocorrencias} GROUP BY categoria'):
+        contadores[('categoria', categoria)] = total
+
+    contadores[('com_resposta', '')] = conn.execute(
+        f'SELECT COUNT(DISTINCT ocorrencia_id) FROM {respostas}').fetchone()[0]
+
+    return contadores
+
+
+def _sem_zeros(contadores):
+    return {chave: total for chave, total in contadores.items() if total}
+
+
+def reconstruir_contadores(conn):
+    """Substitui o conteúdo de `contadores` pelo recálculo completo.
+
+    Não faz commit: quem chama decide a transação.
+    """
+    contadores = calcular_do_zero(conn)
+    conn.execute('DELETE FROM contadores')
+    conn.executemany(
+        'INSERT INTO contadores (dimensao, valor, total) VALUES (?, ?, ?)',
+        [(dimensao, valor, total) for (dimensao, valor), total in contadores.items()]
+    )
+    return contadores
+
+
+def verificar_contadores(conn, corrigir=True):
+    """Compara os contadores com o recálculo completo.
+
+    Retorna a lista de divergências [(chave, armazenado, real)] e, se
+    corrigir=True, reconstrói a tabela quando houver alguma.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        armazenados = _sem_zeros(ler_contadores(conn))
+        reais = _sem_zeros(calcular_do_zero(conn))
+
+        divergencias = [
+            (chave, armazenados.get(chave, 0), reais.get(chave, 0))
+            for chave in sorted(set(armazenados) | set(reais))
+            if armazenados.get(chave, 0) != reais.get(chave, 0)
+        ]
+
+        if divergencias and corrigir:
+            reconstruir_contadores(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return divergencias
+
+
+def estatisticas_publicas(conn):
+    contadores = ler_contadores(conn)
+    categorias = [
+        {'categoria': valor, 'count': total}
+        for (dimensao, valor), total in sorted(contadores.items())
+        if dimensao == 'categoria' and total > 0
+    ]
+    return {
+        'total': contadores.get(('total', ''), 0),
+        'categorias': categorias,
+        'total_categorias': len(categorias)
+    }
+
+
+def estatisticas_admin(conn):
+    contadores = ler_contadores(conn)
+    return {
+        'total': contadores.get(('total', ''), 0),
+        'pendentes': contadores.get(('status', 'Pendente'), 0),
+        'em_andamento': contadores.get(('status', 'Em Andamento'), 0),
+        'resolvidas': contadores.get(('status', 'Resolvido'), 0),
+        'com_resposta': contadores.get(('com_resposta', ''), 0)
+    }
+
+
+if __name__ == '__main__':
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'database/ocorrencias.db'
+    print(f"🔍 Verificando contadores de estatísticas em {db_path}...")
+
+    conn = sqlite3.connect(db_path)
+    arquivo = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(db_path), 'arquivo.db')
+    if os.path.exists(arquivo):
+        anexar_arquivo(conn, arquivo)
+    divergencias = verificar_contadores(conn)
+    conn.close()
+
+    if divergencias:
+        for (dimensao, valor), armazenado, real in divergencias:
+            print(f"  ⚠️ {dimensao}:{valor} armazenado={armazenado} real={real}")
+        print(f"🔧 {len(divergencias)} divergência(s) corrigida(s)")
+    else:
+        print("✅ Contadores consistentes")
@@ -0,0 +1,232 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+# Eventos de alteração gravados na tabela `eventos` (migração 006) na mesma
+# transação da escrita. Os fluxos SSE leem a tabela a partir do último id
+# visto pelo cliente, o que permite retomar após reconexão e funciona com
+# vários processos servindo a aplicação.
+#
+# Em cada processo uma única thread lê a tabela (enquanto houver fluxo
+# aberto) e guarda os eventos recentes em memória; os fluxos esperam nela
+# em vez de consultar o banco cada um. Só uma reconexão com Last-Event-ID
+# mais antigo que a memória lê do banco. Cada fluxo prende uma thread do
+# servidor, então o número deles por processo é limitado (maximo_fluxos):
+# acima disso a rota responde 503 e o cliente fica no poll.
+
+log = logging.getLogger('sio.eventos')
+
+LOTE_LEITURA = 500
+
+
+class CanalEventos:
+    def __init__(self, pool, backlog=1000, intervalo=1.0, heartbeat=15.0, maximo_fluxos=32):
+        self.pool = pool
+        self.backlog = backlog
+        self.intervalo = intervalo
+        self.heartbeat = heartbeat
+        self.maximo_fluxos = maximo_fluxos
+        self._condicao = threading.Condition()
+        self._acordar_leitor = threading.Event()
+        self._recentes = deque(maxlen=backlog)
+        self._base = None          # maior id anterior ao primeiro de _recentes
+        self._ultimo_lido = None   # maior id lido pelo leitor (None: leitor parado)
+        self._fluxos = 0
+        self._leitor = None
+
+    def publicar(self, conn, tipo, ocorrencia_id, dados, publico=True):
+        """Registra o evento na transação atual; chame notificar() após o commit"""
+        cursor = conn.execute('''
+            INSERT INTO eventos (tipo, ocorrencia_id, dados, publico)
+            VALUES (?, ?, ?, ?)
+        ''', (tipo, ocorrencia_id, json.dumps(dados, ensure_ascii=False), 1 if publico else 0))
+
+        evento_id = cursor.lastrowid
+        if evento_id % 100 == 0:
+            conn.execute('DELETE FROM eventos WHERE id <= ?', (evento_id - self.backlog,))
+        return evento_id
+
+    def publicar_lote(self, conn, eventos, publico=True):
+        """Vários (tipo, ocorrencia_id, dados) num executemany; retorna os ids na ordem.
+
+        Chame dentro de uma transação de escrita (BEGIN IMMEDIATE): os ids
+        são lidos depois do INSERT como os maiores que o último existente.
+        """
+        if not eventos:
+            return []
+        anterior = conn.execute('SELECT COALESCE(MAX(id), 0) FROM eventos').fetchone()[0]
+        conn.executemany('''
+            INSERT INTO eventos (tipo, ocorrencia_id, dados, publico)
+            VALUES (?, ?, ?, ?)
+        ''', [
+            (tipo, ocorrencia_id, json.dumps(dados, ensure_ascii=False), 1 if publico else 0)
+            for tipo, ocorrencia_id, dados in eventos
+        ])
+        ids = [linha[0] for linha in conn.execute('SELECT id FROM eventos WHERE id > ? ORDER BY id', (anterior,))]
+
+        if ids[-1] // 100 > anterior // 100:
+            conn.execute('DELETE FROM eventos WHERE id <= ?', (ids[-1] - self.backlog,))
+        return ids
+
+    def notificar(self):
+        """Acorda o leitor deste processo; outros processos percebem no próximo intervalo"""
+        self._acordar_leitor.set()
+
+    # ---------- vagas e leitor compartilhado ----------
+
+    def reservar(self):
+        """Ocupa uma vaga de fluxo; False se o processo já está no limite"""
+        with self._condicao:
+            if self._fluxos >= self.maximo_fluxos:
+                return False
+            self._fluxos += 1
+            if self._leitor is None:
+                self._recentes.clear()
+                self._base = self._ultimo_lido = None
+                self._leitor = threading.Thread(target=self._ler, name='eventos-leitor', daemon=True)
+                self._leitor.start()
+            return True
+
+    def liberar(self):
+        """Devolve a vaga (fim da resposta); o leitor para com o último fluxo"""
+        with self._condicao:
+            self._fluxos = max(0, self._fluxos - 1)
+
+    @property
+    def fluxos_abertos(self):
+        return self._fluxos
+
+    def _ler(self):
+        while True:
+            with self._condicao:
+                if not self._fluxos:
+                    self._leitor = None
+                    self._ultimo_lido = None
+                    return
+                desde = self._ultimo_lido
+
+            try:
+                with self.pool.conexao() as conn:
+                    if desde is None:
+                        ultimo = conn.execute('SELECT COALESCE(MAX(id), 0) FROM eventos').fetchone()[0]
+                        novos = []
+                    else:
+                        novos = conn.execute('''
+                            SELECT id, tipo, ocorrencia_id, dados, publico FROM eventos
+                            WHERE id > ? ORDER BY id LIMIT ?
+                        ''', (desde, LOTE_LEITURA)).fetchall()
+            except Exception as e:
+                log.exception("❌ Erro ao ler eventos: %s", e)
+                self._acordar_leitor.wait(self.intervalo)
+                continue
+
+            with self._condicao:
+                if desde is None:
+                    self._base = self._ultimo_lido = ultimo
+                for evento in novos:
+                    if len(self._recentes) == self._recentes.maxlen:
+                        self._base = self._recentes[0]['id']
+                    self._recentes.append(evento)
+                    self._ultimo_lido = evento['id']
+                if desde is None or novos:
+                    self._condicao.notify_all()
+
+            if len(novos) < LOTE_LEITURA:
+                self._acordar_leitor.wait(self.intervalo)
+                self._acordar_leitor.clear()
+
+    def _da_memoria(self, ultimo_id, somente_publicos):
+        """Eventos em memória com id > ultimo_id, ou None se a memória não cobre o intervalo.
+
+        Chame com _condicao adquirida.
+        """
+        if self._ultimo_lido is None or ultimo_id < self._base:
+            return None
+        return [
+            evento for evento in self._recentes
+            if evento['id'] > ultimo_id and (evento['publico'] or not somente_publicos)
+        ]
+
+    def ultimo_id(self):
+        with self.pool.conexao() as conn:
+            return conn.execute('SELECT COALESCE(MAX(id), 0) FROM eventos').fetchone()[0]
+
+    def buscar_desde(self, ultimo_id, somente_publicos=True, limite=200):
+        """Retorna (eventos, backlog_perdido) com id > ultimo_id"""
+        filtro = 'AND publico = 1' if somente_publicos else ''
+        with self.pool.conexao() as conn:
+            eventos = conn.execute(f'''
+                SELECT id, tipo, ocorrencia_id, dados FROM eventos
+                WHERE id > ? {filtro}
+                ORDER BY id
+                LIMIT ?
+            ''', (ultimo_id, limite)).fetchall()
+
+            # Se o cliente ficou fora mais tempo que o backlog guardado,
+            # ele precisa recarregar a lista inteira
+            backlog_perdido = False
+            if ultimo_id:
+                mais_antigo = conn.execute('SELECT MIN(id) FROM eventos').fetchone()[0]
+                backlog_perdido = mais_antigo is not None and mais_antigo > ultimo_id + 1
+
+        return eventos, backlog_perdido
+
+    def fluxo(self, ultimo_id=None, somente_publicos=True):
+        """Gerador de texto SSE; termina quando o cliente desconecta.
+
+        Quem abre o fluxo reserva a vaga antes (reservar) e a devolve quando
+        a resposta fecha (liberar).
+        """
+        if ultimo_id is None:
+            ultimo_id = self.ultimo_id()
+
+        yield f"retry: 3000\nid: {ultimo_id}\n\n"
+        ultimo_envio = time.monotonic()
+
+        while True:
+            with self._condicao:
+                eventos = self._da_memoria(ultimo_id, somente_publicos)
+                lido = self._ultimo_lido
+
+            backlog_perdido = False
+            if eventos is None:
+                # Leitor começando ou reconexão mais antiga que a memória: vai ao banco
+                eventos, backlog_perdido = self.buscar_desde(ultimo_id, somente_publicos)
+
+            if backlog_perdido:
+                ultimo_id = self.ultimo_id()
+                yield f"id: {ultimo_id}\nevent: recarregar\ndata: {{}}\n\n"
+                ultimo_envio = time.monotonic()
+                continue
+
+            for evento in eventos:
+                ultimo_id = evento['id']
+                yield f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {evento['dados']}\n\n"
+                ultimo_envio = time.monotonic()
+
+            if eventos:
+                continue
+            if lido is not None:
+                # Nada para este fluxo até onde o leitor chegou (ex.: só eventos do painel)
+                ultimo_id = max(ultimo_id, lido)
+
+            if time.monotonic() - ultimo_envio >= self.heartbeat:
+                yield ": ping\n\n"
+                ultimo_envio = time.monotonic()
+
+            with self._condicao:
+                # O leitor pode ter avançado desde a olhada acima
+                if self._ultimo_lido == lido:
+                    espera = self.intervalo if lido is None else self.heartbeat - (time.monotonic() - ultimo_envio)
+                    self._condicao.wait(max(espera, 0.05))
+
+
+def ler_ultimo_id(request):
+    """Last-Event-ID (reconexão automática do EventSource) ou ?ultimo_id="""
+    valor = request.headers.get('Last-Event-ID') or request.args.get('ultimo_id')
+    try:
+        return int(valor) if valor else None
+    except ValueError:
+        return None
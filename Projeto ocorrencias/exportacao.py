@@ -0,0 +1,115 @@
+import io
+import csv
+import json
+
+# Exportação em fluxo: as ocorrências são lidas em lotes por id (keyset),
+# e respostas/histórico de cada lote vêm em duas consultas com IN (...).
+# A memória usada fica limitada ao tamanho do lote, qualquer que seja o banco.
+
+TAMANHO_LOTE = 500
+
+COLUNAS_CSV = ['id', 'titulo', 'descricao', 'categoria', 'status', 'data',
+               'anexo', 'respostas', 'historico']
+
+# Planilhas executam células que começam com estes caracteres como fórmula
+# (=HYPERLINK(...), +cmd|...); o apóstrofo faz o Excel/LibreOffice lerem texto
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _agrupar(linhas):
+    grupos = {}
+    for linha in linhas:
+        item = dict(linha)
+        grupos.setdefault(item.pop('ocorrencia_id'), []).append(item)
+    return grupos
+
+
+def _lotes(pool, condicoes, parametros, tamanho_lote):
+    """Gera listas de ocorrências (dicts) com respostas e histórico embutidos"""
+    ultimo_id = 0
+    while True:
+        # Cada lote usa uma conexão só durante a leitura, sem segurar o pool
+        # nem uma transação de leitura aberta enquanto o cliente baixa
+        with pool.conexao() as conn:
+            where = ' AND '.join(['o.id > ?'] + condicoes)
+            ocorrencias = conn.execute(f'''
+                SELECT o.id, o.titulo, o.descricao, o.categoria, o.status, o.data, o.anexo
+                FROM ocorrencias o
+                WHERE {where}
+                ORDER BY o.id
+                LIMIT ?
+            ''', (ultimo_id, *parametros, tamanho_lote)).fetchall()
+
+            if not ocorrencias:
+                return
+
+            ids = [o['id'] for o in ocorrencias]
+            marcadores = ','.join('?' * len(ids))
+
+            respostas = _agrupar(conn.execute(f'''
+                SELECT r.ocorrencia_id, r.id, r.mensagem, r.anexo, r.data_resposta,
+                       a.nome AS admin_nome
+                FROM respostas r
+                LEFT JOIN administradores a ON a.id = r.administrador_id
+                WHERE r.ocorrencia_id IN ({marcadores})
+                ORDER BY r.ocorrencia_id, r.data_resposta
+            ''', ids))
+
+            historico = _agrupar(conn.execute(f'''
+                SELECT h.ocorrencia_id, h.status_anterior, h.status_novo, h.data_mudanca,
+                       a.nome AS admin_nome
+                FROM historico_status h
+                LEFT JOIN administradores a ON a.id = h.administrador_id
+                WHERE h.ocorrencia_id IN ({marcadores})
+                ORDER BY h.ocorrencia_id, h.data_mudanca
+            ''', ids))
+
+        lote = []
+        for o in ocorrencias:
+            item = dict(o)
+            item['respostas'] = respostas.get(item['id'], [])
+            item['historico'] = historico.get(item['id'], [])
+            lote.append(item)
+        yield lote
+
+        ultimo_id = ids[-1]
+
+
+def _celula(valor):
+    """Texto digitado pelo usuário não vira fórmula ao abrir o CSV"""
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def gerar_ndjson(pool, condicoes=(), parametros=(), tamanho_lote=TAMANHO_LOTE):
+    """Uma ocorrência JSON por linha"""
+    for lote in _lotes(pool, list(condicoes), list(parametros), tamanho_lote):
+        yield ''.join(json.dumps(item, ensure_ascii=False) + '\n' for item in lote)
+
+
+def gerar_csv(pool, condicoes=(), parametros=(), tamanho_lote=TAMANHO_LOTE):
+    """CSV com respostas e histórico serializados em JSON nas últimas colunas"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    escritor.writerow(COLUNAS_CSV)
+    yield '\ufeff' + buffer.getvalue()   # BOM para o Excel reconhecer UTF-8
+
+    for lote in _lotes(pool, list(condicoes), list(parametros), tamanho_lote):
+        buffer.seek(0)
+        buffer.truncate()
+        for item in lote:
+            escritor.writerow([_celula(valor) for valor in (
+                item['id'], item['titulo'], item['descricao'], item['categoria'],
+                item['status'], item['data'], item['anexo'],
+                json.dumps(item['respostas'], ensure_ascii=False),
+                json.dumps(item['historico'], ensure_ascii=False),
+            )])
+        yield buffer.getvalue()
+
+
+FORMATOS = {
+    'ndjson': (gerar_ndjson, 'application/x-ndjson', 'ndjson'),
+    'csv': (gerar_csv, 'text/csv', 'csv'),
+}
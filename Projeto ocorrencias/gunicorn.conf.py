@@ -0,0 +1,61 @@
+import os
+import multiprocessing
+
+# Configuração do gunicorn para produção:
+#   gunicorn -c gunicorn.conf.py "app:criar_app()"
+#
+# Modelo: vários processos (um pool SQLite por processo) com threads em cada
+# um (gthread). O SQLite em WAL aceita leitores em paralelo e serializa as
+# escritas pelo busy_timeout, então mais processos escalam as leituras sem
+# corromper nada.
+#
+# Cada conexão SSE ocupa uma thread enquanto aberta. SIO_SSE_MAXIMO limita
+# quantas cada worker aceita (acima disso: 503 e o navegador fica no poll de
+# 30 s); o padrão deixa metade das threads livre para as demais rotas. Os
+# fluxos de um worker compartilham uma única thread que lê a tabela eventos.
+
+bind = os.environ.get('SIO_BIND', '0.0.0.0:5000')
+
+workers = int(os.environ.get('SIO_WORKERS', min(multiprocessing.cpu_count() * 2, 8)))
+worker_class = 'gthread'
+threads = int(os.environ.get('SIO_THREADS', 16))
+os.environ.setdefault('SIO_SSE_MAXIMO', str(threads // 2))
+
+# gthread não mata o worker por requisição longa (SSE); o timeout vale para
+# o heartbeat do worker com o master
+timeout = int(os.environ.get('SIO_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('SIO_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Recicla workers aos poucos para conter crescimento de memória
+max_requests = int(os.environ.get('SIO_MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+
+# O app é criado em cada worker, depois do fork: conexões SQLite e threads
+# não podem atravessar um fork
+preload_app = False
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    """Migrações e admin padrão uma única vez, no master, antes dos workers"""
+    import app as aplicacao
+
+    aplicacao.criar_app()
+    aplicacao.init_db()
+    # Não deixa conexões abertas no master para serem herdadas pelo fork
+    aplicacao.pool.fechar_todas()
+
+
+def post_worker_init(worker):
+    """Threads de fundo do worker (o app já foi carregado em worker.wsgi)"""
+    import app as aplicacao
+
+    aplicacao.gerador_miniaturas.iniciar()
+    if worker.wsgi.config['INGESTAO'] == 'fila':
+        aplicacao.fila_ingestao.iniciar()
+    # Todo worker agenda; a trava em arquivo deixa só um executar por vez
+    if worker.wsgi.config['ARQUIVAMENTO_DIAS'] > 0:
+        aplicacao.arquivador.iniciar()
@@ -0,0 +1,419 @@
+import os
+import json
+import glob
+import time
+import uuid
+import queue
+import logging
+import threading
+from datetime import datetime, timezone
+
+# Ingestão em lote de /api/registrar (modo opcional, SIO_INGESTAO=fila).
+#
+# A requisição é validada, gravada num diário local (append + fsync) e
+# colocada numa fila em memória; o cliente recebe um ticket assim que o
+# diário está no disco. Uma thread escritora junta o que chegou e grava
+# tudo numa única transação com executemany. A tabela `tickets_ingestao`
+# (migração 010) liga ticket -> ocorrência e torna a regravação idempotente:
+# após uma queda, os diários são relidos e só entra o que ainda não entrou.
+#
+# A fila tem tamanho máximo: cheia, /api/registrar responde 503 e o cliente
+# tenta de novo. Um lote que continua falhando depois de TENTATIVAS_LOTE
+# vezes é gravado registro a registro, e os que falham sozinhos vão para
+# `descartados.jsonl` na pasta dos diários em vez de travar a fila.
+
+TAMANHO_LOTE = 200
+ESPERA_LOTE = 0.02          # segundos para acumular mais itens no lote
+MAXIMO_FILA = 10000         # registros aguardando a escritora
+TAMANHO_SEGMENTO = 1024 * 1024   # bytes; depois disso o diário abre um segmento novo
+TENTATIVAS_LOTE = 5
+RETENCAO_TICKETS_DIAS = 7
+ARQUIVO_DESCARTADOS = 'descartados.jsonl'
+
+log = logging.getLogger('sio.ingestao')
+
+
+def novo_ticket():
+    return uuid.uuid4().hex
+
+
+def ticket_valido(ticket):
+    return len(ticket) == 32 and all(c in '0123456789abcdef' for c in ticket)
+
+
+class FilaCheia(Exception):
+    """A escritora está atrasada: o registro não foi aceito"""
+
+
+class Diario:
+    """Diário append-only em segmentos, com fsync em grupo.
+
+    Várias threads gravam linhas; a primeira que chega ao fsync sincroniza
+    tudo o que já foi escrito e as demais só esperam por ela. Os arquivos
+    são `<prefixo>-000001.diario`, `<prefixo>-000002.diario`...: o segmento
+    atual é trocado quando passa de `tamanho_segmento` e os antigos são
+    apagados assim que todos os seus registros estão no banco, então o
+    diário não cresce mesmo quando a fila nunca esvazia.
+    """
+
+    def __init__(self, prefixo, tamanho_segmento=TAMANHO_SEGMENTO):
+        self.prefixo = prefixo
+        self.tamanho_segmento = tamanho_segmento
+        self._lock_escrita = threading.Lock()
+        self._lock_sync = threading.Lock()
+        self._escrito = 0          # bytes escritos desde a abertura, em todos os segmentos
+        self._sincronizado = 0
+        self._pendentes = {}       # segmento -> registros ainda não gravados no banco
+        self._segmento = 0
+        self._abrir_segmento()
+
+    def _caminho(self, segmento):
+        return f'{self.prefixo}-{segmento:06d}.diario'
+
+    def _abrir_segmento(self):
+        self._segmento += 1
+        self.caminho = self._caminho(self._segmento)
+        self._arquivo = open(self.caminho, 'ab')
+        self._tamanho = 0
+        self._pendentes[self._segmento] = 0
+
+    def anexar(self, registro):
+        """Grava o registro e só retorna depois que ele está no disco.
+
+        Retorna o segmento onde ele ficou, que deve voltar em confirmar().
+        """
+        linha = (json.dumps(registro, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._lock_escrita:
+            self._arquivo.write(linha)
+            self._escrito += len(linha)
+            self._tamanho += len(linha)
+            self._pendentes[self._segmento] += 1
+            segmento = self._segmento
+            posicao = self._escrito
+
+        with self._lock_sync:
+            if self._sincronizado < posicao:
+                # A troca de segmento também segura _lock_sync: o arquivo não fecha no meio do fsync
+                with self._lock_escrita:
+                    self._arquivo.flush()
+                    arquivo = self._arquivo
+                    alvo = self._escrito
+                os.fsync(arquivo.fileno())
+                self._sincronizado = alvo
+        return segmento
+
+    def confirmar(self, segmentos):
+        """Marca registros como gravados no banco (um segmento por registro).
+
+        Segmentos antigos que zeram são apagados; o atual é esvaziado quando
+        zera ou trocado por um novo quando passa do tamanho máximo.
+        """
+        with self._lock_sync, self._lock_escrita:
+            for segmento in segmentos:
+                self._pendentes[segmento] -= 1
+
+            for segmento, pendentes in list(self._pendentes.items()):
+                if pendentes == 0 and segmento != self._segmento:
+                    del self._pendentes[segmento]
+                    try:
+                        os.unlink(self._caminho(segmento))
+                    except FileNotFoundError:
+                        pass
+
+            if self._pendentes[self._segmento] == 0:
+                if self._tamanho:
+                    self._arquivo.flush()
+                    self._arquivo.truncate(0)
+                    os.fsync(self._arquivo.fileno())
+                    self._tamanho = 0
+                    self._sincronizado = self._escrito
+            elif self._tamanho >= self.tamanho_segmento:
+                self._arquivo.flush()
+                os.fsync(self._arquivo.fileno())
+                self._arquivo.close()
+                self._sincronizado = self._escrito
+                self._abrir_segmento()
+
+    def segmentos(self):
+        """Segmentos ainda no disco (o atual incluído)"""
+        with self._lock_escrita:
+            return len(self._pendentes)
+
+    def fechar(self):
+        self._arquivo.close()
+
+
+def ler_diario(caminho):
+    """Registros de um diário; uma última linha incompleta (queda no meio) é ignorada"""
+    registros = []
+    with open(caminho, 'rb') as arquivo:
+        for linha in arquivo:
+            try:
+                registros.append(json.loads(linha))
+            except ValueError:
+                continue
+    return registros
+
+
+def _processo_vivo(pid):
+    if os.name != 'posix':
+        return True   # sem como verificar: deixa para o próximo init_db
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def gravar_lote(conn, registros):
+    """Insere os registros ainda não gravados; retorna os ids das ocorrências novas.
+
+    Deve rodar dentro de BEGIN IMMEDIATE: com o lock de escrita os ids do
+    AUTOINCREMENT saem em sequência e podem ser deduzidos do último rowid.
+    """
+    novos = [
+        r for r in registros
+        if conn.execute('INSERT OR IGNORE INTO tickets_ingestao (ticket) VALUES (?)',
+                        (r['ticket'],)).rowcount
+    ]
+    if not novos:
+        return []
+
+    conn.executemany('''
+        INSERT INTO ocorrencias (titulo, descricao, categoria, status, data)
+        VALUES (?, ?, ?, 'Pendente', ?)
+    ''', [(r['titulo'], r['descricao'], r['categoria'], r['recebido_em']) for r in novos])
+
+    ultimo_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+    ids = list(range(ultimo_id - len(novos) + 1, ultimo_id + 1))
+
+    conn.executemany(
+        'UPDATE tickets_ingestao SET ocorrencia_id = ? WHERE ticket = ?',
+        [(ocorrencia_id, r['ticket']) for ocorrencia_id, r in zip(ids, novos)]
+    )
+    return ids
+
+
+def recuperar_diarios(conn, pasta, somente_orfaos=False, ao_gravar=None):
+    """Regrava os diários deixados por processos que caíram; retorna quantos entraram"""
+    total = 0
+    for caminho in sorted(glob.glob(os.path.join(pasta, 'ingestao-*.diario'))):
+        if somente_orfaos:
+            # ingestao-<pid>-<segmento>.diario (ou ingestao-<pid>.diario, de versões anteriores)
+            nome = os.path.basename(caminho)[len('ingestao-'):-len('.diario')]
+            try:
+                pid = int(nome.split('-')[0])
+            except ValueError:
+                continue
+            if pid != os.getpid() and _processo_vivo(pid):
+                continue
+
+        try:
+            registros = ler_diario(caminho)
+        except FileNotFoundError:
+            continue   # outro processo recuperou primeiro
+        if registros:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                ids = gravar_lote(conn, registros)
+                if ids and ao_gravar:
+                    ao_gravar(conn, ids)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            total += len(ids)
+        try:
+            os.unlink(caminho)
+        except FileNotFoundError:
+            pass
+    return total
+
+
+class FilaIngestao:
+    def __init__(self, pool, pasta, ao_gravar=None, apos_commit=None,
+                 tamanho_lote=TAMANHO_LOTE, espera_lote=ESPERA_LOTE, maximo_fila=MAXIMO_FILA,
+                 tentativas=TENTATIVAS_LOTE):
+        self.pool = pool
+        self.pasta = pasta
+        self.ao_gravar = ao_gravar          # (conn, ids) dentro da transação
+        self.apos_commit = apos_commit      # () depois do commit
+        self.tamanho_lote = tamanho_lote
+        self.espera_lote = espera_lote
+        self.tentativas = tentativas
+        self._fila = queue.Queue(maxsize=maximo_fila)   # itens (segmento do diário, registro)
+        self._diario = None
+        self._lock = threading.Lock()
+        self._lock_estado = threading.Lock()   # métricas e tickets, alterados por várias threads
+        self._tickets = set()                  # tickets deste processo ainda não gravados
+        self._metricas = {
+            'enfileiradas': 0, 'gravadas': 0, 'lotes': 0,
+            'ultimo_lote': 0, 'maior_lote': 0, 'falhas': 0,
+            'recusadas': 0, 'descartadas': 0,
+        }
+
+    def iniciar(self):
+        """Regrava diários órfãos, abre o diário deste processo e sobe a escritora"""
+        with self._lock:
+            if self._diario is not None:
+                return
+            os.makedirs(self.pasta, exist_ok=True)
+            with self.pool.conexao() as conn:
+                recuperadas = recuperar_diarios(conn, self.pasta, somente_orfaos=True,
+                                                ao_gravar=self.ao_gravar)
+            if recuperadas:
+                log.warning("♻️ %d ocorrências recuperadas do diário de ingestão", recuperadas)
+                if self.apos_commit:
+                    self.apos_commit()
+
+            self._diario = Diario(os.path.join(self.pasta, f'ingestao-{os.getpid()}'))
+            threading.Thread(target=self._escrever, name='ingestao', daemon=True).start()
+
+    def enfileirar(self, titulo, descricao, categoria):
+        """Grava no diário e enfileira; retorna o ticket (durável ao retornar).
+
+        Levanta FilaCheia, sem gravar nada, se a fila já está no máximo.
+        """
+        if self._diario is None:
+            self.iniciar()
+        if self._fila.full():
+            with self._lock_estado:
+                self._metricas['recusadas'] += 1
+            raise FilaCheia()
+
+        registro = {
+            'ticket': novo_ticket(),
+            'titulo': titulo,
+            'descricao': descricao,
+            'categoria': categoria,
+            'recebido_em': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        with self._lock_estado:
+            self._tickets.add(registro['ticket'])
+        try:
+            segmento = self._diario.anexar(registro)
+        except Exception:
+            with self._lock_estado:
+                self._tickets.discard(registro['ticket'])
+            raise
+        # Só bloqueia se outras requisições passaram do full() ao mesmo tempo
+        self._fila.put((segmento, registro))
+        with self._lock_estado:
+            self._metricas['enfileiradas'] += 1
+        return registro['ticket']
+
+    def consultar(self, conn, ticket):
+        """Id da ocorrência criada pelo ticket, ou None se ainda não foi gravada"""
+        linha = conn.execute(
+            'SELECT ocorrencia_id FROM tickets_ingestao WHERE ticket = ?', (ticket,)
+        ).fetchone()
+        return linha[0] if linha else None
+
+    def pendente(self, ticket):
+        """True se o ticket ainda está num diário, deste ou de outro processo"""
+        with self._lock_estado:
+            if ticket in self._tickets:
+                return True
+        agulha = f'"ticket": "{ticket}"'.encode('ascii')
+        for caminho in glob.glob(os.path.join(self.pasta, 'ingestao-*.diario')):
+            try:
+                with open(caminho, 'rb') as arquivo:
+                    if agulha in arquivo.read():
+                        return True
+            except FileNotFoundError:
+                continue
+        return False
+
+    def metricas(self):
+        with self._lock_estado:
+            dados = dict(self._metricas)
+        dados['profundidade'] = self._fila.qsize()
+        dados['segmentos'] = self._diario.segmentos() if self._diario else 0
+        dados['media_lote'] = round(dados['gravadas'] / dados['lotes'], 1) if dados['lotes'] else 0
+        return dados
+
+    # ---------- thread escritora ----------
+
+    def _juntar_lote(self):
+        lote = [self._fila.get()]
+        limite = time.monotonic() + self.espera_lote
+        while len(lote) < self.tamanho_lote:
+            restante = limite - time.monotonic()
+            try:
+                lote.append(self._fila.get(timeout=max(restante, 0)) if restante > 0
+                            else self._fila.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _gravar(self, lote):
+        with self.pool.conexao() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                ids = gravar_lote(conn, lote)
+                if ids and self.ao_gravar:
+                    self.ao_gravar(conn, ids)
+                if self._metricas['lotes'] % 100 == 0:
+                    conn.execute(
+                        "DELETE FROM tickets_ingestao WHERE criado_em < datetime('now', ?)",
+                        (f'-{RETENCAO_TICKETS_DIAS} days',)
+                    )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def _gravar_com_tentativas(self, registros):
+        """Grava o lote; se ele continua falhando, grava um a um e descarta os
+        que falham sozinhos. Retorna quantos foram descartados."""
+        espera = 0.1
+        for tentativa in range(1, self.tentativas + 1):
+            try:
+                self._gravar(registros)
+                return 0
+            except Exception as e:
+                # Enquanto tenta, nada se perde: os itens seguem no diário e na memória
+                with self._lock_estado:
+                    self._metricas['falhas'] += 1
+                log.error("❌ Falha ao gravar lote de ingestão (%d itens, tentativa %d/%d): %s",
+                          len(registros), tentativa, self.tentativas, e)
+                if tentativa < self.tentativas:
+                    time.sleep(espera)
+                    espera = min(espera * 2, 5.0)
+
+        descartados = 0
+        for registro in registros:
+            try:
+                self._gravar([registro])
+            except Exception as e:
+                self._descartar(registro, e)
+                descartados += 1
+        return descartados
+
+    def _descartar(self, registro, erro):
+        """Guarda o registro em descartados.jsonl (com o erro) antes de tirá-lo do diário"""
+        log.error("🗑️ Registro da ingestão descartado (ticket %s): %s", registro['ticket'], erro)
+        linha = json.dumps({**registro, 'erro': str(erro)}, ensure_ascii=False) + '\n'
+        with open(os.path.join(self.pasta, ARQUIVO_DESCARTADOS), 'ab') as arquivo:
+            arquivo.write(linha.encode('utf-8'))
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+
+    def _escrever(self):
+        while True:
+            lote = self._juntar_lote()
+            registros = [registro for _, registro in lote]
+            descartados = self._gravar_com_tentativas(registros)
+
+            self._diario.confirmar([segmento for segmento, _ in lote])
+            with self._lock_estado:
+                self._tickets.difference_update(r['ticket'] for r in registros)
+                self._metricas['lotes'] += 1
+                self._metricas['gravadas'] += len(lote) - descartados
+                self._metricas['descartadas'] += descartados
+                self._metricas['ultimo_lote'] = len(lote)
+                self._metricas['maior_lote'] = max(self._metricas['maior_lote'], len(lote))
+            if self.apos_commit:
+                self.apos_commit()
@@ -0,0 +1,281 @@
+import os
+import re
+import sys
+import json
+import time
+import bisect
+import sqlite3
+import logging
+import itertools
+import threading
+
+# Instrumentação: histogramas e contadores em memória expostos em /metrics
+# no formato texto do Prometheus, conexões SQLite que medem cada consulta e
+# a configuração dos logs. Tudo é por processo: com vários workers do
+# gunicorn cada scrape enxerga o worker que atendeu (use o rótulo de
+# instância do Prometheus ou colete por worker).
+
+BALDES_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BALDES_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+BALDES_LINHAS = (0, 1, 5, 20, 100, 500, 2000, 10000)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_rotulos(nomes, valores, extra=''):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+class Contador:
+    tipo = 'counter'
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *valores_rotulos, quantidade=1):
+        with self._lock:
+            self._valores[valores_rotulos] = self._valores.get(valores_rotulos, 0) + quantidade
+
+    def amostras(self):
+        with self._lock:
+            itens = list(self._valores.items())
+        for chave, valor in itens:
+            yield f'{self.nome}{_formatar_rotulos(self.rotulos, chave)} {valor}'
+
+
+class Histograma:
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, rotulos=(), baldes=BALDES_SEGUNDOS):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.baldes = tuple(baldes)
+        self._series = {}   # rótulos -> [contagens por balde..., soma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *valores_rotulos):
+        indice = bisect.bisect_left(self.baldes, valor)
+        with self._lock:
+            serie = self._series.get(valores_rotulos)
+            if serie is None:
+                serie = self._series[valores_rotulos] = [0] * (len(self.baldes) + 2)
+            if indice < len(self.baldes):
+                serie[indice] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def amostras(self):
+        with self._lock:
+            itens = [(chave, list(serie)) for chave, serie in self._series.items()]
+        for chave, serie in itens:
+            acumulado = 0
+            for limite, contagem in zip(self.baldes, serie):
+                acumulado += contagem
+                rotulos = _formatar_rotulos(self.rotulos, chave, f'le="{limite}"')
+                yield f'{self.nome}_bucket{rotulos} {acumulado}'
+            rotulos = _formatar_rotulos(self.rotulos, chave, 'le="+Inf"')
+            yield f'{self.nome}_bucket{rotulos} {serie[-1]}'
+            yield f'{self.nome}_sum{_formatar_rotulos(self.rotulos, chave)} {serie[-2]}'
+            yield f'{self.nome}_count{_formatar_rotulos(self.rotulos, chave)} {serie[-1]}'
+
+
+class Medidor:
+    """Valor lido na hora da coleta (profundidade de fila, conexões abertas...)"""
+    tipo = 'gauge'
+
+    def __init__(self, nome, ajuda, ler):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.ler = ler
+
+    def amostras(self):
+        try:
+            valor = self.ler()
+        except Exception:
+            return
+        if valor is not None:
+            yield f'{self.nome} {valor}'
+
+
+class Registro:
+    def __init__(self):
+        self._metricas = {}
+
+    def registrar(self, metrica):
+        self._metricas[metrica.nome] = metrica
+        return metrica
+
+    def expor(self):
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)"""
+        linhas = []
+        for metrica in self._metricas.values():
+            linhas.append(f'# HELP {metrica.nome} {metrica.ajuda}')
+            linhas.append(f'# TYPE {metrica.nome} {metrica.tipo}')
+            linhas.extend(metrica.amostras())
+        return '\n'.join(linhas) + '\n'
+
+
+registro = Registro()
+
+requisicoes = registro.registrar(Histograma(
+    'sio_http_requisicao_segundos', 'Latência das requisições por rota',
+    ('endpoint', 'metodo', 'status')))
+resposta_bytes = registro.registrar(Histograma(
+    'sio_http_resposta_bytes', 'Tamanho das respostas com Content-Length conhecido',
+    ('endpoint',), BALDES_BYTES))
+consultas = registro.registrar(Histograma(
+    'sio_sql_consulta_segundos', 'Tempo de execução + leitura de cada consulta SQL',
+    ('consulta',)))
+linhas_lidas = registro.registrar(Histograma(
+    'sio_sql_linhas', 'Linhas devolvidas por consulta SQL', ('consulta',), BALDES_LINHAS))
+espera_conexao = registro.registrar(Histograma(
+    'sio_pool_espera_segundos', 'Tempo para obter uma conexão do pool'))
+
+
+# ---------- SQL ----------
+
+_ESPACOS = re.compile(r'\s+')
+_LISTA_MARCADORES = re.compile(r'\?(\s*,\s*\?)+')
+_impressoes = {}
+LOTE_ITERACAO = 256   # linhas por fetchmany ao iterar um cursor medido
+
+
+def impressao_sql(sql):
+    """Rótulo curto e estável para uma consulta (texto normalizado e truncado)"""
+    rotulo = _impressoes.get(sql)
+    if rotulo is None:
+        rotulo = _LISTA_MARCADORES.sub('?,…', _ESPACOS.sub(' ', sql).strip())[:90]
+        if len(_impressoes) < 2000:
+            _impressoes[sql] = rotulo
+    return rotulo
+
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """Mede o execute() e conta as linhas lidas, sem código Python por linha.
+
+    O SQLite já avança até a primeira linha dentro do execute(), então o
+    tempo dele é o tempo até a primeira leitura. As linhas são contadas nos
+    fetch*; a iteração (`for linha in cursor`) lê em blocos de
+    LOTE_ITERACAO por fetchmany e entrega as linhas por itertools, em C.
+    """
+
+    _sql = None
+    _duracao = 0.0
+    _linhas = 0
+
+    def _finalizar(self):
+        if self._sql is not None:
+            consulta = impressao_sql(self._sql)
+            consultas.observar(self._duracao, consulta)
+            linhas_lidas.observar(self._linhas, consulta)
+            self._sql = None
+
+    def execute(self, sql, parametros=()):
+        self._finalizar()
+        inicio = time.perf_counter()
+        super().execute(sql, parametros)
+        self._sql, self._duracao, self._linhas = sql, time.perf_counter() - inicio, 0
+        if self.description is None:   # INSERT/UPDATE/DELETE: nada a ler
+            self._linhas = max(self.rowcount, 0)
+            self._finalizar()
+        return self
+
+    def executemany(self, sql, sequencia):
+        self._finalizar()
+        inicio = time.perf_counter()
+        super().executemany(sql, sequencia)
+        self._sql, self._duracao, self._linhas = sql, time.perf_counter() - inicio, max(self.rowcount, 0)
+        self._finalizar()
+        return self
+
+    def fetchone(self):
+        linha = super().fetchone()
+        if linha is None:
+            self._finalizar()
+        else:
+            self._linhas += 1
+        return linha
+
+    def fetchmany(self, size=None):
+        tamanho = self.arraysize if size is None else size
+        linhas = super().fetchmany(tamanho)
+        self._linhas += len(linhas)
+        if len(linhas) < tamanho:   # veio menos que o pedido: acabou
+            self._finalizar()
+        return linhas
+
+    def fetchall(self):
+        linhas = super().fetchall()
+        self._linhas += len(linhas)
+        self._finalizar()
+        return linhas
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(iter(lambda: self.fetchmany(LOTE_ITERACAO), []))
+
+    def __del__(self):
+        # SELECT lido só em parte (ou nem lido) ainda entra na medição
+        self._finalizar()
+
+
+class ConexaoInstrumentada(sqlite3.Connection):
+    """Fábrica para sqlite3.connect(): toda consulta passa pelo cursor medido"""
+
+    def cursor(self, factory=CursorInstrumentado):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, sequencia):
+        return self.cursor().executemany(sql, sequencia)
+
+
+# ---------- logs ----------
+
+class FormatadorJson(logging.Formatter):
+    """Uma linha JSON por registro; campos extras via extra={'campos': {...}}"""
+
+    def format(self, registro_log):
+        dados = {
+            'ts': self.formatTime(registro_log, '%Y-%m-%dT%H:%M:%S'),
+            'nivel': registro_log.levelname,
+            'logger': registro_log.name,
+            'msg': registro_log.getMessage(),
+        }
+        dados.update(getattr(registro_log, 'campos', {}))
+        if registro_log.exc_info:
+            dados['exc'] = self.formatException(registro_log.exc_info)
+        return json.dumps(dados, ensure_ascii=False)
+
+
+def configurar_logs(nivel=None, formato=None):
+    """Logger 'sio' (e filhos) com nível/formato de SIO_LOG_NIVEL e SIO_LOG_FORMATO"""
+    nivel = (nivel or os.environ.get('SIO_LOG_NIVEL', 'INFO')).upper()
+    formato = formato or os.environ.get('SIO_LOG_FORMATO', 'texto')
+
+    raiz = logging.getLogger('sio')
+    if getattr(raiz, '_sio_configurado', False):
+        raiz.setLevel(nivel)
+        return raiz
+
+    saida = logging.StreamHandler(sys.stderr)
+    if formato == 'json':
+        saida.setFormatter(FormatadorJson())
+    else:
+        saida.setFormatter(logging.Formatter('%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s'))
+    raiz.addHandler(saida)
+    raiz.setLevel(nivel)
+    raiz.propagate = False
+    raiz._sio_configurado = True
+    return raiz
@@ -0,0 +1,715 @@
+import sqlite3
+import logging
+
+
+log = logging.getLogger('sio.migracoes')
+
+# Cada migração recebe uma conexão já dentro da transação do executor.
+# A versão aplicada fica em PRAGMA user_version; nunca altere uma migração
+# já publicada, crie uma nova no fim da lista.
+
+
+def _colunas(conn, tabela):
+    return [coluna[1] for coluna in conn.execute(f'PRAGMA table_info({tabela})')]
+
+
+def _m001_esquema_base(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ocorrencias (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            titulo TEXT NOT NULL,
+            descricao TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            anexo TEXT,
+            status TEXT DEFAULT 'Pendente',
+            data DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Bancos antigos foram criados antes da coluna status
+    if 'status' not in _colunas(conn, 'ocorrencias'):
+        log.info("➕ Adicionando coluna 'status' à tabela ocorrências...")
+        conn.execute("ALTER TABLE ocorrencias ADD COLUMN status TEXT DEFAULT 'Pendente'")
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS administradores (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario TEXT UNIQUE NOT NULL,
+            senha_hash TEXT NOT NULL,
+            nome TEXT NOT NULL,
+            email TEXT,
+            data_criacao DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS respostas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ocorrencia_id INTEGER NOT NULL,
+            administrador_id INTEGER NOT NULL,
+            mensagem TEXT NOT NULL,
+            anexo TEXT,
+            data_resposta DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS historico_status (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ocorrencia_id INTEGER NOT NULL,
+            status_anterior TEXT NOT NULL,
+            status_novo TEXT NOT NULL,
+            administrador_id INTEGER NOT NULL,
+            data_mudanca DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _m002_indices(conn):
+    # Listagem paginada (ORDER BY data DESC, id DESC) e filtros da listagem
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_ocorrencias_data ON ocorrencias (data, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_ocorrencias_status_data ON ocorrencias (status, data, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_ocorrencias_categoria_data ON ocorrencias (categoria, data, id)')
+
+    # Respostas e histórico são sempre buscados por ocorrência, em ordem de data
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_respostas_ocorrencia ON respostas (ocorrencia_id, data_resposta)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_historico_ocorrencia ON historico_status (ocorrencia_id, data_mudanca)')
+
+
+def _m003_remover_data_registro(conn):
+    # Alguns bancos distribuídos ganharam uma coluna data_registro que o
+    # código nunca usou; o valor só é aproveitado se data estiver vazia.
+    if 'data_registro' not in _colunas(conn, 'ocorrencias'):
+        return
+
+    log.info("➖ Removendo coluna legada 'data_registro' de ocorrências...")
+    conn.execute('UPDATE ocorrencias SET data = data_registro WHERE data IS NULL AND data_registro IS NOT NULL')
+
+    if sqlite3.sqlite_version_info >= (3, 35, 0):
+        conn.execute('ALTER TABLE ocorrencias DROP COLUMN data_registro')
+        return
+
+    # SQLite antigo: reconstrói a tabela no formato atual
+    conn.execute('''
+        CREATE TABLE ocorrencias_nova (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            titulo TEXT NOT NULL,
+            descricao TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            anexo TEXT,
+            status TEXT DEFAULT 'Pendente',
+            data DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO ocorrencias_nova (id, titulo, descricao, categoria, anexo, status, data)
+        SELECT id, titulo, descricao, categoria, anexo, status, data FROM ocorrencias
+    ''')
+    conn.execute('DROP TABLE ocorrencias')
+    conn.execute('ALTER TABLE ocorrencias_nova RENAME TO ocorrencias')
+    _m002_indices(conn)
+
+
+def _m004_contadores(conn):
+    # Resumo mantido por triggers para as rotas de estatísticas
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS contadores (
+            dimensao TEXT NOT NULL,
+            valor TEXT NOT NULL DEFAULT '',
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimensao, valor)
+        ) WITHOUT ROWID
+    ''')
+
+    for trigger in (
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_contadores_ocorrencia_insert
+        AFTER INSERT ON ocorrencias
+        BEGIN
+            INSERT INTO contadores (dimensao, valor, total) VALUES ('total', '', 1)
+                ON CONFLICT (dimensao, valor) DO UPDATE SET total = total + 1;
+            INSERT INTO contadores (dimensao, valor, total) VALUES ('status', COALESCE(NEW.status, ''), 1)
+                ON CONFLICT (dimensao, valor) DO UPDATE SET total = total + 1;
+            INSERT INTO contadores (dimensao, valor, total) VALUES ('categoria', NEW.categoria, 1)
+                ON CONFLICT (dimensao, valor) DO UPDATE SET total = total + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_contadores_ocorrencia_delete
+        AFTER DELETE ON ocorrencias
+        BEGIN
+            UPDATE contadores SET total = total - 1 WHERE dimensao = 'total' AND valor = '';
+            UPDATE contadores SET total = total - 1 WHERE dimensao = 'status' AND valor = COALESCE(OLD.status, '');
+            UPDATE contadores SET total = total - 1 WHERE dimensao = 'categoria' AND valor = OLD.categoria;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_contadores_ocorrencia_status
+        AFTER UPDATE OF status ON ocorrencias
+        WHEN OLD.status IS NOT NEW.status
+        BEGIN
+            UPDATE contadores SET total = total - 1 WHERE dimensao = 'status' AND valor = COALESCE(OLD.status, '');
+            INSERT INTO contadores (dimensao, valor, total) VALUES ('status', COALESCE(NEW.status, ''), 1)
+                ON CONFLICT (dimensao, valor) DO UPDATE SET total = total + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_contadores_ocorrencia_categoria
+        AFTER UPDATE OF categoria ON ocorrencias
+        WHEN OLD.categoria IS NOT NEW.categoria
+        BEGIN
+            UPDATE contadores SET total = total - 1 WHERE dimensao = 'categoria' AND valor = OLD.categoria;
+            INSERT INTO contadores (dimensao, valor, total) VALUES ('categoria', NEW.categoria, 1)
+                ON CONFLICT (dimensao, valor) DO UPDATE SET total = total + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_contadores_resposta_insert
+        AFTER INSERT ON respostas
+        WHEN NOT EXISTS (
+            SELECT 1 FROM respostas WHERE ocorrencia_id = NEW.ocorrencia_id AND id <> NEW.id
+        )
+        BEGIN
+            INSERT INTO contadores (dimensao, valor, total) VALUES ('com_resposta', '', 1)
+                ON CONFLICT (dimensao, valor) DO UPDATE SET total = total + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_contadores_resposta_delete
+        AFTER DELETE ON respostas
+        WHEN NOT EXISTS (SELECT 1 FROM respostas WHERE ocorrencia_id = OLD.ocorrencia_id)
+        BEGIN
+            UPDATE contadores SET total = total - 1 WHERE dimensao = 'com_resposta' AND valor = '';
+        END
+        ''',
+    ):
+        conn.execute(trigger)
+
+    # Carga inicial com o que já existe no banco
+    conn.execute('DELETE FROM contadores')
+    conn.execute('''
+        INSERT INTO contadores (dimensao, valor, total)
+        SELECT 'total', '', COUNT(*) FROM ocorrencias
+        UNION ALL
+        SELECT 'status', COALESCE(status, ''), COUNT(*) FROM ocorrencias GROUP BY 2
+        UNION ALL
+        SELECT 'categoria', categoria, COUNT(*) FROM ocorrencias GROUP BY 2
+        UNION ALL
+        SELECT 'com_resposta', '', COUNT(DISTINCT ocorrencia_id) FROM respostas
+    ''')
+
+
+def _m005_versao_dados(conn):
+    # Contador global incrementado por qualquer escrita; vira o ETag das
+    # rotas consultadas periodicamente pelo frontend
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS versao_dados (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            versao INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO versao_dados (id, versao) VALUES (1, 1)')
+
+    for tabela in ('ocorrencias', 'respostas', 'historico_status'):
+        for evento in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_versao_{tabela}_{evento.lower()}
+                AFTER {evento} ON {tabela}
+                BEGIN
+                    UPDATE versao_dados SET versao = versao + 1 WHERE id = 1;
+                END
+            ''')
+
+
+def _m006_eventos(conn):
+    # Backlog de eventos para os fluxos SSE (/api/eventos)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS eventos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tipo TEXT NOT NULL,
+            ocorrencia_id INTEGER,
+            dados TEXT NOT NULL,
+            publico INTEGER NOT NULL DEFAULT 1,
+            criado_em DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _m007_busca_textual(conn):
+    # Índice FTS5 sem acentos e com prefixos de 2 e 3 letras
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS busca_fts USING fts5(
+            titulo, descricao, respostas,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    ''')
+
+    for trigger in (
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_busca_ocorrencia_insert
+        AFTER INSERT ON ocorrencias
+        BEGIN
+            INSERT INTO busca_fts (rowid, titulo, descricao, respostas)
+            VALUES (NEW.id, NEW.titulo, NEW.descricao, '');
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_busca_ocorrencia_update
+        AFTER UPDATE OF titulo, descricao ON ocorrencias
+        BEGIN
+            UPDATE busca_fts SET titulo = NEW.titulo, descricao = NEW.descricao
+            WHERE rowid = NEW.id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_busca_ocorrencia_delete
+        AFTER DELETE ON ocorrencias
+        BEGIN
+            DELETE FROM busca_fts WHERE rowid = OLD.id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_busca_resposta_insert
+        AFTER INSERT ON respostas
+        BEGIN
+            UPDATE busca_fts SET respostas = respostas || ' ' || NEW.mensagem
+            WHERE rowid = NEW.ocorrencia_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_busca_resposta_update
+        AFTER UPDATE OF mensagem ON respostas
+        BEGIN
+            UPDATE busca_fts SET respostas = COALESCE((
+                SELECT group_concat(mensagem, ' ') FROM respostas WHERE ocorrencia_id = NEW.ocorrencia_id
+            ), '')
+            WHERE rowid = NEW.ocorrencia_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_busca_resposta_delete
+        AFTER DELETE ON respostas
+        BEGIN
+            UPDATE busca_fts SET respostas = COALESCE((
+                SELECT group_concat(mensagem, ' ') FROM respostas WHERE ocorrencia_id = OLD.ocorrencia_id
+            ), '')
+            WHERE rowid = OLD.ocorrencia_id;
+        END
+        ''',
+    ):
+        conn.execute(trigger)
+
+    # Carga inicial do índice com as ocorrências e respostas existentes
+    conn.execute('DELETE FROM busca_fts')
+    conn.execute('''
+        INSERT INTO busca_fts (rowid, titulo, descricao, respostas)
+        SELECT o.id, o.titulo, o.descricao,
+               COALESCE((SELECT group_concat(r.mensagem, ' ')
+                         FROM respostas r WHERE r.ocorrencia_id = o.id), '')
+        FROM ocorrencias o
+    ''')
+    conn.execute("INSERT INTO busca_fts (busca_fts) VALUES ('optimize')")
+
+
+def _m008_anexos(conn):
+    # Metadados dos anexos endereçados por conteúdo (ver anexos.py)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS anexos (
+            sha256 TEXT PRIMARY KEY,
+            caminho TEXT NOT NULL,
+            tamanho INTEGER NOT NULL,
+            mime TEXT,
+            nome_original TEXT,
+            criado_em DATETIME DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_anexos_caminho ON anexos (caminho)')
+
+
+def _m009_tarefas_miniaturas(conn):
+    # Fila de geração de miniaturas/prévias dos anexos de imagem
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tarefas_miniaturas (
+            sha256 TEXT PRIMARY KEY,
+            status TEXT NOT NULL DEFAULT 'pendente',
+            tentativas INTEGER NOT NULL DEFAULT 0,
+            erro TEXT,
+            criado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+            atualizado_em DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tarefas_miniaturas_status ON tarefas_miniaturas (status, criado_em)')
+
+
+def _m010_tickets_ingestao(conn):
+    # Ticket devolvido pela ingestão em lote -> ocorrência criada
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tickets_ingestao (
+            ticket TEXT PRIMARY KEY,
+            ocorrencia_id INTEGER,
+            criado_em DATETIME DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    ''')
+
+
+def _m011_arquivamento(conn):
+    # Ids sendo movidos para o banco de arquivo (ver arquivamento.py). Os
+    # triggers de contadores ignoram essas exclusões: as estatísticas
+    # continuam contando as ocorrências arquivadas.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS arquivando (
+            ocorrencia_id INTEGER PRIMARY KEY
+        )
+    ''')
+
+    conn.execute('DROP TRIGGER IF EXISTS trg_contadores_ocorrencia_delete')
+    conn.execute('''
+        CREATE TRIGGER trg_contadores_ocorrencia_delete
+        AFTER DELETE ON ocorrencias
+        WHEN NOT EXISTS (SELECT 1 FROM arquivando WHERE ocorrencia_id = OLD.id)
+        BEGIN
+            UPDATE contadores SET total = total - 1 WHERE dimensao = 'total' AND valor = '';
+            UPDATE contadores SET total = total - 1 WHERE dimensao = 'status' AND valor = COALESCE(OLD.status, '');
+            UPDATE contadores SET total = total - 1 WHERE dimensao = 'categoria' AND valor = OLD.categoria;
+        END
+    ''')
+
+    conn.execute('DROP TRIGGER IF EXISTS trg_contadores_resposta_delete')
+    conn.execute('''
+        CREATE TRIGGER trg_contadores_resposta_delete
+        AFTER DELETE ON respostas
+        WHEN NOT EXISTS (SELECT 1 FROM respostas WHERE ocorrencia_id = OLD.ocorrencia_id)
+         AND NOT EXISTS (SELECT 1 FROM arquivando WHERE ocorrencia_id = OLD.ocorrencia_id)
+        BEGIN
+            UPDATE contadores SET total = total - 1 WHERE dimensao = 'com_resposta' AND valor = '';
+        END
+    ''')
+
+
+def _m012_fila_admin(conn):
+    # Fila do painel admin: uma linha por ocorrência com o que a lista
+    # filtra/ordena (status, categoria, data) e o que antes exigia JOIN
+    # com respostas/historico_status. Mantida pelos triggers abaixo em toda
+    # escrita (rotas, ingestão em lote, arquivamento).
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS fila_admin (
+            ocorrencia_id INTEGER PRIMARY KEY,
+            status TEXT,
+            categoria TEXT NOT NULL,
+            data DATETIME,
+            resposta_count INTEGER NOT NULL DEFAULT 0,
+            ultima_resposta_em DATETIME,
+            status_alterado_em DATETIME,
+            status_alterado_por INTEGER
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_fila_admin_data ON fila_admin (data, ocorrencia_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_fila_admin_status_data ON fila_admin (status, data, ocorrencia_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_fila_admin_categoria_data ON fila_admin (categoria, data, ocorrencia_id)')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_fila_admin_status_categoria_data '
+        'ON fila_admin (status, categoria, data, ocorrencia_id)'
+    )
+
+    for trigger in (
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_fila_ocorrencia_insert
+        AFTER INSERT ON ocorrencias
+        BEGIN
+            INSERT INTO fila_admin (ocorrencia_id, status, categoria, data)
+            VALUES (NEW.id, NEW.status, NEW.categoria, NEW.data);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_fila_ocorrencia_update
+        AFTER UPDATE OF status, categoria, data ON ocorrencias
+        BEGIN
+            UPDATE fila_admin SET status = NEW.status, categoria = NEW.categoria, data = NEW.data
+            WHERE ocorrencia_id = NEW.id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_fila_ocorrencia_delete
+        AFTER DELETE ON ocorrencias
+        BEGIN
+            DELETE FROM fila_admin WHERE ocorrencia_id = OLD.id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_fila_resposta_insert
+        AFTER INSERT ON respostas
+        BEGIN
+            UPDATE fila_admin
+            SET resposta_count = resposta_count + 1,
+                ultima_resposta_em = CASE
+                    WHEN ultima_resposta_em IS NULL OR NEW.data_resposta > ultima_resposta_em
+                    THEN NEW.data_resposta ELSE ultima_resposta_em END
+            WHERE ocorrencia_id = NEW.ocorrencia_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_fila_resposta_delete
+        AFTER DELETE ON respostas
+        BEGIN
+            UPDATE fila_admin
+            SET resposta_count = resposta_count - 1,
+                ultima_resposta_em = (
+                    SELECT MAX(data_resposta) FROM respostas WHERE ocorrencia_id = OLD.ocorrencia_id
+                )
+            WHERE ocorrencia_id = OLD.ocorrencia_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_fila_historico_insert
+        AFTER INSERT ON historico_status
+        BEGIN
+            UPDATE fila_admin
+            SET status_alterado_em = NEW.data_mudanca, status_alterado_por = NEW.administrador_id
+            WHERE ocorrencia_id = NEW.ocorrencia_id;
+        END
+        ''',
+    ):
+        conn.execute(trigger)
+
+    conn.execute('DELETE FROM fila_admin')
+    conn.execute('''
+        INSERT INTO fila_admin (ocorrencia_id, status, categoria, data, resposta_count,
+                                ultima_resposta_em, status_alterado_em, status_alterado_por)
+        SELECT o.id, o.status, o.categoria, o.data,
+               COALESCE(r.total, 0), r.ultima, h.data_mudanca, h.administrador_id
+        FROM ocorrencias o
+        LEFT JOIN (
+            SELECT ocorrencia_id, COUNT(*) AS total, MAX(data_resposta) AS ultima
+            FROM respostas GROUP BY ocorrencia_id
+        ) r ON r.ocorrencia_id = o.id
+        LEFT JOIN historico_status h ON h.id = (
+            SELECT id FROM historico_status
+            WHERE ocorrencia_id = o.id
+            ORDER BY data_mudanca DESC, id DESC LIMIT 1
+        )
+    ''')
+
+
+def _m013_rollup_diario(conn):
+    # Agregados por dia e categoria para /admin/api/analytics (ver agregados.py)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_diario (
+            dia TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            abertas INTEGER NOT NULL DEFAULT 0,
+            resolvidas INTEGER NOT NULL DEFAULT 0,
+            primeiras_respostas INTEGER NOT NULL DEFAULT 0,
+            soma_resolucao REAL NOT NULL DEFAULT 0,
+            soma_primeira_resposta REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (dia, categoria)
+        ) WITHOUT ROWID
+    ''')
+
+    for trigger in (
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_ocorrencia_insert
+        AFTER INSERT ON ocorrencias
+        BEGIN
+            INSERT INTO rollup_diario (dia, categoria, abertas)
+            VALUES (COALESCE(date(NEW.data), date('now')), NEW.categoria, 1)
+            ON CONFLICT (dia, categoria) DO UPDATE SET abertas = abertas + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_resolucao
+        AFTER INSERT ON historico_status
+        WHEN NEW.status_novo = 'Resolvido' AND NEW.status_anterior IS NOT 'Resolvido'
+        BEGIN
+            INSERT INTO rollup_diario (dia, categoria, resolvidas, soma_resolucao)
+            SELECT COALESCE(date(NEW.data_mudanca), date('now')), o.categoria, 1,
+                   COALESCE((julianday(NEW.data_mudanca) - julianday(o.data)) * 86400, 0)
+            FROM ocorrencias o WHERE o.id = NEW.ocorrencia_id
+            ON CONFLICT (dia, categoria) DO UPDATE SET
+                resolvidas = resolvidas + 1,
+                soma_resolucao = soma_resolucao + excluded.soma_resolucao;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_primeira_resposta
+        AFTER INSERT ON respostas
+        WHEN NOT EXISTS (
+            SELECT 1 FROM respostas WHERE ocorrencia_id = NEW.ocorrencia_id AND id <> NEW.id
+        )
+        BEGIN
+            INSERT INTO rollup_diario (dia, categoria, primeiras_respostas, soma_primeira_resposta)
+            SELECT COALESCE(date(NEW.data_resposta), date('now')), o.categoria, 1,
+                   COALESCE((julianday(NEW.data_resposta) - julianday(o.data)) * 86400, 0)
+            FROM ocorrencias o WHERE o.id = NEW.ocorrencia_id
+            ON CONFLICT (dia, categoria) DO UPDATE SET
+                primeiras_respostas = primeiras_respostas + 1,
+                soma_primeira_resposta = soma_primeira_resposta + excluded.soma_primeira_resposta;
+        END
+        ''',
+    ):
+        conn.execute(trigger)
+
+    # Carga inicial: o principal e, se estiver anexado, o banco de arquivo
+    # (uma ocorrência no meio do arquivamento está nos dois: vale a do principal)
+    fontes = {
+        'ocorrencias': 'main.ocorrencias',
+        'respostas': 'main.respostas',
+        'historico_status': 'main.historico_status',
+    }
+    if conn.execute(
+            "SELECT 1 FROM pragma_database_list WHERE name = 'arquivo'").fetchone() and conn.execute(
+            "SELECT 1 FROM arquivo.sqlite_master WHERE type = 'table' AND name = 'ocorrencias'").fetchone():
+        for tabela, colunas, chave in (
+                ('ocorrencias', 'id, categoria, data', 'id'),
+                ('respostas', 'id, ocorrencia_id, data_resposta', 'ocorrencia_id'),
+                ('historico_status', 'ocorrencia_id, status_anterior, status_novo, data_mudanca', 'ocorrencia_id')):
+            fontes[tabela] = f'''(
+                SELECT {colunas} FROM main.{tabela}
+                UNION ALL
+                SELECT {colunas} FROM arquivo.{tabela}
+                WHERE {chave} NOT IN (SELECT id FROM main.ocorrencias)
+            )'''
+
+    conn.execute('DELETE FROM rollup_diario')
+    conn.execute(f'''
+        INSERT INTO rollup_diario (dia, categoria, abertas)
+        SELECT COALESCE(date(data), date('now')), categoria, COUNT(*)
+        FROM {fontes['ocorrencias']} GROUP BY 1, 2
+    ''')
+    conn.execute(f'''
+        INSERT INTO rollup_diario (dia, categoria, resolvidas, soma_resolucao)
+        SELECT COALESCE(date(h.data_mudanca), date('now')), o.categoria, COUNT(*),
+               SUM(COALESCE((julianday(h.data_mudanca) - julianday(o.data)) * 86400, 0))
+        FROM {fontes['historico_status']} h
+        JOIN {fontes['ocorrencias']} o ON o.id = h.ocorrencia_id
+        WHERE h.status_novo = 'Resolvido' AND h.status_anterior IS NOT 'Resolvido'
+        GROUP BY 1, 2
+        ON CONFLICT (dia, categoria) DO UPDATE SET
+            resolvidas = excluded.resolvidas,
+            soma_resolucao = excluded.soma_resolucao
+    ''')
+    conn.execute(f'''
+        INSERT INTO rollup_diario (dia, categoria, primeiras_respostas, soma_primeira_resposta)
+        SELECT COALESCE(date(p.primeira), date('now')), o.categoria, COUNT(*),
+               SUM(COALESCE((julianday(p.primeira) - julianday(o.data)) * 86400, 0))
+        FROM (
+            -- A primeira gravada (menor id), como no trigger
+            SELECT ocorrencia_id, data_resposta AS primeira
+            FROM {fontes['respostas']}
+            WHERE id IN (SELECT MIN(id) FROM {fontes['respostas']} GROUP BY ocorrencia_id)
+        ) p
+        JOIN {fontes['ocorrencias']} o ON o.id = p.ocorrencia_id
+        GROUP BY 1, 2
+        ON CONFLICT (dia, categoria) DO UPDATE SET
+            primeiras_respostas = excluded.primeiras_respostas,
+            soma_primeira_resposta = excluded.soma_primeira_resposta
+    ''')
+
+
+def _m014_sessoes_admin(conn):
+    # Sessões do painel guardadas no servidor (ver sessoes.py). O id é o
+    # sha256 do token do cookie; ultimo_acesso/expira_em em segundos Unix
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sessoes_admin (
+            id TEXT PRIMARY KEY,
+            administrador_id INTEGER NOT NULL,
+            criada_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+            ultimo_acesso INTEGER NOT NULL,
+            expira_em INTEGER NOT NULL,
+            ip TEXT,
+            agente TEXT,
+            revogada_em INTEGER
+        ) WITHOUT ROWID
+    ''')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_sessoes_admin_administrador ON sessoes_admin (administrador_id, expira_em)'
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sessoes_admin_expira ON sessoes_admin (expira_em)')
+
+
+def _m015_arquivamento_filhos_primeiro(conn):
+    # O arquivamento passou a apagar respostas e histórico antes da
+    # ocorrência (FOREIGN KEY dos bancos antigos). Os triggers de busca e da
+    # fila nas respostas ignoram os ids em `arquivando`: a linha do índice e
+    # a da fila saem junto com a ocorrência logo em seguida.
+    conn.execute('DROP TRIGGER IF EXISTS trg_busca_resposta_delete')
+    conn.execute('''
+        CREATE TRIGGER trg_busca_resposta_delete
+        AFTER DELETE ON respostas
+        WHEN NOT EXISTS (SELECT 1 FROM arquivando WHERE ocorrencia_id = OLD.ocorrencia_id)
+        BEGIN
+            UPDATE busca_fts SET respostas = COALESCE((
+                SELECT group_concat(mensagem, ' ') FROM respostas WHERE ocorrencia_id = OLD.ocorrencia_id
+            ), '')
+            WHERE rowid = OLD.ocorrencia_id;
+        END
+    ''')
+
+    conn.execute('DROP TRIGGER IF EXISTS trg_fila_resposta_delete')
+    conn.execute('''
+        CREATE TRIGGER trg_fila_resposta_delete
+        AFTER DELETE ON respostas
+        WHEN NOT EXISTS (SELECT 1 FROM arquivando WHERE ocorrencia_id = OLD.ocorrencia_id)
+        BEGIN
+            UPDATE fila_admin
+            SET resposta_count = resposta_count - 1,
+                ultima_resposta_em = (
+                    SELECT MAX(data_resposta) FROM respostas WHERE ocorrencia_id = OLD.ocorrencia_id
+                )
+            WHERE ocorrencia_id = OLD.ocorrencia_id;
+        END
+    ''')
+
+
+MIGRACOES = [
+    (1, 'esquema base', _m001_esquema_base),
+    (2, 'índices das consultas principais', _m002_indices),
+    (3, "remove coluna legada 'data_registro'", _m003_remover_data_registro),
+    (4, 'contadores de estatísticas mantidos por triggers', _m004_contadores),
+    (5, 'versão global dos dados para requisições condicionais', _m005_versao_dados),
+    (6, 'backlog de eventos para atualizações ao vivo', _m006_eventos),
+    (7, 'índice de busca textual (FTS5)', _m007_busca_textual),
+    (8, 'tabela de anexos endereçados por conteúdo', _m008_anexos),
+    (9, 'fila de geração de miniaturas', _m009_tarefas_miniaturas),
+    (10, 'tickets da ingestão em lote', _m010_tickets_ingestao),
+    (11, 'arquivamento: contadores preservam as ocorrências arquivadas', _m011_arquivamento),
+    (12, 'fila do painel admin com contagem de respostas', _m012_fila_admin),
+    (13, 'agregados diários para as análises do painel', _m013_rollup_diario),
+    (14, 'sessões do painel admin no servidor', _m014_sessoes_admin),
+    (15, 'arquivamento apaga respostas e histórico antes da ocorrência', _m015_arquivamento_filhos_primeiro),
+]
+
+VERSAO_ATUAL = MIGRACOES[-1][0]
+
+
+def versao_do_banco(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def aplicar_migracoes(conn):
+    """Leva o banco até VERSAO_ATUAL; retorna a lista de migrações aplicadas.
+
+    Banco já atualizado custa uma única leitura de PRAGMA. A transação é
+    aberta com BEGIN IMMEDIATE, então processos concorrentes esperam uns
+    pelos outros e o segundo encontra o banco já migrado.
+    """
+    if versao_do_banco(conn) >= VERSAO_ATUAL:
+        return []
+
+    aplicadas = []
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        versao = versao_do_banco(conn)
+        for numero, descricao, migracao in MIGRACOES:
+            if numero <= versao:
+                continue
+            log.info("🔧 Aplicando migração %03d: %s", numero, descricao)
+            migracao(conn)
+            conn.execute(f'PRAGMA user_version = {numero}')
+            aplicadas.append(numero)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return aplicadas
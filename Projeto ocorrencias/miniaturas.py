@@ -0,0 +1,206 @@
+import os
+import logging
+import threading
+import mimetypes
+
+from anexos import sha_do_anexo
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow é opcional: sem ele os anexos seguem só no tamanho original
+    Image = None
+
+# Miniaturas e prévias dos anexos de imagem. As tarefas ficam na tabela
+# `tarefas_miniaturas` (migração 009), gravadas junto com a ocorrência ou
+# resposta, e são consumidas por threads de fundo. Se um derivado sumir do
+# disco ele é recriado na hora em que for pedido.
+
+VARIANTES = {
+    # nome: (largura máxima, altura máxima, qualidade WebP)
+    'miniatura': (320, 320, 70),
+    'previa': (1280, 1280, 80),
+}
+
+MIMES_IMAGEM = {'image/jpeg', 'image/png', 'image/webp', 'image/gif', 'image/bmp'}
+
+MAX_TENTATIVAS = 3
+
+log = logging.getLogger('sio.miniaturas')
+
+
+def eh_imagem(caminho):
+    return mimetypes.guess_type(caminho or '')[0] in MIMES_IMAGEM
+
+
+class GeradorMiniaturas:
+    def __init__(self, pool, armazenamento, threads=2, intervalo=5.0):
+        self.pool = pool
+        self.armazenamento = armazenamento
+        self.threads = threads
+        self.intervalo = intervalo
+        self.pasta = os.path.join(armazenamento.raiz, 'derivados')
+        self._acordar = threading.Event()
+        self._iniciado = False
+
+    @property
+    def disponivel(self):
+        return Image is not None
+
+    def caminho_derivado(self, sha256, variante):
+        return os.path.join(self.pasta, sha256[:2], f'{sha256}_{variante}.webp')
+
+    def urls(self, caminho_anexo):
+        """URLs dos derivados de um anexo (vazio se não for imagem endereçada)"""
+        sha256 = sha_do_anexo(caminho_anexo)
+        if not (self.disponivel and sha256 and eh_imagem(caminho_anexo)):
+            return {}
+        return {
+            f'anexo_{variante}': f'/miniaturas/{sha256}/{variante}'
+            for variante in VARIANTES
+        }
+
+    def enfileirar(self, conn, caminho_anexo):
+        """Agenda os derivados na transação atual; chame acordar() após o commit"""
+        sha256 = sha_do_anexo(caminho_anexo)
+        if not (self.disponivel and sha256 and eh_imagem(caminho_anexo)):
+            return False
+        conn.execute(
+            "INSERT OR IGNORE INTO tarefas_miniaturas (sha256, status) VALUES (?, 'pendente')",
+            (sha256,)
+        )
+        return True
+
+    def acordar(self):
+        self._acordar.set()
+
+    def gerar(self, sha256):
+        """Gera todas as variantes de um anexo a partir do original"""
+        with self.pool.conexao() as conn:
+            linha = conn.execute('SELECT caminho FROM anexos WHERE sha256 = ?', (sha256,)).fetchone()
+        if not linha:
+            raise FileNotFoundError(f'Anexo {sha256} não registrado')
+
+        original = self.armazenamento.caminho_absoluto(linha['caminho'])
+        with Image.open(original) as imagem:
+            imagem = ImageOps.exif_transpose(imagem)
+            # Canal alfa (RGBA, LA, PA) ou cor transparente (P/L/RGB com tRNS) viram RGBA
+            tem_alfa = 'A' in imagem.getbands() or 'transparency' in imagem.info
+            modo = 'RGBA' if tem_alfa else 'RGB'
+            if imagem.mode != modo:
+                imagem = imagem.convert(modo)
+
+            for variante, (largura, altura, qualidade) in VARIANTES.items():
+                copia = imagem.copy()
+                copia.thumbnail((largura, altura), Image.LANCZOS)
+
+                destino = self.caminho_derivado(sha256, variante)
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                temporario = f'{destino}.{threading.get_ident()}.tmp'
+                copia.save(temporario, 'WEBP', quality=qualidade, method=4)
+                os.replace(temporario, destino)
+
+    def garantir(self, sha256, variante):
+        """Caminho do derivado, recriando-o se não existir (ou None: use o original)"""
+        if not self.disponivel or variante not in VARIANTES:
+            return None
+        destino = self.caminho_derivado(sha256, variante)
+        if os.path.exists(destino):
+            return destino
+        if self.falhou(sha256):
+            return None
+        try:
+            self.gerar(sha256)
+        except Image.DecompressionBombError as e:
+            log.warning("⚠️ Anexo %s grande demais para miniatura: %s", sha256[:12], e)
+            self.marcar_falha(sha256, str(e))
+            return None
+        except (OSError, ValueError):
+            return None
+        return destino
+
+    def falhou(self, sha256):
+        """A geração já foi abandonada para este anexo (status 'erro')?"""
+        with self.pool.conexao() as conn:
+            return conn.execute(
+                "SELECT 1 FROM tarefas_miniaturas WHERE sha256 = ? AND status = 'erro'", (sha256,)
+            ).fetchone() is not None
+
+    def marcar_falha(self, sha256, erro):
+        """Desiste do anexo sem novas tentativas; as rotas passam a entregar o original"""
+        with self.pool.conexao() as conn:
+            conn.execute('''
+                INSERT INTO tarefas_miniaturas (sha256, status, erro) VALUES (?, 'erro', ?)
+                ON CONFLICT (sha256) DO UPDATE SET
+                    status = 'erro', erro = excluded.erro, atualizado_em = CURRENT_TIMESTAMP
+            ''', (sha256, erro))
+            conn.commit()
+
+    # ---------- fila em segundo plano ----------
+
+    def _pegar_tarefa(self):
+        with self.pool.conexao() as conn:
+            # Tarefas presas em 'processando' há muito tempo (processo que caiu) voltam à fila
+            linha = conn.execute('''
+                UPDATE tarefas_miniaturas
+                SET status = 'processando', tentativas = tentativas + 1,
+                    atualizado_em = CURRENT_TIMESTAMP
+                WHERE sha256 = (
+                    SELECT sha256 FROM tarefas_miniaturas
+                    WHERE status = 'pendente'
+                       OR (status = 'processando' AND atualizado_em < datetime('now', '-10 minutes'))
+                    ORDER BY criado_em
+                    LIMIT 1
+                )
+                RETURNING sha256, tentativas
+            ''').fetchone()
+            conn.commit()
+        return linha
+
+    def _concluir(self, sha256, erro=None, tentativas=0):
+        if erro is None:
+            status = 'feito'
+        elif tentativas < MAX_TENTATIVAS:
+            status = 'pendente'
+        else:
+            status = 'erro'
+        with self.pool.conexao() as conn:
+            conn.execute('''
+                UPDATE tarefas_miniaturas
+                SET status = ?, erro = ?, atualizado_em = CURRENT_TIMESTAMP
+                WHERE sha256 = ?
+            ''', (status, erro, sha256))
+            conn.commit()
+
+    def _trabalhar(self):
+        while True:
+            try:
+                tarefa = self._pegar_tarefa()
+            except Exception as e:
+                log.exception("❌ Erro ao ler fila de miniaturas: %s", e)
+                tarefa = None
+
+            if tarefa is None:
+                self._acordar.wait(self.intervalo)
+                self._acordar.clear()
+                continue
+
+            try:
+                self.gerar(tarefa['sha256'])
+                self._concluir(tarefa['sha256'])
+            except Image.DecompressionBombError as e:
+                # Repetir não adianta: vai direto para 'erro'
+                log.warning("⚠️ Anexo %s grande demais para miniatura: %s", tarefa['sha256'][:12], e)
+                self.marcar_falha(tarefa['sha256'], str(e))
+            except Exception as e:
+                log.warning("⚠️ Falha ao gerar miniatura %s: %s", tarefa['sha256'][:12], e)
+                self._concluir(tarefa['sha256'], str(e), tarefa['tentativas'])
+
+    def iniciar(self):
+        """Sobe as threads de trabalho (uma vez por processo)"""
+        if self._iniciado or not self.disponivel:
+            return
+        self._iniciado = True
+        for numero in range(self.threads):
+            threading.Thread(
+                target=self._trabalhar, name=f'miniaturas-{numero}', daemon=True
+            ).start()
@@ -0,0 +1,88 @@
+import json
+
+from flask import current_app, request
+
+try:
+    import orjson
+except ImportError:   # opcional: sem ele, json da biblioteca padrão em modo compacto
+    orjson = None
+
+# Serialização das listas (/api/ocorrencias e /admin/api/ocorrencias).
+#
+# As rotas de lista montam o SELECT só com os campos pedidos (?campos=, ou
+# ?fields=), já com a URL do anexo e a descrição truncada (?descricao_max=)
+# calculadas no SQL, e leem tuplas em vez de sqlite3.Row. Com
+# ?formato=colunas a resposta sai como {"campos": [...], "linhas": [[...]]},
+# sem repetir os nomes em cada item. O JSON usa orjson quando instalado.
+
+BACKEND = 'orjson' if orjson else 'json'
+
+FORMATOS = ('objetos', 'colunas')
+
+
+def dumps(dados):
+    """JSON compacto em bytes (UTF-8 sem escapes)"""
+    if orjson is not None:
+        return orjson.dumps(dados)
+    return json.dumps(dados, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def resposta_json(dados, status=200):
+    return current_app.response_class(dumps(dados), status=status, mimetype='application/json')
+
+
+def ler_projecao(disponiveis, padrao):
+    """Campos pedidos em ?campos= (ou ?fields=), validados contra `disponiveis`"""
+    valor = request.args.get('campos', request.args.get('fields', '')).strip()
+    if not valor:
+        return list(padrao)
+    campos = []
+    for campo in valor.split(','):
+        campo = campo.strip()
+        if campo not in disponiveis:
+            raise ValueError(f'Campo desconhecido: {campo}')
+        if campo not in campos:
+            campos.append(campo)
+    return campos
+
+
+def ler_formato():
+    formato = request.args.get('formato', 'objetos')
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido (use {' ou '.join(FORMATOS)})")
+    return formato
+
+
+def ler_descricao_max():
+    """?descricao_max=N: descrição cortada em N caracteres (+ '…'); 0/ausente = inteira"""
+    valor = request.args.get('descricao_max', '').strip()
+    if not valor:
+        return 0
+    if not valor.isdigit():
+        raise ValueError('descricao_max inválido')
+    return int(valor)
+
+
+def expressao_descricao(coluna, maximo):
+    """Expressão SQL da descrição, truncada no banco quando maximo > 0"""
+    if not maximo:
+        return coluna
+    return f"CASE WHEN length({coluna}) > {maximo} THEN substr({coluna}, 1, {maximo}) || '…' ELSE {coluna} END"
+
+
+def montar_select(expressoes, campos, descricao_max=0):
+    """Lista de colunas do SELECT para os campos projetados, na ordem pedida"""
+    colunas = []
+    for campo in campos:
+        expressao = expressoes[campo]
+        if campo == 'descricao':
+            expressao = expressao_descricao(expressao, descricao_max)
+        colunas.append(f'{expressao} AS {campo}')
+    return ', '.join(colunas)
+
+
+def linhas_ou_objetos(campos, linhas, formato):
+    """Tuplas do banco no formato pedido"""
+    if formato == 'colunas':
+        return {'campos': campos, 'linhas': linhas}
+    return [dict(zip(campos, linha)) for linha in linhas]
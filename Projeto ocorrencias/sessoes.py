@@ -0,0 +1,238 @@
+import time
+import hashlib
+import secrets
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+import metricas
+
+# Sessões do painel admin guardadas no servidor (tabela sessoes_admin,
+# migração 014). O cookie assinado do Flask leva só um token aleatório; a
+# tabela guarda o sha256 dele, o administrador, a expiração e a revogação.
+# Assim as sessões podem ser listadas e revogadas, e um cookie antigo deixa
+# de valer mesmo com a assinatura correta.
+#
+# Um LRU em memória na frente da tabela evita uma consulta por requisição:
+# a entrada é reconfirmada no banco a cada VALIDACAO_CACHE segundos, que é
+# o tempo máximo para uma revogação feita em outro worker ser percebida
+# (no próprio processo vale na hora). A expiração desliza com o uso, mas o
+# banco só é atualizado a cada RENOVACAO segundos.
+#
+# O login passa por um balde de fichas (token bucket) por IP e outro por
+# usuário naquele IP antes de calcular o hash: rajadas de tentativas recebem
+# 429 sem gastar CPU. O balde do usuário é por IP para que ninguém consiga
+# bloquear o login do administrador errando a senha dele de outra máquina.
+# Os baldes ficam na memória de cada processo: com N workers o limite
+# efetivo chega a N vezes o configurado. Hashes gravados com parâmetros
+# diferentes de SENHA_METODO são refeitos no próximo login correto.
+
+DURACAO_PADRAO = 8 * 3600
+RENOVACAO = 300
+VALIDACAO_CACHE = 30
+TAMANHO_CACHE = 1024
+INTERVALO_VARREDURA = 600
+
+METODO_SENHA_PADRAO = 'scrypt:32768:8:1'
+
+tentativas_login = metricas.registro.registrar(metricas.Contador(
+    'sio_login_tentativas_total', 'Tentativas de login no painel admin', ('resultado',)))
+
+
+def _hash_token(token):
+    return hashlib.sha256(token.encode('ascii')).hexdigest()
+
+
+def _iso(instante):
+    return datetime.fromtimestamp(instante, timezone.utc).isoformat(timespec='seconds')
+
+
+# ---------- senhas ----------
+
+@lru_cache(maxsize=8)
+def _prefixo_metodo(metodo):
+    """'scrypt' -> 'scrypt:32768:8:1': o prefixo que o werkzeug grava no hash"""
+    return generate_password_hash('', metodo).split('$', 1)[0]
+
+
+def gerar_hash_senha(senha, metodo=METODO_SENHA_PADRAO):
+    return generate_password_hash(senha, metodo)
+
+
+def conferir_senha(conn, admin, senha, metodo=METODO_SENHA_PADRAO):
+    """Confere a senha e, se o hash usa outros parâmetros, grava um novo (sem commit)"""
+    if not check_password_hash(admin['senha_hash'], senha):
+        return False
+    if admin['senha_hash'].split('$', 1)[0] != _prefixo_metodo(metodo):
+        conn.execute('UPDATE administradores SET senha_hash = ? WHERE id = ?',
+                     (gerar_hash_senha(senha, metodo), admin['id']))
+    return True
+
+
+# ---------- limite de tentativas ----------
+
+class LimitadorTentativas:
+    """Balde de fichas por chave: `capacidade` tentativas seguidas, uma nova a cada `reposicao` segundos"""
+
+    def __init__(self, capacidade=5, reposicao=12.0, maximo_chaves=10000):
+        self.capacidade = capacidade
+        self.reposicao = reposicao
+        self.maximo_chaves = maximo_chaves
+        self._baldes = OrderedDict()    # chave -> (fichas, instante)
+        self._lock = threading.Lock()
+
+    def _fichas(self, chave, capacidade, agora):
+        fichas, instante = self._baldes.get(chave, (capacidade, agora))
+        return min(capacidade, fichas + (agora - instante) / self.reposicao)
+
+    def consumir(self, *chaves):
+        """Gasta uma ficha de cada chave; retorna 0 ou os segundos até a próxima tentativa.
+
+        Uma chave pode vir como (chave, capacidade) para um balde de tamanho próprio.
+        """
+        agora = time.monotonic()
+        with self._lock:
+            saldos = {}
+            for chave in chaves:
+                chave, capacidade = chave if isinstance(chave, tuple) else (chave, self.capacidade)
+                saldos[chave] = self._fichas(chave, capacidade, agora)
+            falta = max((1 - fichas) * self.reposicao for fichas in saldos.values())
+            if falta > 0:
+                return falta
+            for chave, fichas in saldos.items():
+                self._baldes[chave] = (fichas - 1, agora)
+                self._baldes.move_to_end(chave)
+            # Chaves antigas já estão com o balde cheio: descartar não muda nada
+            while len(self._baldes) > self.maximo_chaves:
+                self._baldes.popitem(last=False)
+        return 0
+
+
+# ---------- sessões ----------
+
+class ArmazemSessoes:
+    def __init__(self, duracao=DURACAO_PADRAO, tamanho_cache=TAMANHO_CACHE,
+                 validacao_cache=VALIDACAO_CACHE, renovacao=RENOVACAO):
+        self.duracao = duracao
+        self.tamanho_cache = tamanho_cache
+        self.validacao_cache = validacao_cache
+        self.renovacao = renovacao
+        self._cache = OrderedDict()     # id -> (sessao, conferida_em)
+        self._lock = threading.Lock()
+        self._ultima_varredura = 0.0
+
+    def _guardar(self, sessao_id, sessao):
+        with self._lock:
+            self._cache[sessao_id] = (sessao, time.monotonic())
+            self._cache.move_to_end(sessao_id)
+            while len(self._cache) > self.tamanho_cache:
+                self._cache.popitem(last=False)
+
+    def _esquecer(self, sessao_id):
+        with self._lock:
+            self._cache.pop(sessao_id, None)
+
+    def criar(self, conn, admin, ip=None, agente=None):
+        """Abre uma sessão para o administrador; retorna o token do cookie (faz commit)"""
+        token = secrets.token_urlsafe(32)
+        sessao_id = _hash_token(token)
+        agora = time.time()
+        conn.execute('''
+            INSERT INTO sessoes_admin (id, administrador_id, ultimo_acesso, expira_em, ip, agente)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (sessao_id, admin['id'], int(agora), int(agora + self.duracao), ip, (agente or '')[:200]))
+        if time.monotonic() - self._ultima_varredura > INTERVALO_VARREDURA:
+            self.varrer(conn)
+        conn.commit()
+
+        self._guardar(sessao_id, {
+            'id': sessao_id, 'administrador_id': admin['id'], 'usuario': admin['usuario'],
+            'nome': admin['nome'], 'ultimo_acesso': int(agora), 'expira_em': int(agora + self.duracao)
+        })
+        return token
+
+    def validar(self, token, obter_conn):
+        """Sessão ativa do token, ou None. `obter_conn` só é chamado se o LRU não bastar"""
+        if not token:
+            return None
+        sessao_id = _hash_token(token)
+        agora = time.time()
+
+        with self._lock:
+            entrada = self._cache.get(sessao_id)
+            if entrada is not None:
+                self._cache.move_to_end(sessao_id)
+        if entrada is not None:
+            sessao, conferida_em = entrada
+            if (time.monotonic() - conferida_em < self.validacao_cache and sessao['expira_em'] > agora
+                    and agora - sessao['ultimo_acesso'] < self.renovacao):
+                return sessao
+
+        conn = obter_conn()
+        linha = conn.execute('''
+            SELECT s.id, s.administrador_id, s.ultimo_acesso, s.expira_em, a.usuario, a.nome
+            FROM sessoes_admin s
+            JOIN administradores a ON a.id = s.administrador_id
+            WHERE s.id = ? AND s.revogada_em IS NULL AND s.expira_em > ?
+        ''', (sessao_id, int(agora))).fetchone()
+        if linha is None:
+            self._esquecer(sessao_id)
+            return None
+
+        sessao = {
+            'id': linha[0], 'administrador_id': linha[1], 'ultimo_acesso': linha[2],
+            'expira_em': linha[3], 'usuario': linha[4], 'nome': linha[5]
+        }
+        # Expiração deslizante, gravada no máximo a cada `renovacao` segundos
+        if agora - sessao['ultimo_acesso'] >= self.renovacao:
+            sessao['ultimo_acesso'] = int(agora)
+            sessao['expira_em'] = int(agora + self.duracao)
+            conn.execute('UPDATE sessoes_admin SET ultimo_acesso = ?, expira_em = ? WHERE id = ?',
+                         (sessao['ultimo_acesso'], sessao['expira_em'], sessao_id))
+            conn.commit()
+        self._guardar(sessao_id, sessao)
+        return sessao
+
+    def revogar(self, conn, sessao_id, administrador_id=None):
+        """Revoga uma sessão (do administrador, se informado); retorna se havia uma ativa"""
+        filtro, parametros = '', [int(time.time()), sessao_id]
+        if administrador_id is not None:
+            filtro = 'AND administrador_id = ?'
+            parametros.append(administrador_id)
+        revogadas = conn.execute(f'''
+            UPDATE sessoes_admin SET revogada_em = ?
+            WHERE id = ? AND revogada_em IS NULL {filtro}
+        ''', parametros).rowcount
+        conn.commit()
+        self._esquecer(sessao_id)
+        return revogadas > 0
+
+    def revogar_token(self, conn, token):
+        return self.revogar(conn, _hash_token(token)) if token else False
+
+    def listar(self, conn, administrador_id):
+        """Sessões ativas do administrador, da mais recente para a mais antiga"""
+        return [
+            {
+                'id': linha[0], 'criada_em': linha[1], 'ultimo_acesso': _iso(linha[2]),
+                'expira_em': _iso(linha[3]), 'ip': linha[4], 'agente': linha[5]
+            }
+            for linha in conn.execute('''
+                SELECT id, criada_em, ultimo_acesso, expira_em, ip, agente FROM sessoes_admin
+                WHERE administrador_id = ? AND revogada_em IS NULL AND expira_em > ?
+                ORDER BY ultimo_acesso DESC
+            ''', (administrador_id, int(time.time())))
+        ]
+
+    def varrer(self, conn):
+        """Apaga sessões expiradas e revogadas (sem commit); retorna quantas"""
+        self._ultima_varredura = time.monotonic()
+        return conn.execute(
+            'DELETE FROM sessoes_admin WHERE expira_em <= ? OR revogada_em IS NOT NULL', (int(time.time()),)
+        ).rowcount
+
+    def id_do_token(self, token):
+        return _hash_token(token) if token else None
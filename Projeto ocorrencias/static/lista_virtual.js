@@ -0,0 +1,305 @@
+// Sistema de Ocorrências - SIO
+// Lista virtualizada das ocorrências (consulta pública e painel admin).
+//
+// Só os cards na tela (mais uma margem acima e abaixo) existem no DOM; o
+// resto da lista é ocupado por dois espaçadores com a altura somada dos
+// cards que não foram montados. A altura de cada card é medida quando ele
+// é montado; os que nunca apareceram usam a média das medidas.
+//
+// Os dados são comparados por id: uma recarga (poll, filtro) mantém os
+// cards cujos campos não mudaram, recria só os alterados e remove os que
+// saíram. Quando o fim da lista chega perto da tela, `aoChegarNoFim` é
+// chamado para buscar a próxima página.
+
+class ListaVirtual {
+    constructor(container, opcoes) {
+        this.container = container;
+        this.criarItem = opcoes.criarItem;
+        this.aoChegarNoFim = opcoes.aoChegarNoFim || null;
+        this.aoMontar = opcoes.aoMontar || null;
+        this.aoDesmontar = opcoes.aoDesmontar || null;
+        this.alturaEstimada = opcoes.alturaEstimada || 200;
+        this.espaco = opcoes.espaco ?? 16;          // px entre cards
+        this.margem = opcoes.margem ?? 800;         // px montados além da tela
+
+        this._itens = [];
+        this._indices = new Map();     // id -> posição em _itens
+        this._alturas = new Map();     // id -> altura medida (com o espaço)
+        this._montados = new Map();    // id -> elemento no DOM
+        this._novos = new Set();       // ids que chegaram ao vivo: entram com animação
+        this._posicoes = null;         // soma acumulada das alturas (null = recalcular)
+        this._agendado = false;
+
+        this._topo = document.createElement('div');
+        this._base = document.createElement('div');
+        this._topo.setAttribute('aria-hidden', 'true');
+        this._base.setAttribute('aria-hidden', 'true');
+
+        this._aoRolar = () => this.agendar();
+        this._aoRedimensionar = () => {
+            // Outra largura, outras alturas: as medidas viram só estimativas
+            this._alturas.clear();
+            this._posicoes = null;
+            this.agendar();
+        };
+        window.addEventListener('scroll', this._aoRolar, { passive: true });
+        window.addEventListener('resize', this._aoRedimensionar);
+    }
+
+    // Solta os eventos da janela e esvazia o container
+    destruir() {
+        window.removeEventListener('scroll', this._aoRolar);
+        window.removeEventListener('resize', this._aoRedimensionar);
+        this.limpar();
+    }
+
+    get itens() {
+        return this._itens;
+    }
+
+    get tamanho() {
+        return this._itens.length;
+    }
+
+    obter(id) {
+        const indice = this._indices.get(id);
+        return indice === undefined ? undefined : this._itens[indice];
+    }
+
+    contem(id) {
+        return this._indices.has(id);
+    }
+
+    // ---------- alterações nos dados ----------
+
+    // Substitui a lista inteira, reaproveitando os cards dos itens que não mudaram
+    definir(itens) {
+        const resumo = { adicionados: 0, alterados: 0, removidos: 0 };
+        const anteriores = this._indices;
+        const vistos = new Set();
+
+        this._itens = itens.map(item => {
+            vistos.add(item.id);
+            const indice = anteriores.get(item.id);
+            if (indice === undefined) {
+                resumo.adicionados++;
+                return item;
+            }
+            const atual = this._itens[indice];
+            if (ListaVirtual.iguais(atual, item)) return atual;
+            resumo.alterados++;
+            this._descartarElemento(item.id);
+            return item;
+        });
+
+        for (const id of anteriores.keys()) {
+            if (!vistos.has(id)) {
+                resumo.removidos++;
+                this._descartarElemento(id);
+                this._alturas.delete(id);
+                this._novos.delete(id);
+            }
+        }
+
+        this._reindexar();
+        this.agendar();
+        return resumo;
+    }
+
+    // Próxima página: acrescenta ao fim os itens que ainda não estão na lista
+    acrescentar(itens) {
+        const novos = itens.filter(item => !this._indices.has(item.id));
+        novos.forEach(item => this._itens.push(item));
+        this._reindexar();
+        this.agendar();
+        return novos;
+    }
+
+    // Item recebido ao vivo, no início ou no fim da lista
+    inserir(item, noInicio = true) {
+        if (this._indices.has(item.id)) return false;
+        if (noInicio) {
+            this._itens.unshift(item);
+        } else {
+            this._itens.push(item);
+        }
+        this._novos.add(item.id);
+        this._reindexar();
+        this.agendar();
+        return true;
+    }
+
+    remover(id) {
+        const indice = this._indices.get(id);
+        if (indice === undefined) return false;
+        this._itens.splice(indice, 1);
+        this._descartarElemento(id);
+        this._alturas.delete(id);
+        this._novos.delete(id);
+        this._reindexar();
+        this.agendar();
+        return true;
+    }
+
+    // O item mudou (alterado no lugar): recria o card se estiver montado
+    redesenhar(id) {
+        const antigo = this._montados.get(id);
+        if (!antigo) return;
+        const novo = this.criarItem(this.obter(id));
+        novo.dataset.id = id;
+        novo.style.marginBottom = `${this.espaco}px`;
+        if (this.aoDesmontar) this.aoDesmontar(antigo, id);
+        antigo.replaceWith(novo);
+        this._montados.set(id, novo);
+        if (this.aoMontar) this.aoMontar(novo, id);
+        this.agendar();
+    }
+
+    // Esvazia a lista e o container (ex.: antes de mostrar uma mensagem de erro)
+    limpar() {
+        for (const id of [...this._montados.keys()]) this._descartarElemento(id);
+        this._itens = [];
+        this._novos.clear();
+        this._reindexar();
+        this.container.replaceChildren();
+    }
+
+    static iguais(a, b) {
+        const chaves = Object.keys(a);
+        if (chaves.length !== Object.keys(b).length) return false;
+        return chaves.every(chave => a[chave] === b[chave]);
+    }
+
+    // ---------- desenho ----------
+
+    agendar() {
+        if (this._agendado) return;
+        this._agendado = true;
+        requestAnimationFrame(() => this.desenhar());
+    }
+
+    // Monta os cards do trecho visível e ajusta os espaçadores (síncrono)
+    desenhar() {
+        this._agendado = false;
+        if (this._topo.parentNode !== this.container) {
+            // Container usado por fora (mensagem de erro): só volta quando houver itens
+            if (!this._itens.length) return;
+            for (const id of [...this._montados.keys()]) this._descartarElemento(id);
+            this.container.replaceChildren(this._topo, this._base);
+        }
+
+        const posicoes = this._calcularPosicoes();
+        const total = this._itens.length;
+        const inicioLista = this.container.getBoundingClientRect().top;
+        const inicio = this._buscar(posicoes, -inicioLista - this.margem);
+        const fim = Math.min(total, this._buscar(posicoes, window.innerHeight - inicioLista + this.margem) + 1);
+
+        // Desmonta o que saiu do trecho
+        for (const [id, elemento] of this._montados) {
+            const indice = this._indices.get(id);
+            if (indice === undefined || indice < inicio || indice >= fim) {
+                if (this.aoDesmontar) this.aoDesmontar(elemento, id);
+                elemento.remove();
+                this._montados.delete(id);
+            }
+        }
+
+        // Monta o que falta, na ordem da lista
+        let anterior = this._topo;
+        for (let i = inicio; i < fim; i++) {
+            const id = this._itens[i].id;
+            let elemento = this._montados.get(id);
+            if (!elemento) {
+                elemento = this._montar(this._itens[i]);
+            }
+            if (anterior.nextSibling !== elemento) {
+                this.container.insertBefore(elemento, anterior.nextSibling);
+            }
+            anterior = elemento;
+        }
+
+        this._topo.style.height = `${posicoes[inicio]}px`;
+        this._base.style.height = `${posicoes[total] - posicoes[fim]}px`;
+
+        // Mede os montados; se alguma estimativa estava errada, acerta os espaçadores no próximo quadro
+        let mudou = false;
+        for (let i = inicio; i < fim; i++) {
+            const id = this._itens[i].id;
+            const altura = this._montados.get(id).offsetHeight + this.espaco;
+            if (this._alturas.get(id) !== altura) {
+                this._alturas.set(id, altura);
+                mudou = true;
+            }
+        }
+        if (mudou) {
+            this._posicoes = null;
+            this.agendar();
+        }
+
+        if (fim >= total && total > 0 && this.aoChegarNoFim) this.aoChegarNoFim();
+    }
+
+    _montar(item) {
+        const elemento = this.criarItem(item);
+        elemento.dataset.id = item.id;
+        elemento.style.marginBottom = `${this.espaco}px`;
+        if (this._novos.delete(item.id)) {
+            elemento.style.opacity = '0';
+            elemento.style.transform = 'translateY(20px)';
+            elemento.style.transition = 'all 0.6s ease';
+            requestAnimationFrame(() => {
+                elemento.style.opacity = '1';
+                elemento.style.transform = 'translateY(0)';
+            });
+        }
+        this._montados.set(item.id, elemento);
+        if (this.aoMontar) this.aoMontar(elemento, item.id);
+        return elemento;
+    }
+
+    _descartarElemento(id) {
+        const elemento = this._montados.get(id);
+        if (!elemento) return;
+        if (this.aoDesmontar) this.aoDesmontar(elemento, id);
+        elemento.remove();
+        this._montados.delete(id);
+    }
+
+    _reindexar() {
+        this._indices = new Map(this._itens.map((item, i) => [item.id, i]));
+        this._posicoes = null;
+    }
+
+    _calcularPosicoes() {
+        if (this._posicoes) return this._posicoes;
+        let medidas = 0;
+        let soma = 0;
+        for (const altura of this._alturas.values()) {
+            medidas++;
+            soma += altura;
+        }
+        const media = medidas ? soma / medidas : this.alturaEstimada + this.espaco;
+
+        const posicoes = new Float64Array(this._itens.length + 1);
+        for (let i = 0; i < this._itens.length; i++) {
+            posicoes[i + 1] = posicoes[i] + (this._alturas.get(this._itens[i].id) ?? media);
+        }
+        this._posicoes = posicoes;
+        return posicoes;
+    }
+
+    // Índice do item que contém o deslocamento `y` (busca binária nas posições)
+    _buscar(posicoes, y) {
+        let baixo = 0;
+        let alto = posicoes.length - 2;
+        if (alto < 0 || y <= 0) return 0;
+        while (baixo < alto) {
+            const meio = (baixo + alto + 1) >> 1;
+            if (posicoes[meio] <= y) baixo = meio;
+            else alto = meio - 1;
+        }
+        return baixo;
+    }
+}
+
+window.ListaVirtual = ListaVirtual;
@@ -3,11 +3,50 @@ console.log('🔧 SIO - Sistema carregado');
 
 // Estado global
 let estado = {
-    ocorrencias: [],
     filtroCategoria: '',
+    proximoCursor: null,
+    urlPrimeiraPagina: null,
+    paginasCarregadas: 0,
+    busca: '',
+    proximaPaginaBusca: null,
     carregando: false
 };
 
+const TAMANHO_PAGINA = 20;
+// Os cards mostram um resumo; a descrição inteira vem no detalhe
+const RESUMO_DESCRICAO = 280;
+
+// Lista virtualizada (static/lista_virtual.js): guarda as ocorrências exibidas
+// e monta só os cards visíveis
+let listaVirtual = null;
+
+// ========== REQUISIÇÕES CONDICIONAIS ==========
+// Guarda o último ETag/corpo por URL; se o servidor responder 304 os dados
+// anteriores são reaproveitados e quem chamou pode pular a re-renderização
+const cacheVersoes = new Map();
+
+async function buscarComVersao(url) {
+    const anterior = cacheVersoes.get(url);
+    const headers = anterior ? { 'If-None-Match': anterior.etag } : {};
+
+    const resposta = await fetch(url, { headers, cache: 'no-store' });
+    if (resposta.status === 304 && anterior) {
+        return { ok: true, status: 304, inalterado: true, dados: anterior.dados };
+    }
+
+    const dados = await resposta.json();
+    const etag = resposta.headers.get('ETag');
+    if (resposta.ok && etag) {
+        cacheVersoes.set(url, { etag, dados });
+    }
+    return { ok: resposta.ok, status: resposta.status, inalterado: false, dados };
+}
+
+// Formato compacto (?formato=colunas): {campos: [...], linhas: [[...]]} -> objetos
+function paraObjetos({ campos, linhas }) {
+    return linhas.map(linha => Object.fromEntries(campos.map((campo, i) => [campo, linha[i]])));
+}
+
 // Quando a página carrega
 document.addEventListener('DOMContentLoaded', function() {
     console.log('✅ Página carregada');
@@ -20,12 +59,28 @@ function inicializarPagina() {
     // Página de consulta
     if (document.getElementById('listaOcorrencias')) {
         console.log('🔄 Iniciando carga de ocorrências...');
+        listaVirtual = new ListaVirtual(document.getElementById('listaOcorrencias'), {
+            criarItem: criarCardOcorrencia,
+            alturaEstimada: 190,
+            // Rolou até o fim: busca a próxima página sozinho
+            aoChegarNoFim: carregarMaisOcorrencias
+        });
         carregarOcorrencias();
         
         // Inicializa filtros
-        const filtroCategoria = document.getElementById('filtroCategoria');
-        if (filtroCategoria) {
-            filtroCategoria.addEventListener('change', aplicarFiltros);
+        ['filtroCategoria', 'filtroStatus', 'filtroDataInicio', 'filtroDataFim'].forEach(id => {
+            const filtro = document.getElementById(id);
+            if (filtro) filtro.addEventListener('change', aplicarFiltros);
+        });
+
+        // Busca textual: espera o usuário parar de digitar
+        const campoBusca = document.getElementById('campoBusca');
+        if (campoBusca) {
+            let espera = null;
+            campoBusca.addEventListener('input', () => {
+                clearTimeout(espera);
+                espera = setTimeout(aplicarFiltros, 300);
+            });
         }
     }
     
@@ -199,7 +254,26 @@ async function enviarOcorrencia(e) {
 }
 
 // ========== CONSULTA MELHORADA ==========
-async function carregarOcorrencias() {
+function montarUrlOcorrencias(cursor) {
+    const params = new URLSearchParams({
+        limite: TAMANHO_PAGINA, formato: 'colunas', descricao_max: RESUMO_DESCRICAO
+    });
+    const filtros = {
+        categoria: 'filtroCategoria',
+        status: 'filtroStatus',
+        data_inicio: 'filtroDataInicio',
+        data_fim: 'filtroDataFim'
+    };
+    Object.entries(filtros).forEach(([param, id]) => {
+        const campo = document.getElementById(id);
+        if (campo && campo.value) params.set(param, campo.value);
+    });
+    if (cursor) params.set('cursor', cursor);
+    return `/api/ocorrencias?${params}`;
+}
+
+// Carrega a primeira página (ou a próxima, quando maisPaginas = true)
+async function carregarOcorrencias(maisPaginas = false) {
     console.log('📋 Buscando ocorrências...');
     
     const lista = document.getElementById('listaOcorrencias');
@@ -207,6 +281,7 @@ async function carregarOcorrencias() {
     const loading = document.getElementById('loadingOcorrencias');
 
     if (!lista) return;
+    if (maisPaginas && !estado.proximoCursor) return;
 
     // Mostra loading
     estado.carregando = true;
@@ -214,20 +289,46 @@ async function carregarOcorrencias() {
     if (lista) lista.classList.add('opacity-50');
 
     try {
-        const resposta = await fetch('/api/ocorrencias');
+        const url = montarUrlOcorrencias(maisPaginas ? estado.proximoCursor : null);
+        const resposta = await buscarComVersao(url);
         console.log(`📨 Status da API: ${resposta.status}`);
         
         if (!resposta.ok) throw new Error(`Erro HTTP: ${resposta.status}`);
         
-        const ocorrencias = await resposta.json();
-        estado.ocorrencias = ocorrencias;
+        // Nada mudou desde a última vez que esta mesma primeira página foi exibida
+        if (!maisPaginas && resposta.inalterado && url === estado.urlPrimeiraPagina) return;
+        
+        const pagina = resposta.dados;
+        const ocorrencias = paraObjetos(pagina);
         
-        console.log(`✅ Recebidas ${ocorrencias.length} ocorrências:`, ocorrencias);
-        renderizarOcorrencias(ocorrencias);
+        console.log(`✅ Recebidas ${ocorrencias.length} ocorrências`);
+        if (maisPaginas) {
+            estado.proximoCursor = pagina.proximo_cursor;
+            estado.paginasCarregadas++;
+            listaVirtual.acrescentar(ocorrencias);
+        } else if (url === estado.urlPrimeiraPagina && estado.paginasCarregadas > 1) {
+            // Atualização da mesma consulta: renova a primeira página e mantém as
+            // seguintes já carregadas (o cursor delas continua valendo)
+            const ids = new Set(ocorrencias.map(occ => occ.id));
+            renderizarOcorrencias(ocorrencias.concat(
+                listaVirtual.itens.filter(occ => !ids.has(occ.id) && atendeFiltros(occ))
+            ));
+        } else {
+            estado.urlPrimeiraPagina = url;
+            estado.proximoCursor = pagina.proximo_cursor;
+            estado.paginasCarregadas = 1;
+            renderizarOcorrencias(ocorrencias);
+        }
+        atualizarPaginacao();
+        carregarEstatisticas();
 
     } catch (erro) {
         console.error('❌ Erro ao carregar ocorrências:', erro);
-        mostrarErroCarregamento(erro);
+        if (maisPaginas) {
+            mostrarToast('❌ Erro ao carregar mais ocorrências', 'error');
+        } else {
+            mostrarErroCarregamento(erro);
+        }
     } finally {
         estado.carregando = false;
         if (loading) loading.classList.add('hidden');
@@ -235,13 +336,71 @@ async function carregarOcorrencias() {
     }
 }
 
-function renderizarOcorrencias(ocorrencias) {
+// Busca textual (/api/busca): resultados por relevância, paginados por número
+async function carregarBusca(maisPaginas = false) {
     const lista = document.getElementById('listaOcorrencias');
+    const loading = document.getElementById('loadingOcorrencias');
+    if (maisPaginas && !estado.proximaPaginaBusca) return;
+
+    const params = new URLSearchParams({ q: estado.busca, limite: TAMANHO_PAGINA });
+    const categoria = document.getElementById('filtroCategoria')?.value;
+    const status = document.getElementById('filtroStatus')?.value;
+    if (categoria) params.set('categoria', categoria);
+    if (status) params.set('status', status);
+    if (maisPaginas) params.set('pagina', estado.proximaPaginaBusca);
+
+    estado.carregando = true;
+    if (loading) loading.classList.remove('hidden');
+    if (lista) lista.classList.add('opacity-50');
+
+    try {
+        const resposta = await buscarComVersao(`/api/busca?${params}`);
+        if (!resposta.ok) throw new Error(resposta.dados.erro || `Erro HTTP: ${resposta.status}`);
+
+        const { resultados, proxima_pagina } = resposta.dados;
+        estado.proximaPaginaBusca = proxima_pagina;
+        if (maisPaginas) {
+            listaVirtual.acrescentar(resultados);
+        } else {
+            renderizarOcorrencias(resultados);
+        }
+        atualizarPaginacao();
+
+    } catch (erro) {
+        console.error('❌ Erro na busca:', erro);
+        if (maisPaginas) {
+            mostrarToast('❌ Erro ao carregar mais resultados', 'error');
+        } else {
+            mostrarErroCarregamento(erro);
+        }
+    } finally {
+        estado.carregando = false;
+        if (loading) loading.classList.add('hidden');
+        if (lista) lista.classList.remove('opacity-50');
+    }
+}
+
+function carregarMaisOcorrencias() {
+    if (estado.carregando) return;
+    if (estado.busca) {
+        carregarBusca(true);
+    } else {
+        carregarOcorrencias(true);
+    }
+}
+
+function atualizarPaginacao() {
+    const paginacao = document.getElementById('paginacaoOcorrencias');
+    const temMais = estado.busca ? estado.proximaPaginaBusca : estado.proximoCursor;
+    if (paginacao) paginacao.classList.toggle('hidden', !temMais);
+}
+
+// Troca os dados da lista; só os cards novos ou alterados são recriados
+function renderizarOcorrencias(ocorrencias) {
     const semOcorrencias = document.getElementById('semOcorrencias');
     const estatisticas = document.getElementById('estatisticas');
 
-    // Limpa lista
-    lista.innerHTML = '';
+    const resumo = listaVirtual.definir(ocorrencias);
 
     if (ocorrencias.length === 0) {
         console.log('📭 Nenhuma ocorrência encontrada');
@@ -254,30 +413,14 @@ function renderizarOcorrencias(ocorrencias) {
     if (semOcorrencias) semOcorrencias.classList.add('hidden');
     if (estatisticas) estatisticas.classList.remove('hidden');
 
-    // Atualiza estatísticas
-    atualizarEstatisticas(ocorrencias);
-
-    // Adiciona cada ocorrência
-    ocorrencias.forEach((ocorrencia, index) => {
-        const card = criarCardOcorrencia(ocorrencia);
-        lista.appendChild(card);
-        
-        // Anima a entrada
-        setTimeout(() => {
-            card.style.opacity = '1';
-            card.style.transform = 'translateY(0)';
-        }, index * 100);
-    });
-
-    console.log('🎉 Ocorrências exibidas com sucesso!');
+    console.log(`🎉 Ocorrências exibidas: ${resumo.adicionados} novas, ${resumo.alterados} alteradas, ${resumo.removidos} removidas`);
 }
 
+// O espaço entre os cards e a animação de entrada ficam com a ListaVirtual
 function criarCardOcorrencia(ocorrencia) {
     const card = document.createElement('div');
-    card.className = 'card-hover bg-white rounded-xl border border-gray-200 p-6 mb-4';
-    card.style.opacity = '0';
-    card.style.transform = 'translateY(20px)';
-    card.style.transition = 'all 0.6s ease';
+    card.className = 'card-hover bg-white rounded-xl border border-gray-200 p-6';
+    card.dataset.id = ocorrencia.id;
     
     const badgeClass = obterClasseBadge(ocorrencia.categoria);
     const statusClass = obterClasseStatus(ocorrencia.status);
@@ -286,12 +429,12 @@ function criarCardOcorrencia(ocorrencia) {
         <div class="flex flex-col sm:flex-row sm:justify-between sm:items-start gap-4 mb-4">
             <div class="flex-1">
                 <div class="flex flex-wrap items-center gap-2 mb-2">
-                    <h3 class="text-xl font-bold text-gray-900">${ocorrencia.titulo || 'Sem título'}</h3>
+                    <h3 class="text-xl font-bold text-gray-900">${ocorrencia.titulo_destacado || ocorrencia.titulo || 'Sem título'}</h3>
                     <span class="${statusClass} px-3 py-1 rounded-full text-sm font-semibold">
                         ${ocorrencia.status || 'Pendente'}
                     </span>
                 </div>
-                <p class="text-gray-600 leading-relaxed">${ocorrencia.descricao || 'Sem descrição'}</p>
+                <p class="text-gray-600 leading-relaxed">${ocorrencia.trecho || ocorrencia.descricao || 'Sem descrição'}</p>
             </div>
             <div class="flex flex-wrap gap-2">
                 <span class="${badgeClass} px-3 py-1 rounded-full text-sm font-semibold">
@@ -367,51 +510,62 @@ function obterClasseStatus(status) {
     return classes[status] || 'status-pendente';
 }
 
-function atualizarEstatisticas(ocorrencias) {
+// Estatísticas vêm do servidor: a lista carrega só uma página
+async function carregarEstatisticas() {
     const totalElement = document.getElementById('totalOcorrencias');
     const categoriasElement = document.getElementById('categoriasOcorrencias');
-    
-    if (totalElement) {
-        totalElement.textContent = ocorrencias.length;
-    }
-    
-    if (categoriasElement) {
-        const categorias = ocorrencias.reduce((acc, occ) => {
-            acc[occ.categoria] = (acc[occ.categoria] || 0) + 1;
-            return acc;
-        }, {});
+    if (!totalElement && !categoriasElement) return;
+
+    try {
+        const resposta = await buscarComVersao('/api/estatisticas');
+        if (!resposta.ok || resposta.inalterado) return;
+        const stats = resposta.dados;
+
+        if (totalElement) {
+            totalElement.textContent = stats.total;
+        }
         
-        categoriasElement.innerHTML = Object.entries(categorias)
-            .map(([cat, count]) => `<span class="bg-white bg-opacity-20 px-2 py-1 rounded text-sm mx-1">${cat}: ${count}</span>`)
-            .join(' ');
+        if (categoriasElement) {
+            categoriasElement.innerHTML = stats.categorias
+                .map(cat => `<span class="bg-white bg-opacity-20 px-2 py-1 rounded text-sm mx-1">${cat.categoria}: ${cat.count}</span>`)
+                .join(' ');
+        }
+    } catch (erro) {
+        console.error('Erro ao carregar estatísticas:', erro);
     }
 }
 
 function aplicarFiltros() {
-    const filtroCategoria = document.getElementById('filtroCategoria');
-    const categoria = filtroCategoria ? filtroCategoria.value : '';
-    
-    let ocorrenciasFiltradas = estado.ocorrencias;
-    
-    if (categoria) {
-        ocorrenciasFiltradas = estado.ocorrencias.filter(occ => 
-            occ.categoria === categoria
-        );
+    // Os filtros são aplicados no servidor: recomeça da primeira página
+    estado.proximoCursor = null;
+    estado.proximaPaginaBusca = null;
+    estado.busca = document.getElementById('campoBusca')?.value.trim() || '';
+
+    if (estado.busca) {
+        carregarBusca();
+    } else {
+        estado.urlPrimeiraPagina = null;
+        carregarOcorrencias();
     }
-    
-    renderizarOcorrencias(ocorrenciasFiltradas);
 }
 
 function limparFiltros() {
-    const filtroCategoria = document.getElementById('filtroCategoria');
-    if (filtroCategoria) filtroCategoria.value = '';
+    ['campoBusca', 'filtroCategoria', 'filtroStatus', 'filtroDataInicio', 'filtroDataFim'].forEach(id => {
+        const filtro = document.getElementById(id);
+        if (filtro) filtro.value = '';
+    });
     
-    renderizarOcorrencias(estado.ocorrencias);
+    aplicarFiltros();
 }
 
-function copiarOcorrencia(id) {
-    const ocorrencia = estado.ocorrencias.find(occ => occ.id === id);
+async function copiarOcorrencia(id) {
+    let ocorrencia = listaVirtual.obter(id);
     if (ocorrencia) {
+        // A lista traz a descrição resumida; copia a inteira
+        if (ocorrencia.descricao && ocorrencia.descricao.length > RESUMO_DESCRICAO) {
+            const response = await fetch(`/api/ocorrencia/${id}`);
+            if (response.ok) ocorrencia = (await response.json()).ocorrencia;
+        }
         const texto = `Ocorrência #${ocorrencia.id}\nTítulo: ${ocorrencia.titulo}\nCategoria: ${ocorrencia.categoria}\nDescrição: ${ocorrencia.descricao}\nData: ${ocorrencia.data}\nStatus: ${ocorrencia.status}`;
         navigator.clipboard.writeText(texto).then(() => {
             mostrarToast('📋 Ocorrência copiada para a área de transferência!', 'success');
@@ -441,6 +595,17 @@ async function verDetalhesOcorrencia(ocorrenciaId) {
     }
 }
 
+// Miniatura do anexo de imagem (carregada só quando o modal a exibe)
+function miniaturaAnexo(item) {
+    if (!item.anexo_miniatura) return '';
+    return `
+        <a href="${item.anexo_previa || item.anexo}" target="_blank" class="block mt-2 md:col-span-2">
+            <img src="${item.anexo_miniatura}" alt="Miniatura do anexo" loading="lazy" decoding="async"
+                 class="max-h-40 rounded border border-gray-200">
+        </a>
+    `;
+}
+
 function abrirModalDetalhes(dados) {
     const { ocorrencia, respostas } = dados;
     
@@ -462,6 +627,7 @@ function abrirModalDetalhes(dados) {
                                     <span>📎</span>
                                     <span class="text-sm">Anexo da resposta</span>
                                 </a>
+                                ${miniaturaAnexo(resposta)}
                             </div>
                         ` : ''}
                     </div>
@@ -492,6 +658,7 @@ function abrirModalDetalhes(dados) {
                     <p><strong>Categoria:</strong> <span class="${badgeClass} px-2 py-1 rounded text-sm">${ocorrencia.categoria}</span></p>
                     <p><strong>Data:</strong> ${ocorrencia.data_formatada}</p>
                     ${ocorrencia.anexo ? `<p><strong>Anexo:</strong> <a href="${ocorrencia.anexo}" target="_blank" class="text-blue-600 hover:underline">Ver arquivo</a></p>` : ''}
+                    ${miniaturaAnexo(ocorrencia)}
                 </div>
             </div>
             
@@ -522,6 +689,7 @@ function mostrarErroCarregamento(erro) {
     const lista = document.getElementById('listaOcorrencias');
     const semOcorrencias = document.getElementById('semOcorrencias');
     
+    listaVirtual.limpar();
     lista.innerHTML = `
         <div class="text-center p-8 bg-red-50 border border-red-200 rounded-xl">
             <div class="text-red-600 text-4xl mb-3">⚠️</div>
@@ -556,11 +724,78 @@ function mostrarToast(mensagem, tipo = 'success') {
     }, 5000);
 }
 
-// ========== ATUALIZAÇÃO AUTOMÁTICA ==========
+// ========== ATUALIZAÇÃO AO VIVO ==========
+// Eventos SSE mantêm a lista atualizada sem recarregar tudo; o EventSource
+// reconecta sozinho e envia Last-Event-ID para receber o que perdeu.
+let fonteEventos = null;
+
+function iniciarEventos() {
+    if (!window.EventSource) return;
+
+    fonteEventos = new EventSource('/api/eventos');
+
+    fonteEventos.addEventListener('ocorrencia_criada', e => {
+        const ocorrencia = JSON.parse(e.data);
+        // Resultados de busca são ordenados por relevância: não recebem itens ao vivo
+        if (estado.busca) return;
+        if (!atendeFiltros(ocorrencia) || !listaVirtual.inserir(ocorrencia)) return;
+
+        document.getElementById('semOcorrencias')?.classList.add('hidden');
+        document.getElementById('estatisticas')?.classList.remove('hidden');
+        carregarEstatisticas();
+    });
+
+    fonteEventos.addEventListener('status_alterado', e => {
+        const { id, status } = JSON.parse(e.data);
+        atualizarOcorrenciaLocal(id, { status });
+    });
+
+    fonteEventos.addEventListener('resposta_criada', e => {
+        const { ocorrencia_id, status } = JSON.parse(e.data);
+        if (status) atualizarOcorrenciaLocal(ocorrencia_id, { status });
+    });
+
+    // O servidor não tem mais o histórico desde a última conexão
+    fonteEventos.addEventListener('recarregar', () => carregarOcorrencias());
+
+    // Conexão recusada (503: servidor no limite de fluxos) não é refeita pelo
+    // EventSource; o poll cobre enquanto isso e uma nova tentativa sai em 1 minuto
+    fonteEventos.addEventListener('error', () => {
+        if (fonteEventos.readyState === EventSource.CLOSED) setTimeout(iniciarEventos, 60000);
+    });
+}
+
+function atendeFiltros(ocorrencia) {
+    const categoria = document.getElementById('filtroCategoria')?.value;
+    const status = document.getElementById('filtroStatus')?.value;
+    const dataFim = document.getElementById('filtroDataFim')?.value;
+    if (categoria && ocorrencia.categoria !== categoria) return false;
+    if (status && ocorrencia.status !== status) return false;
+    // Uma ocorrência nova nunca cai num período que já terminou
+    if (dataFim && dataFim < new Date().toISOString().slice(0, 10)) return false;
+    return true;
+}
+
+function atualizarOcorrenciaLocal(id, alteracoes) {
+    const ocorrencia = listaVirtual.obter(id);
+    if (!ocorrencia) return;
+
+    Object.assign(ocorrencia, alteracoes);
+    if (!atendeFiltros(ocorrencia)) {
+        listaVirtual.remover(id);
+    } else {
+        listaVirtual.redesenhar(id);
+    }
+    carregarEstatisticas();
+}
+
 if (document.getElementById('listaOcorrencias')) {
-    // Atualiza a cada 30 segundos
+    iniciarEventos();
+
+    // Sem conexão ao vivo, volta ao poll de 30 segundos (barato graças ao ETag)
     setInterval(() => {
-        if (!estado.carregando) {
+        const aoVivo = fonteEventos && fonteEventos.readyState === EventSource.OPEN;
+        if (!aoVivo && !estado.carregando && !estado.busca) {
             console.log('🔄 Atualização automática...');
             carregarOcorrencias();
         }
@@ -588,6 +823,7 @@ function formatarData(data) {
 // Exportar funções para uso global
 window.recarregarOcorrencias = recarregarOcorrencias;
 window.aplicarFiltros = aplicarFiltros;
+window.carregarMaisOcorrencias = carregarMaisOcorrencias;
 window.limparFiltros = limparFiltros;
 window.copiarOcorrencia = copiarOcorrencia;
 window.mostrarToast = mostrarToast;
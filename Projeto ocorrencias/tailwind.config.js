@@ -0,0 +1,9 @@
+// Classes usadas nos templates e nas strings de HTML do script.js
+// (compilado por `python estaticos.py`)
+module.exports = {
+  content: ['./templates/**/*.html', './static/script.js'],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+};
@@ -0,0 +1,94 @@
+import os
+import sys
+import shutil
+import sqlite3
+
+import pytest
+
+# Testes automatizados (pytest), rodados da pasta do projeto:
+#
+#   python -m pytest tests
+#
+# Cada teste trabalha numa cópia do banco distribuído em database/, já
+# migrada: o esquema antigo (com as FOREIGN KEY originais) é o mesmo que
+# os bancos em produção têm antes das migrações.
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+from migracoes import aplicar_migracoes  # noqa: E402
+
+BANCO_DISTRIBUIDO = os.path.join(RAIZ, 'database', 'ocorrencias.db')
+
+
+def copiar_banco(origem, destino):
+    shutil.copy(origem, destino)
+    return str(destino)
+
+
+@pytest.fixture
+def banco_legado(tmp_path):
+    """Cópia migrada do banco distribuído"""
+    caminho = copiar_banco(BANCO_DISTRIBUIDO, tmp_path / 'ocorrencias.db')
+    conn = sqlite3.connect(caminho)
+    aplicar_migracoes(conn)
+    conn.close()
+    return caminho
+
+
+@pytest.fixture
+def conn(banco_legado):
+    conexao = sqlite3.connect(banco_legado)
+    conexao.row_factory = sqlite3.Row
+    yield conexao
+    conexao.close()
+
+
+@pytest.fixture
+def configuracao():
+    """Chaves extras para criar_app (sobrescreva no módulo de teste)"""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, banco_legado, configuracao):
+    import app as modulo
+
+    aplicacao = modulo.criar_app({
+        'TESTING': True,
+        'SECRET_KEY': 'teste',
+        'DB_PATH': banco_legado,
+        'ARQUIVO_DB': str(tmp_path / 'arquivo.db'),
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'INGESTAO_PASTA': str(tmp_path / 'ingestao'),
+        'CACHE_ARQUIVO': str(tmp_path / 'cache.db'),
+        # Hash barato: os testes não medem o custo da senha
+        'SENHA_METODO': 'pbkdf2:sha256:1000',
+        **configuracao,
+    })
+    with aplicacao.app_context():
+        modulo.init_db()
+    yield aplicacao
+    modulo.pool.fechar_todas()
+
+
+@pytest.fixture
+def cliente(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin(app):
+    cliente = app.test_client()
+    resposta = cliente.post('/admin/login', json={'usuario': 'admin', 'senha': 'admin123'})
+    assert resposta.status_code == 200
+    return cliente
+
+
+def inserir_ocorrencia(conn, titulo='Teste', categoria='Infraestrutura', status='Pendente',
+                       data='2024-01-10 08:00:00', descricao='Descrição de teste'):
+    return conn.execute(
+        'INSERT INTO ocorrencias (titulo, descricao, categoria, status, data) VALUES (?, ?, ?, ?, ?)',
+        (titulo, descricao, categoria, status, data)
+    ).lastrowid
@@ -0,0 +1,60 @@
+from agregados import consultar, verificar_agregados
+
+from tests.conftest import inserir_ocorrencia
+
+
+def test_carga_inicial_da_migracao(conn):
+    assert verificar_agregados(conn, corrigir=False) == []
+
+
+def test_triggers_acompanham_abertura_resolucao_e_resposta(conn):
+    ocorrencia = inserir_ocorrencia(conn, categoria='Limpeza', data='2024-03-01 08:00:00')
+    conn.execute("INSERT INTO respostas (ocorrencia_id, administrador_id, mensagem, data_resposta)"
+                 " VALUES (?, 1, 'Vamos ver', '2024-03-01 10:00:00')", (ocorrencia,))
+    conn.execute("INSERT INTO respostas (ocorrencia_id, administrador_id, mensagem, data_resposta)"
+                 " VALUES (?, 1, 'Feito', '2024-03-02 08:00:00')", (ocorrencia,))
+    conn.execute("INSERT INTO historico_status (ocorrencia_id, status_anterior, status_novo, administrador_id, data_mudanca)"
+                 " VALUES (?, 'Pendente', 'Resolvido', 1, '2024-03-02 08:00:00')", (ocorrencia,))
+    conn.commit()
+    assert verificar_agregados(conn, corrigir=False) == []
+
+    linha = conn.execute(
+        "SELECT abertas, resolvidas, primeiras_respostas, soma_resolucao, soma_primeira_resposta"
+        " FROM rollup_diario WHERE categoria = 'Limpeza' AND dia = '2024-03-01'").fetchone()
+    assert tuple(linha[:3]) == (1, 0, 1)
+    assert round(linha[4]) == 2 * 3600
+    linha = conn.execute(
+        "SELECT resolvidas, soma_resolucao FROM rollup_diario WHERE categoria = 'Limpeza' AND dia = '2024-03-02'"
+    ).fetchone()
+    assert linha[0] == 1 and round(linha[1]) == 24 * 3600
+
+
+def test_migracao_inclui_o_banco_de_arquivo(banco_legado, tmp_path):
+    from arquivamento import APELIDO, Arquivador
+    from conexao import PoolConexoes
+    from migracoes import _m013_rollup_diario
+
+    pool = PoolConexoes(banco_legado, tamanho=1, bancos_anexados={APELIDO: str(tmp_path / 'arquivo.db')})
+    assert Arquivador(pool, dias=30, pausa=0).executar() == 4
+    with pool.conexao() as conn:
+        antes = conn.execute('SELECT * FROM rollup_diario ORDER BY 1, 2').fetchall()
+        assert conn.execute('SELECT COUNT(*) FROM main.ocorrencias').fetchone()[0] == 0
+        # Refaz a carga inicial com tudo no arquivo: os números não mudam
+        conn.execute('BEGIN')
+        _m013_rollup_diario(conn)
+        conn.commit()
+        depois = conn.execute('SELECT * FROM rollup_diario ORDER BY 1, 2').fetchall()
+    pool.fechar_todas()
+    assert [tuple(l[:5]) for l in depois] == [tuple(l[:5]) for l in antes]
+
+
+def test_consulta_por_intervalo(conn):
+    from datetime import date
+
+    inserir_ocorrencia(conn, categoria='Limpeza', data='2024-03-01 08:00:00')
+    inserir_ocorrencia(conn, categoria='Limpeza', data='2024-03-04 08:00:00')
+    conn.commit()
+    resultado = consultar(conn, date(2024, 3, 1), date(2024, 3, 7), granularidade='semana', categoria='Limpeza')
+    assert [ponto['periodo'] for ponto in resultado['series']] == ['2024-02-26', '2024-03-04']
+    assert [ponto['abertas'] for ponto in resultado['series']] == [1, 1]
+    assert resultado['totais']['abertas'] == 2
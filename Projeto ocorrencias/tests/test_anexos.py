@@ -0,0 +1,86 @@
+import hashlib
+import io
+import os
+
+import app as modulo
+
+
+def registrar(cliente, conteudo, nome='foto.pdf'):
+    return cliente.post('/api/registrar', data={
+        'titulo': 'Com anexo', 'descricao': 'Ver arquivo', 'categoria': 'Outros',
+        'anexo': (io.BytesIO(conteudo), nome),
+    }, content_type='multipart/form-data')
+
+
+def anexo_da_ocorrencia(ocorrencia_id):
+    with modulo.pool.conexao() as conn:
+        return conn.execute('SELECT anexo FROM ocorrencias WHERE id = ?', (ocorrencia_id,)).fetchone()[0]
+
+
+def test_conteudo_igual_grava_um_arquivo(app, cliente):
+    conteudo = os.urandom(200 * 1024)   # mais de um bloco de leitura
+    sha256 = hashlib.sha256(conteudo).hexdigest()
+
+    primeiro = registrar(cliente, conteudo, 'a.pdf').get_json()['id']
+    segundo = registrar(cliente, conteudo, 'outro-nome.pdf').get_json()['id']
+
+    caminho = anexo_da_ocorrencia(primeiro)
+    assert caminho == anexo_da_ocorrencia(segundo) == f'{sha256[:2]}/{sha256[2:4]}/{sha256}.pdf'
+    with open(modulo.armazenamento.caminho_absoluto(caminho), 'rb') as arquivo:
+        assert arquivo.read() == conteudo
+    with modulo.pool.conexao() as conn:
+        linha = conn.execute('SELECT tamanho, nome_original FROM anexos WHERE sha256 = ?', (sha256,)).fetchone()
+        assert tuple(linha) == (len(conteudo), 'a.pdf')
+    # Nenhum temporário sobrando
+    assert os.listdir(modulo.armazenamento.pasta_temporaria) == []
+
+
+def test_anexo_acima_do_limite(app, cliente):
+    modulo.armazenamento.tamanho_maximo = 100 * 1024
+    resposta = registrar(cliente, b'x' * (150 * 1024))
+    assert resposta.status_code == 413
+    assert os.listdir(modulo.armazenamento.pasta_temporaria) == []
+
+
+def test_anexo_servido_com_cache_imutavel(app, cliente):
+    conteudo = b'conteudo do anexo' * 100
+    caminho = anexo_da_ocorrencia(registrar(cliente, conteudo).get_json()['id'])
+
+    resposta = cliente.get(f'/uploads/{caminho}')
+    assert resposta.status_code == 200
+    assert 'immutable' in resposta.headers['Cache-Control']
+    assert resposta.headers['ETag'].strip('"') == hashlib.sha256(conteudo).hexdigest()
+
+    parcial = cliente.get(f'/uploads/{caminho}', headers={'Range': 'bytes=0-9'})
+    assert parcial.status_code == 206
+    assert parcial.get_data() == conteudo[:10]
+
+
+def test_upload_vai_direto_para_o_temporario_com_hash(app, cliente, monkeypatch):
+    import werkzeug.wrappers.request as requisicao_werkzeug
+
+    def sem_copia_intermediaria(*args, **kwargs):
+        raise AssertionError('o Werkzeug não deve bufferizar o upload por conta própria')
+    monkeypatch.setattr(requisicao_werkzeug, 'default_stream_factory', sem_copia_intermediaria)
+
+    conteudo = os.urandom(700 * 1024)   # acima do limite em que o Werkzeug usaria um temporário
+    copias = []
+    original = modulo.armazenamento._copiar_com_hash
+    monkeypatch.setattr(modulo.armazenamento, '_copiar_com_hash',
+                        lambda origem: copias.append(origem) or original(origem))
+
+    resposta = registrar(cliente, conteudo)
+    assert resposta.status_code == 201
+    assert copias == []   # o hash saiu da leitura do corpo, sem segunda cópia
+    sha256 = hashlib.sha256(conteudo).hexdigest()
+    assert anexo_da_ocorrencia(resposta.get_json()['id']) == f'{sha256[:2]}/{sha256[2:4]}/{sha256}.pdf'
+    assert os.listdir(modulo.armazenamento.pasta_temporaria) == []
+
+
+def test_upload_recusado_nao_deixa_temporario(app, cliente):
+    # Falta o título: o arquivo recebido é apagado quando a requisição fecha
+    resposta = cliente.post('/api/registrar', data={
+        'descricao': 'Sem título', 'categoria': 'Outros', 'anexo': (io.BytesIO(b'x' * 1000), 'a.pdf'),
+    }, content_type='multipart/form-data')
+    assert resposta.status_code == 400
+    assert os.listdir(modulo.armazenamento.pasta_temporaria) == []
@@ -0,0 +1,144 @@
+import os
+import sqlite3
+
+from arquivamento import APELIDO, Arquivador, anexar_arquivo, arquivo_anexado, garantir_esquema
+from conexao import PoolConexoes
+from estatisticas import verificar_contadores
+
+from tests.conftest import inserir_ocorrencia
+
+
+class PoolComChaves(PoolConexoes):
+    """Pool com as FOREIGN KEY aplicadas, como num banco aberto com foreign_keys = ON"""
+
+    def _abrir(self):
+        conn = super()._abrir()
+        conn.execute('PRAGMA foreign_keys = ON')
+        return conn
+
+
+def resolver(conn, ocorrencia_id, quando, respostas=1):
+    for i in range(respostas):
+        conn.execute(
+            'INSERT INTO respostas (ocorrencia_id, administrador_id, mensagem, data_resposta) VALUES (?, 1, ?, ?)',
+            (ocorrencia_id, f'Resposta {i} sobre vazamento', quando)
+        )
+    conn.execute(
+        "INSERT INTO historico_status (ocorrencia_id, status_anterior, status_novo, administrador_id, data_mudanca)"
+        " VALUES (?, 'Pendente', 'Resolvido', 1, ?)", (ocorrencia_id, quando)
+    )
+    conn.execute("UPDATE ocorrencias SET status = 'Resolvido' WHERE id = ?", (ocorrencia_id,))
+
+
+def test_banco_distribuido_declara_chaves_estrangeiras(banco_legado):
+    conn = sqlite3.connect(banco_legado)
+    assert conn.execute('PRAGMA foreign_key_list(respostas)').fetchall()
+    assert conn.execute('PRAGMA foreign_key_list(historico_status)').fetchall()
+
+
+def test_arquiva_ocorrencia_com_respostas_e_historico(banco_legado, tmp_path):
+    conn = sqlite3.connect(banco_legado)
+    antiga = inserir_ocorrencia(conn, titulo='Vazamento antigo', data='2023-01-01 10:00:00')
+    resolver(conn, antiga, '2023-01-05 10:00:00', respostas=2)
+    conn.commit()
+    conn.close()
+
+    pool = PoolComChaves(banco_legado, tamanho=1, bancos_anexados={APELIDO: str(tmp_path / 'arquivo.db')})
+    arquivador = Arquivador(pool, dias=30, pausa=0)
+    # As quatro do banco distribuído também já estão resolvidas há tempo
+    assert arquivador.executar() == 5
+    assert arquivador.progresso()['erro'] is None
+
+    with pool.conexao() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM main.ocorrencias WHERE id = ?', (antiga,)).fetchone()[0] == 0
+        for tabela in ('respostas', 'historico_status'):
+            assert conn.execute(f'SELECT COUNT(*) FROM main.{tabela} WHERE ocorrencia_id = ?',
+                                (antiga,)).fetchone()[0] == 0
+        assert conn.execute(f'SELECT COUNT(*) FROM {APELIDO}.respostas WHERE ocorrencia_id = ?',
+                            (antiga,)).fetchone()[0] == 2
+        assert conn.execute(f'SELECT COUNT(*) FROM {APELIDO}.historico_status WHERE ocorrencia_id = ?',
+                            (antiga,)).fetchone()[0] == 1
+        assert conn.execute('SELECT COUNT(*) FROM arquivando').fetchone()[0] == 0
+        # Índice de busca e fila do painel só com as ocorrências do principal
+        assert conn.execute('SELECT COUNT(*) FROM busca_fts WHERE rowid = ?', (antiga,)).fetchone()[0] == 0
+        assert conn.execute('SELECT COUNT(*) FROM fila_admin WHERE ocorrencia_id = ?', (antiga,)).fetchone()[0] == 0
+        assert conn.execute('PRAGMA foreign_key_check').fetchall() == []
+        # Os contadores continuam contando a arquivada
+        assert verificar_contadores(conn, corrigir=False) == []
+    pool.fechar_todas()
+
+
+def test_idade_conta_da_resolucao(banco_legado, tmp_path):
+    conn = sqlite3.connect(banco_legado)
+    aberta_ha_muito = inserir_ocorrencia(conn, titulo='Aberta há muito', data='2023-01-01 10:00:00')
+    resolver(conn, aberta_ha_muito, conn.execute("SELECT datetime('now', '-2 days')").fetchone()[0])
+    conn.commit()
+    conn.close()
+
+    pool = PoolComChaves(banco_legado, tamanho=1, bancos_anexados={APELIDO: str(tmp_path / 'arquivo.db')})
+
+    def no_principal():
+        with pool.conexao() as conn:
+            return conn.execute('SELECT COUNT(*) FROM main.ocorrencias WHERE id = ?',
+                                (aberta_ha_muito,)).fetchone()[0] == 1
+
+    Arquivador(pool, dias=30, pausa=0).executar()
+    assert no_principal()
+    Arquivador(pool, dias=1, pausa=0).executar()
+    assert not no_principal()
+    pool.fechar_todas()
+
+
+def test_reaberta_durante_o_arquivamento_fica_no_principal(banco_legado, tmp_path):
+    from arquivamento import copiar_lote, remover_lote
+
+    conn = sqlite3.connect(banco_legado, isolation_level=None)
+    conn.execute('PRAGMA foreign_keys = ON')
+    anexar_arquivo(conn, str(tmp_path / 'arquivo.db'))
+    garantir_esquema(conn)
+    ocorrencia = inserir_ocorrencia(conn, data='2023-01-01 10:00:00')
+    resolver(conn, ocorrencia, '2023-01-02 10:00:00')
+
+    copiar_lote(conn, [ocorrencia])
+    conn.execute("UPDATE ocorrencias SET status = 'Em Andamento' WHERE id = ?", (ocorrencia,))
+    assert remover_lote(conn, [ocorrencia]) == 0
+    assert conn.execute('SELECT COUNT(*) FROM main.respostas WHERE ocorrencia_id = ?', (ocorrencia,)).fetchone()[0] == 1
+    assert conn.execute(f'SELECT COUNT(*) FROM {APELIDO}.ocorrencias').fetchone()[0] == 0
+
+
+def test_arquivamento_desligado_nao_anexa_nem_cria_o_arquivo(app, admin, tmp_path):
+    import app as modulo
+
+    with modulo.pool.conexao() as conn:
+        assert not arquivo_anexado(conn)
+    assert not os.path.exists(app.config['ARQUIVO_DB'])
+    assert admin.get('/api/ocorrencia/999999').status_code == 404
+    assert admin.get('/admin/api/arquivamento').get_json()['arquivadas'] == 0
+    assert admin.post('/admin/api/arquivamento', json={'dias': 30}).status_code == 400
+
+
+def test_pasta_do_arquivo_inexistente_nao_derruba_as_conexoes(tmp_path, banco_legado):
+    import app as modulo
+
+    modulo.criar_app({
+        'TESTING': True, 'DB_PATH': banco_legado, 'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'CACHE': '', 'ARQUIVAMENTO_DIAS': 0,
+        'ARQUIVO_DB': str(tmp_path / 'nao' / 'existe' / 'arquivo.db'),
+    })
+    try:
+        with modulo.pool.conexao() as conn:
+            assert conn.execute('SELECT COUNT(*) FROM ocorrencias').fetchone()[0] > 0
+    finally:
+        modulo.pool.fechar_todas()
+
+    # Ligado, a pasta é criada e o arquivo anexado
+    modulo.criar_app({
+        'TESTING': True, 'DB_PATH': banco_legado, 'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'CACHE': '', 'ARQUIVAMENTO_DIAS': 30,
+        'ARQUIVO_DB': str(tmp_path / 'nao' / 'existe' / 'arquivo.db'),
+    })
+    try:
+        with modulo.pool.conexao() as conn:
+            assert arquivo_anexado(conn)
+    finally:
+        modulo.pool.fechar_todas()
@@ -0,0 +1,80 @@
+from busca import buscar, montar_consulta_fts
+
+
+def indexadas(conn):
+    return conn.execute('SELECT COUNT(*) FROM busca_fts').fetchone()[0]
+
+
+def test_carga_inicial_indexa_todas(conn):
+    assert indexadas(conn) == conn.execute('SELECT COUNT(*) FROM ocorrencias').fetchone()[0]
+
+
+def test_triggers_mantem_o_indice(conn):
+    from tests.conftest import inserir_ocorrencia
+
+    ocorrencia = inserir_ocorrencia(conn, titulo='Goteira no auditório', descricao='Pinga sobre o palco')
+    conn.commit()
+    assert [r['id'] for r in buscar(conn, 'goteira')] == [ocorrencia]
+
+    conn.execute("INSERT INTO respostas (ocorrencia_id, administrador_id, mensagem) VALUES (?, 1, 'Calha trocada')",
+                 (ocorrencia,))
+    conn.commit()
+    assert [r['id'] for r in buscar(conn, 'calha')] == [ocorrencia]
+
+    conn.execute("UPDATE ocorrencias SET titulo = 'Infiltração no auditório' WHERE id = ?", (ocorrencia,))
+    conn.commit()
+    assert buscar(conn, 'goteira') == []
+    assert [r['id'] for r in buscar(conn, 'infiltração')] == [ocorrencia]
+
+    conn.execute('DELETE FROM respostas WHERE ocorrencia_id = ?', (ocorrencia,))
+    conn.execute('DELETE FROM ocorrencias WHERE id = ?', (ocorrencia,))
+    conn.commit()
+    assert buscar(conn, 'auditório') == []
+
+
+def test_consulta_sem_termos_nao_busca(conn):
+    assert montar_consulta_fts('  "*()  ') in ('', None)
+    assert buscar(conn, '   ') == []
+
+
+class ConexaoInterrompida:
+    """Repassa tudo para `conn` e roda `ao_confirmar` depois de cada commit"""
+
+    def __init__(self, conn, ao_confirmar):
+        self._conn = conn
+        self._ao_confirmar = ao_confirmar
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def commit(self):
+        self._conn.commit()
+        self._ao_confirmar()
+
+
+def test_reconstrucao_convive_com_escritas(banco_legado):
+    import sqlite3
+    from busca import reconstruir_indice
+    from tests.conftest import inserir_ocorrencia
+
+    app_conn = sqlite3.connect(banco_legado)
+    app_conn.row_factory = sqlite3.Row
+    total = app_conn.execute('SELECT COUNT(*) FROM ocorrencias').fetchone()[0]
+    novas = []
+
+    def escrita_do_app():
+        # O índice antigo continua inteiro enquanto os lotes avançam
+        assert indexadas(app_conn) >= total
+        ocorrencia = inserir_ocorrencia(app_conn, titulo=f'Lâmpada queimada {len(novas)}')
+        app_conn.execute("INSERT INTO respostas (ocorrencia_id, administrador_id, mensagem) "
+                         "VALUES (?, 1, 'Reator trocado')", (ocorrencia,))
+        app_conn.commit()
+        novas.append(ocorrencia)
+
+    rebuild_conn = sqlite3.connect(banco_legado)
+    reconstruir_indice(ConexaoInterrompida(rebuild_conn, escrita_do_app), tamanho_lote=3)
+    rebuild_conn.close()
+
+    assert indexadas(app_conn) == total + len(novas)
+    assert sorted(r['id'] for r in buscar(app_conn, 'reator', limite=100)) == novas
+    app_conn.close()
@@ -0,0 +1,99 @@
+import pytest
+from werkzeug.datastructures import MultiDict
+
+import app as modulo
+from cache import BackendArquivo, BackendMemoria, CacheRespostas
+
+from tests.conftest import inserir_ocorrencia
+
+
+@pytest.fixture
+def consultas(app, monkeypatch):
+    """Conta as vezes que o detalhe foi montado a partir do banco (faltas no cache)"""
+    chamadas = []
+    original = modulo.carregar_detalhes
+
+    def contar(conn, ids, admin=False):
+        chamadas.append(tuple(ids))
+        return original(conn, ids, admin)
+    monkeypatch.setattr(modulo, 'carregar_detalhes', contar)
+    return chamadas
+
+
+def detalhe(cliente, ocorrencia_id):
+    return cliente.get(f'/api/ocorrencia/{ocorrencia_id}').get_json()['ocorrencia']
+
+
+def test_leitura_repetida_vem_do_cache(cliente, consultas):
+    assert detalhe(cliente, 1) == detalhe(cliente, 1)
+    assert consultas == [(1,)]
+
+
+def test_cada_ocorrencia_tem_sua_entrada(cliente, consultas):
+    assert [detalhe(cliente, i)['id'] for i in (1, 2, 1, 2)] == [1, 2, 1, 2]
+    assert consultas == [(1,), (2,)]
+
+
+def test_escrita_do_painel_invalida_so_o_que_mudou(admin, cliente, consultas):
+    detalhe(cliente, 1)
+    detalhe(cliente, 2)
+    resposta = admin.put('/admin/api/ocorrencias/1/status', json={'status': 'Em Andamento'})
+    assert resposta.status_code == 200
+
+    assert detalhe(cliente, 1)['status'] == 'Em Andamento'
+    detalhe(cliente, 2)
+    assert consultas == [(1,), (2,), (1,)]
+
+
+def test_escrita_de_outro_processo_chega_pelos_eventos(cliente, consultas):
+    detalhe(cliente, 1)
+    detalhe(cliente, 2)
+    # Outro worker: grava e publica o evento, mas não invalida o cache deste processo
+    with modulo.pool.conexao() as conn:
+        conn.execute("UPDATE ocorrencias SET status = 'Pendente' WHERE id = 2")
+        modulo.canal_eventos.publicar(conn, 'status_alterado', 2, {'id': 2, 'status': 'Pendente'})
+        conn.commit()
+
+    assert detalhe(cliente, 2)['status'] == 'Pendente'
+    detalhe(cliente, 1)
+    assert consultas == [(1,), (2,), (2,)]
+
+
+def test_escrita_fora_da_aplicacao_invalida_tudo(cliente, consultas):
+    detalhe(cliente, 1)
+    with modulo.pool.conexao() as conn:
+        conn.execute("UPDATE ocorrencias SET titulo = 'Editado à mão' WHERE id = 1")
+        conn.commit()
+    assert detalhe(cliente, 1)['titulo'] == 'Editado à mão'
+    assert consultas == [(1,), (1,)]
+
+
+def test_lista_invalidada_por_ocorrencia_nova(cliente):
+    antes = cliente.get('/api/ocorrencias').get_json()['ocorrencias']
+    resposta = cliente.post('/api/registrar', data={'titulo': 'Nova', 'descricao': 'x', 'categoria': 'Outros'})
+    assert resposta.status_code == 201
+    depois = cliente.get('/api/ocorrencias').get_json()['ocorrencias']
+    assert len(depois) == len(antes) + 1
+    assert depois[0]['id'] == resposta.get_json()['id']
+
+
+@pytest.mark.parametrize('backend', ['memoria', 'arquivo'])
+def test_invalidar_muda_a_chave(backend, tmp_path):
+    def novo():
+        if backend == 'memoria':
+            return CacheRespostas(BackendMemoria())
+        return CacheRespostas(BackendArquivo(str(tmp_path / 'cache.db')))
+
+    cache = novo()
+    chave = cache.chave('/api/ocorrencias', MultiDict(), ['lista'])
+    cache.guardar(chave, b'{"a": 1}', 'application/json')
+    assert cache.obter(chave) == (b'{"a": 1}', 'application/json')
+    # Etiqueta não relacionada não muda a chave
+    cache.invalidar(['ocorrencia:9'])
+    assert cache.chave('/api/ocorrencias', MultiDict(), ['lista']) == chave
+
+    cache.invalidar(['lista'])
+    assert cache.chave('/api/ocorrencias', MultiDict(), ['lista']) != chave
+    if backend == 'arquivo':
+        # Os workers compartilham as gerações pelo arquivo
+        assert novo().chave('/api/ocorrencias', MultiDict(), ['lista']) == cache.chave('/api/ocorrencias', MultiDict(), ['lista'])
@@ -0,0 +1,119 @@
+import gzip
+import zlib
+
+import pytest
+
+import app as modulo
+import compressao
+
+from tests.conftest import inserir_ocorrencia
+
+
+def popular(quantidade=20):
+    with modulo.pool.conexao() as conn:
+        for i in range(quantidade):
+            inserir_ocorrencia(conn, titulo=f'Lâmpada queimada no corredor {i}',
+                               descricao='Corredor escuro desde segunda-feira ' * 3)
+        conn.commit()
+
+
+def test_gzip_quando_o_cliente_aceita(app, cliente):
+    popular()
+    comprimida = cliente.get('/api/ocorrencias', headers={'Accept-Encoding': 'gzip'})
+    assert comprimida.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in comprimida.headers['Vary']
+
+    pura = cliente.get('/api/ocorrencias')
+    assert 'Content-Encoding' not in pura.headers
+    assert gzip.decompress(comprimida.get_data()) == pura.get_data()
+    assert len(comprimida.get_data()) < len(pura.get_data())
+
+
+def test_identity_e_codificacao_sem_suporte(app, cliente, monkeypatch):
+    popular()
+    monkeypatch.setattr(compressao, 'brotli', None)   # como numa instalação sem o brotli
+    for aceita in ('identity', 'br', 'gzip;q=0, identity'):
+        resposta = cliente.get('/api/ocorrencias', headers={'Accept-Encoding': aceita})
+        assert 'Content-Encoding' not in resposta.headers, aceita
+    assert cliente.get('/api/ocorrencias', headers={'Accept-Encoding': 'br, gzip'}).headers['Content-Encoding'] == 'gzip'
+
+
+def test_brotli_preferido_quando_instalado(app, cliente):
+    brotli = pytest.importorskip('brotli')
+    popular()
+    resposta = cliente.get('/api/ocorrencias', headers={'Accept-Encoding': 'gzip, br'})
+    assert resposta.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(resposta.get_data()) == cliente.get('/api/ocorrencias').get_data()
+    # q-values do cliente mandam
+    assert cliente.get('/api/ocorrencias', headers={
+        'Accept-Encoding': 'br;q=0.5, gzip'}).headers['Content-Encoding'] == 'gzip'
+
+
+def test_respostas_pequenas_nao_sao_comprimidas(app, cliente):
+    popular()
+    app.config['COMPRESSAO_MINIMO'] = 10 ** 9
+    resposta = cliente.get('/api/ocorrencias', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in resposta.headers
+    assert 'Accept-Encoding' in resposta.headers['Vary']   # outra resposta da mesma URL pode vir comprimida
+
+
+def test_etag_fraco_e_304_na_resposta_comprimida(app, cliente):
+    popular()
+    pura = cliente.get('/api/ocorrencias').headers['ETag']
+    comprimida = cliente.get('/api/ocorrencias', headers={'Accept-Encoding': 'gzip'})
+    assert comprimida.headers['Content-Encoding'] == 'gzip'
+    assert comprimida.headers['ETag'] == f'W/{pura}'
+
+    for etag in (comprimida.headers['ETag'], pura):
+        repetida = cliente.get('/api/ocorrencias', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        assert repetida.status_code == 304
+        assert 'Content-Encoding' not in repetida.headers
+
+
+def descomprimir_por_pedaco(pedacos):
+    """Cada pedaço comprimido precisa render sozinho o texto que levou"""
+    descompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    return [descompressor.decompress(pedaco) for pedaco in pedacos]
+
+
+def test_fluxo_faz_flush_a_cada_pedaco():
+    pedacos = ['data: um\n\n', b'data: dois\n\n', '', 'data: três\n\n']
+    comprimidos = list(compressao.comprimir_fluxo(iter(pedacos), 'gzip'))
+    lidos = descomprimir_por_pedaco(comprimidos)
+    assert lidos[:3] == [b'data: um\n\n', b'data: dois\n\n', 'data: três\n\n'.encode('utf-8')]
+    assert b''.join(lidos) == 'data: um\n\ndata: dois\n\ndata: três\n\n'.encode('utf-8')
+
+
+def test_sse_comprimido_entrega_cada_evento(app, cliente):
+    fluxo = cliente.get('/api/eventos', headers={'Accept-Encoding': 'gzip'}, buffered=False)
+    try:
+        assert fluxo.headers['Content-Encoding'] == 'gzip'
+        assert 'Content-Length' not in fluxo.headers
+        descompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        assert descompressor.decompress(next(fluxo.response)).startswith(b'retry:')
+
+        with modulo.pool.conexao() as conn:
+            ocorrencia = inserir_ocorrencia(conn, titulo='Ao vivo')
+            modulo.canal_eventos.publicar(conn, 'ocorrencia_criada', ocorrencia, {'id': ocorrencia})
+            conn.commit()
+        modulo.canal_eventos.notificar()
+
+        evento = descompressor.decompress(next(fluxo.response))
+        assert b'event: ocorrencia_criada' in evento
+        assert evento.endswith(b'\n\n')
+    finally:
+        fluxo.close()
+
+
+def test_exportacao_ndjson_comprimida_em_fluxo(app, admin):
+    popular()
+    pura = admin.get('/admin/api/exportar?formato=ndjson').get_data()
+    fluxo = admin.get('/admin/api/exportar?formato=ndjson', headers={'Accept-Encoding': 'gzip'}, buffered=False)
+    assert fluxo.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in fluxo.headers
+
+    lidos = descomprimir_por_pedaco(list(fluxo.response))
+    fluxo.close()
+    assert b''.join(lidos) == pura
+    # Cada pedaço com dados chega em linhas inteiras, sem esperar o fim
+    assert all(pedaco.endswith(b'\n') for pedaco in lidos if pedaco)
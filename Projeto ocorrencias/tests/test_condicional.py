@@ -0,0 +1,42 @@
+import app as modulo
+
+from tests.conftest import inserir_ocorrencia
+
+
+def test_304_enquanto_a_versao_nao_muda(app, cliente):
+    primeira = cliente.get('/api/ocorrencias')
+    assert primeira.status_code == 200
+    etag = primeira.headers['ETag']
+    assert primeira.headers['Cache-Control'] == 'no-cache'
+
+    repetida = cliente.get('/api/ocorrencias', headers={'If-None-Match': etag})
+    assert repetida.status_code == 304
+    assert repetida.get_data() == b''
+    assert repetida.headers['ETag'] == etag
+
+
+def test_escrita_muda_o_etag(app, cliente):
+    etag = cliente.get('/api/estatisticas').headers['ETag']
+    with modulo.pool.conexao() as conn:
+        inserir_ocorrencia(conn)
+        conn.commit()
+    resposta = cliente.get('/api/estatisticas', headers={'If-None-Match': etag})
+    assert resposta.status_code == 200
+    assert resposta.headers['ETag'] != etag
+
+
+def test_etag_depende_dos_filtros(app, cliente):
+    todas = cliente.get('/api/ocorrencias').headers['ETag']
+    filtrada = cliente.get('/api/ocorrencias?status=Pendente', headers={'If-None-Match': todas})
+    assert filtrada.status_code == 200
+    assert filtrada.headers['ETag'] != todas
+
+
+def test_etag_fraco_da_resposta_comprimida(app, cliente):
+    etag = cliente.get('/api/ocorrencias').headers['ETag'].strip('W/')
+    assert cliente.get('/api/ocorrencias', headers={'If-None-Match': f'W/{etag}'}).status_code == 304
+
+
+def test_painel_tambem_responde_304(admin):
+    etag = admin.get('/admin/api/estatisticas').headers['ETag']
+    assert admin.get('/admin/api/estatisticas', headers={'If-None-Match': etag}).status_code == 304
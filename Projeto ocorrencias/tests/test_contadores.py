@@ -0,0 +1,45 @@
+import os
+import sqlite3
+
+from estatisticas import calcular_do_zero, ler_contadores, verificar_contadores
+from migracoes import aplicar_migracoes
+
+from tests.conftest import RAIZ, copiar_banco, inserir_ocorrencia
+
+
+def test_carga_inicial_da_migracao(conn):
+    assert _sem_zeros(ler_contadores(conn)) == _sem_zeros(calcular_do_zero(conn))
+
+
+def test_triggers_acompanham_as_escritas(conn):
+    ocorrencia = inserir_ocorrencia(conn, categoria='Limpeza')
+    conn.execute("INSERT INTO respostas (ocorrencia_id, administrador_id, mensagem) VALUES (?, 1, 'a')", (ocorrencia,))
+    conn.execute("INSERT INTO respostas (ocorrencia_id, administrador_id, mensagem) VALUES (?, 1, 'b')", (ocorrencia,))
+    conn.execute("UPDATE ocorrencias SET status = 'Em Andamento', categoria = 'Outros' WHERE id = ?", (ocorrencia,))
+    conn.commit()
+    assert verificar_contadores(conn, corrigir=False) == []
+
+    conn.execute('DELETE FROM respostas WHERE ocorrencia_id = ?', (ocorrencia,))
+    conn.execute('DELETE FROM ocorrencias WHERE id = ?', (ocorrencia,))
+    conn.commit()
+    assert verificar_contadores(conn, corrigir=False) == []
+
+
+def test_verificar_corrige_divergencia(conn):
+    conn.execute("UPDATE contadores SET total = total + 7 WHERE dimensao = 'total'")
+    conn.commit()
+    assert verificar_contadores(conn) != []
+    assert verificar_contadores(conn, corrigir=False) == []
+
+
+def test_migracao_no_banco_da_raiz(tmp_path):
+    # O banco antigo da raiz: coluna data_registro a mais, sem historico_status
+    caminho = copiar_banco(os.path.join(RAIZ, 'ocorrencias.db'), tmp_path / 'raiz.db')
+    conn = sqlite3.connect(caminho)
+    aplicar_migracoes(conn)
+    assert ler_contadores(conn)[('total', '')] == 9
+    assert verificar_contadores(conn, corrigir=False) == []
+
+
+def _sem_zeros(contadores):
+    return {chave: total for chave, total in contadores.items() if total}
@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from conexao import PoolConexoes
+from eventos import CanalEventos
+
+
+@pytest.fixture
+def configuracao():
+    return {'SSE_MAXIMO_FLUXOS': 1}
+
+
+@pytest.fixture
+def canal(banco_legado):
+    pool = PoolConexoes(banco_legado, tamanho=4)
+    canal = CanalEventos(pool, intervalo=0.05, heartbeat=60, maximo_fluxos=2)
+    yield canal
+    pool.fechar_todas()
+
+
+def esperar(condicao, limite=2.0):
+    fim = time.monotonic() + limite
+    while not condicao():
+        assert time.monotonic() < fim, 'tempo esgotado'
+        time.sleep(0.01)
+
+
+def publicar(canal, tipo, publico=True):
+    with canal.pool.conexao() as conn:
+        evento_id = canal.publicar(conn, tipo, 1, {'id': 1}, publico=publico)
+        conn.commit()
+    canal.notificar()
+    return evento_id
+
+
+def test_limite_de_fluxos_por_processo(cliente):
+    primeiro = cliente.get('/api/eventos', buffered=False)
+    assert primeiro.status_code == 200
+    assert next(primeiro.response).startswith(b'retry:')
+
+    recusado = cliente.get('/api/eventos')
+    assert recusado.status_code == 503
+    assert recusado.headers['Retry-After'] == '60'
+
+    # Fechar a resposta devolve a vaga
+    primeiro.close()
+    segundo = cliente.get('/api/eventos', buffered=False)
+    assert segundo.status_code == 200
+    segundo.close()
+
+
+def test_fluxos_compartilham_o_leitor(canal, monkeypatch):
+    assert canal.reservar() and canal.reservar()
+    assert not canal.reservar()
+    esperar(lambda: canal._ultimo_lido is not None)
+
+    consultas = []
+    original = canal.buscar_desde
+    monkeypatch.setattr(canal, 'buscar_desde', lambda *a, **k: consultas.append(a) or original(*a, **k))
+
+    inicio = canal._ultimo_lido
+    publico, painel = canal.fluxo(inicio), canal.fluxo(inicio, somente_publicos=False)
+    assert next(publico).startswith('retry:') and next(painel).startswith('retry:')
+
+    publicar(canal, 'so_painel', publico=False)
+    evento_id = publicar(canal, 'status_alterado')
+
+    assert next(painel).startswith(f'id: {evento_id - 1}\nevent: so_painel')
+    assert next(painel).startswith(f'id: {evento_id}\nevent: status_alterado')
+    assert next(publico).startswith(f'id: {evento_id}\nevent: status_alterado')
+    # Nenhum fluxo consultou o banco: tudo veio da memória do leitor
+    assert consultas == []
+
+    canal.liberar()
+    canal.liberar()
+    esperar(lambda: canal._leitor is None)
+
+
+def test_reconexao_antiga_le_do_banco(canal):
+    primeiro = publicar(canal, 'ocorrencia_criada')
+    assert canal.reservar()
+    esperar(lambda: canal._ultimo_lido is not None)
+    segundo = publicar(canal, 'ocorrencia_criada')
+
+    fluxo = canal.fluxo(primeiro - 1)
+    next(fluxo)
+    assert next(fluxo).startswith(f'id: {primeiro}\n')
+    assert next(fluxo).startswith(f'id: {segundo}\n')
+    canal.liberar()
@@ -0,0 +1,47 @@
+import csv
+import io
+import json
+
+from tests.conftest import inserir_ocorrencia
+
+
+def ler_csv(resposta):
+    texto = resposta.get_data(as_text=True)
+    assert texto.startswith('\ufeff')
+    return list(csv.DictReader(io.StringIO(texto[1:])))
+
+
+def test_csv_neutraliza_formulas(app, admin):
+    import app as modulo
+
+    with modulo.pool.conexao() as conn:
+        ocorrencia = inserir_ocorrencia(conn, titulo='=HYPERLINK("http://exemplo.invalid","clique")',
+                                        descricao='+cmd|calc')
+        conn.execute("INSERT INTO respostas (ocorrencia_id, administrador_id, mensagem) VALUES (?, 1, '=1+1')",
+                     (ocorrencia,))
+        conn.commit()
+
+    resposta = admin.get('/admin/api/exportar?formato=csv')
+    assert resposta.status_code == 200
+    linha = next(l for l in ler_csv(resposta) if l['id'] == str(ocorrencia))
+    assert linha['titulo'] == '\'=HYPERLINK("http://exemplo.invalid","clique")'
+    assert linha['descricao'] == "'+cmd|calc"
+    assert linha['categoria'] == 'Infraestrutura'
+    # A coluna JSON continua JSON válido (começa com '[')
+    assert json.loads(linha['respostas'])[0]['mensagem'] == '=1+1'
+
+
+def test_ndjson_mantem_o_texto_original(app, admin):
+    import app as modulo
+
+    with modulo.pool.conexao() as conn:
+        ocorrencia = inserir_ocorrencia(conn, titulo='-5 graus na sala')
+        conn.commit()
+
+    linhas = [json.loads(l) for l in admin.get('/admin/api/exportar').get_data(as_text=True).splitlines()]
+    assert next(l for l in linhas if l['id'] == ocorrencia)['titulo'] == '-5 graus na sala'
+    assert len(linhas) == 5
+
+
+def test_exportar_exige_login(cliente):
+    assert cliente.get('/admin/api/exportar').status_code in (302, 401)
@@ -0,0 +1,83 @@
+from tests.conftest import inserir_ocorrencia
+
+# O que a fila deveria conter, recalculado das tabelas de origem
+RECALCULO = '''
+    SELECT o.id, o.status, o.categoria, o.data,
+           (SELECT COUNT(*) FROM respostas r WHERE r.ocorrencia_id = o.id),
+           (SELECT MAX(data_resposta) FROM respostas r WHERE r.ocorrencia_id = o.id),
+           h.data_mudanca, h.administrador_id
+    FROM ocorrencias o
+    LEFT JOIN historico_status h ON h.id = (
+        SELECT id FROM historico_status WHERE ocorrencia_id = o.id
+        ORDER BY data_mudanca DESC, id DESC LIMIT 1
+    )
+    ORDER BY o.id
+'''
+FILA = '''
+    SELECT ocorrencia_id, status, categoria, data, resposta_count,
+           ultima_resposta_em, status_alterado_em, status_alterado_por
+    FROM fila_admin ORDER BY ocorrencia_id
+'''
+
+
+def linhas(conn, consulta):
+    return [tuple(linha) for linha in conn.execute(consulta)]
+
+
+def responder(conn, ocorrencia_id, quando):
+    return conn.execute(
+        "INSERT INTO respostas (ocorrencia_id, administrador_id, mensagem, data_resposta) VALUES (?, 1, 'ok', ?)",
+        (ocorrencia_id, quando)).lastrowid
+
+
+def test_carga_inicial_da_migracao(conn):
+    assert linhas(conn, FILA) == linhas(conn, RECALCULO)
+
+
+def test_triggers_acompanham_as_escritas(conn):
+    ocorrencia = inserir_ocorrencia(conn, data='2024-02-01 09:00:00')
+    responder(conn, ocorrencia, '2024-02-01 10:00:00')
+    ultima = responder(conn, ocorrencia, '2024-02-03 10:00:00')
+    conn.execute("UPDATE ocorrencias SET status = 'Em Andamento', categoria = 'Outros' WHERE id = ?", (ocorrencia,))
+    conn.execute("INSERT INTO historico_status (ocorrencia_id, status_anterior, status_novo, administrador_id, data_mudanca)"
+                 " VALUES (?, 'Pendente', 'Em Andamento', 1, '2024-02-02 08:00:00')", (ocorrencia,))
+    conn.commit()
+    assert linhas(conn, FILA) == linhas(conn, RECALCULO)
+    linha = conn.execute('SELECT resposta_count, ultima_resposta_em FROM fila_admin WHERE ocorrencia_id = ?',
+                         (ocorrencia,)).fetchone()
+    assert tuple(linha) == (2, '2024-02-03 10:00:00')
+
+    conn.execute('DELETE FROM respostas WHERE id = ?', (ultima,))
+    conn.commit()
+    assert linhas(conn, FILA) == linhas(conn, RECALCULO)
+
+    conn.execute('DELETE FROM respostas WHERE ocorrencia_id = ?', (ocorrencia,))
+    conn.execute('DELETE FROM historico_status WHERE ocorrencia_id = ?', (ocorrencia,))
+    conn.execute('DELETE FROM ocorrencias WHERE id = ?', (ocorrencia,))
+    conn.commit()
+    assert conn.execute('SELECT COUNT(*) FROM fila_admin WHERE ocorrencia_id = ?', (ocorrencia,)).fetchone()[0] == 0
+
+
+def test_painel_lista_pela_fila(admin):
+    import app as modulo
+
+    with modulo.pool.conexao() as conn:
+        pendentes = [inserir_ocorrencia(conn, data=f'2024-01-{dia:02d} 08:00:00') for dia in (3, 1, 2)]
+        responder(conn, pendentes[0], '2024-01-05 08:00:00')
+        conn.commit()
+
+    ids, cursor = [], ''
+    while True:
+        pagina = admin.get(f'/admin/api/ocorrencias?status=Pendente&ordem=antigas&limite=2&cursor={cursor}').get_json()
+        ids += [item['id'] for item in pagina['ocorrencias']]
+        cursor = pagina['proximo_cursor']
+        if not cursor:
+            break
+    # Fila de atendimento: as pendentes da mais antiga para a mais nova
+    assert ids == [pendentes[1], pendentes[2], pendentes[0]]
+
+    contagens = {item['id']: item['resposta_count']
+                 for item in admin.get('/admin/api/ocorrencias?limite=100').get_json()['ocorrencias']}
+    assert contagens[pendentes[0]] == 1 and contagens[pendentes[1]] == 0
+
+    assert admin.get('/admin/api/ocorrencias?ordem=aleatoria').status_code == 400
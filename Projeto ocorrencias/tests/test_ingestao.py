@@ -0,0 +1,170 @@
+import glob
+import json
+import os
+import time
+
+import pytest
+
+import app as modulo
+from ingestao import (ARQUIVO_DESCARTADOS, Diario, FilaCheia, FilaIngestao, gravar_lote,
+                      ler_diario, novo_ticket, recuperar_diarios)
+
+
+def registro(titulo):
+    return {'ticket': novo_ticket(), 'titulo': titulo, 'descricao': 'Do diário',
+            'categoria': 'Outros', 'recebido_em': '2024-06-01 12:00:00'}
+
+
+def escrever_diario(pasta, pid, registros, sobra=''):
+    os.makedirs(pasta, exist_ok=True)
+    caminho = os.path.join(pasta, f'ingestao-{pid}.diario')
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        for item in registros:
+            arquivo.write(json.dumps(item, ensure_ascii=False) + '\n')
+        arquivo.write(sobra)
+    return caminho
+
+
+def titulos_gravados(conn, tickets):
+    marcadores = ','.join('?' * len(tickets))
+    return sorted(linha[0] for linha in conn.execute(f'''
+        SELECT o.titulo FROM tickets_ingestao t JOIN ocorrencias o ON o.id = t.ocorrencia_id
+        WHERE t.ticket IN ({marcadores})
+    ''', tickets))
+
+
+def test_regravacao_e_idempotente(app, tmp_path):
+    registros = [registro(f'Diário {i}') for i in range(3)]
+    pasta = str(tmp_path / 'diarios')
+    # Queda no meio da última linha: o pedaço é ignorado
+    caminho = escrever_diario(pasta, 999999, registros, sobra='{"ticket": "abc", "tit')
+
+    with modulo.pool.conexao() as conn:
+        # O primeiro já tinha entrado no banco antes da queda
+        conn.execute('BEGIN IMMEDIATE')
+        gravar_lote(conn, registros[:1])
+        conn.commit()
+        antes = conn.execute('SELECT COUNT(*) FROM ocorrencias').fetchone()[0]
+
+        assert recuperar_diarios(conn, pasta) == 2
+        assert conn.execute('SELECT COUNT(*) FROM ocorrencias').fetchone()[0] == antes + 2
+        assert titulos_gravados(conn, [r['ticket'] for r in registros]) == ['Diário 0', 'Diário 1', 'Diário 2']
+        assert not os.path.exists(caminho)
+
+        # Rodar de novo com o mesmo diário não duplica nada
+        escrever_diario(pasta, 999999, registros)
+        assert recuperar_diarios(conn, pasta) == 0
+
+
+def test_so_recupera_diarios_de_processos_mortos(app, tmp_path):
+    pasta = str(tmp_path / 'diarios')
+    vivo = escrever_diario(pasta, 1, [registro('De processo vivo')])
+    morto = escrever_diario(pasta, 999999, [registro('De processo morto')])
+
+    with modulo.pool.conexao() as conn:
+        assert recuperar_diarios(conn, pasta, somente_orfaos=True) == 1
+    assert os.path.exists(vivo)
+    assert not os.path.exists(morto)
+
+
+@pytest.fixture
+def configuracao():
+    return {'INGESTAO': 'fila'}
+
+
+def test_registro_pela_fila(cliente):
+    resposta = cliente.post('/api/registrar', data={
+        'titulo': 'Pela fila', 'descricao': 'Em lote', 'categoria': 'Limpeza'})
+    assert resposta.status_code == 202
+    ticket = resposta.get_json()['ticket']
+
+    fim = time.monotonic() + 5
+    while (situacao := cliente.get(f'/api/registrar/{ticket}')).status_code == 202:
+        assert time.monotonic() < fim, 'a escritora não gravou o lote'
+        time.sleep(0.02)
+    ocorrencia_id = situacao.get_json()['id']
+
+    assert cliente.get(f'/api/ocorrencia/{ocorrencia_id}').get_json()['ocorrencia']['titulo'] == 'Pela fila'
+    # Tudo confirmado: o diário do processo fica vazio
+    fim = time.monotonic() + 5
+    while any(os.path.getsize(c) for c in segmentos(modulo.fila_ingestao.pasta, os.getpid())):
+        assert time.monotonic() < fim
+        time.sleep(0.02)
+    assert cliente.get('/api/registrar/naoexiste').status_code == 404
+
+
+def test_ticket_desconhecido_da_404(cliente):
+    # Bem formado, mas nunca emitido (ou já fora da retenção)
+    assert cliente.get(f'/api/registrar/{novo_ticket()}').status_code == 404
+
+
+def test_ticket_no_diario_de_outro_worker_esta_na_fila(cliente, app):
+    pendente = registro('Em outro worker')
+    escrever_diario(modulo.fila_ingestao.pasta, 1, [pendente])
+    situacao = cliente.get(f"/api/registrar/{pendente['ticket']}")
+    assert situacao.status_code == 202
+    assert situacao.get_json()['status'] == 'na_fila'
+
+
+def segmentos(pasta, pid):
+    return glob.glob(os.path.join(pasta, f'ingestao-{pid}-*.diario'))
+
+
+def test_diario_apaga_segmentos_confirmados(tmp_path):
+    diario = Diario(str(tmp_path / 'ingestao-1'), tamanho_segmento=1)
+    primeiro = diario.anexar(registro('A'))
+    segundo = diario.anexar(registro('B'))
+
+    # O primeiro segmento passou do tamanho: o próximo registro vai para outro arquivo
+    diario.confirmar([primeiro])
+    terceiro = diario.anexar(registro('C'))
+    assert terceiro != segundo
+    assert len(segmentos(tmp_path, 1)) == 2
+
+    # Sob carga a fila nunca zera, mas cada segmento some quando é todo confirmado
+    diario.confirmar([segundo])
+    restantes = [r['titulo'] for c in sorted(segmentos(tmp_path, 1)) for r in ler_diario(c)]
+    assert restantes == ['C']
+
+    diario.confirmar([terceiro])
+    assert segmentos(tmp_path, 1) == [diario.caminho]
+    assert os.path.getsize(diario.caminho) == 0
+    diario.fechar()
+
+
+def test_fila_cheia_recusa_sem_gravar(app, tmp_path):
+    fila = FilaIngestao(modulo.pool, str(tmp_path / 'diarios'), maximo_fila=1)
+    os.makedirs(fila.pasta)
+    fila._diario = Diario(os.path.join(fila.pasta, 'ingestao-1'))   # sem a escritora
+    fila.enfileirar('Cabe', 'Na fila', 'Outros')
+
+    with pytest.raises(FilaCheia):
+        fila.enfileirar('Não cabe', 'Fila cheia', 'Outros')
+    assert [r['titulo'] for r in ler_diario(fila._diario.caminho)] == ['Cabe']
+    assert fila.metricas()['recusadas'] == 1
+    fila._diario.fechar()
+
+
+def test_registro_que_sempre_falha_vai_para_descartados(app, tmp_path):
+    fila = FilaIngestao(modulo.pool, str(tmp_path / 'diarios'), tentativas=2)
+    os.makedirs(fila.pasta)
+    bom, ruim = registro('Bom'), registro('Ruim')
+    ruim['titulo'] = None   # NOT NULL: falha em toda tentativa
+
+    assert fila._gravar_com_tentativas([bom, ruim]) == 1
+    with modulo.pool.conexao() as conn:
+        assert titulos_gravados(conn, [bom['ticket'], ruim['ticket']]) == ['Bom']
+    descartados = ler_diario(os.path.join(fila.pasta, ARQUIVO_DESCARTADOS))
+    assert [r['ticket'] for r in descartados] == [ruim['ticket']]
+    assert 'NOT NULL' in descartados[0]['erro']
+
+
+def test_fila_cheia_responde_503(cliente, monkeypatch):
+    def recusar(*args):
+        raise FilaCheia()
+    monkeypatch.setattr(modulo.fila_ingestao, 'enfileirar', recusar)
+
+    resposta = cliente.post('/api/registrar', data={
+        'titulo': 'Rajada', 'descricao': 'Em lote', 'categoria': 'Limpeza'})
+    assert resposta.status_code == 503
+    assert resposta.headers['Retry-After']
@@ -0,0 +1,79 @@
+import app as modulo
+from estatisticas import verificar_contadores
+
+from tests.conftest import inserir_ocorrencia
+
+
+def criar(quantidade, status='Pendente'):
+    with modulo.pool.conexao() as conn:
+        ids = [inserir_ocorrencia(conn, status=status) for _ in range(quantidade)]
+        conn.commit()
+    return ids
+
+
+def test_status_em_lote(admin):
+    pendentes = criar(3)
+    resposta = admin.post('/admin/api/ocorrencias/lote',
+                          json={'ids': pendentes + [1, 99999], 'status': 'Resolvido'})
+    assert resposta.status_code == 200
+    corpo = resposta.get_json()
+    resultados = {item['id']: item['resultado'] for item in corpo['resultados']}
+    assert [resultados[i] for i in pendentes] == ['alterada'] * 3
+    # A 1 já estava resolvida no banco distribuído
+    assert resultados[1] == 'sem_alteracao'
+    assert resultados[99999] == 'nao_encontrada'
+    assert corpo['alteradas'] == 3
+
+    with modulo.pool.conexao() as conn:
+        marcadores = ','.join('?' * len(pendentes))
+        assert conn.execute(f"SELECT COUNT(*) FROM ocorrencias WHERE status = 'Resolvido' AND id IN ({marcadores})",
+                            pendentes).fetchone()[0] == 3
+        assert conn.execute(f"SELECT COUNT(*) FROM historico_status WHERE status_novo = 'Resolvido'"
+                            f" AND ocorrencia_id IN ({marcadores})", pendentes).fetchone()[0] == 3
+        assert conn.execute(f"SELECT COUNT(*) FROM eventos WHERE tipo = 'status_alterado'"
+                            f" AND ocorrencia_id IN ({marcadores})", pendentes).fetchone()[0] == 3
+        assert verificar_contadores(conn, corrigir=False) == []
+
+
+def test_resposta_em_lote_tira_de_pendente(admin):
+    pendentes = criar(2)
+    em_andamento = criar(1, status='Em Andamento')
+    corpo = admin.post('/admin/api/ocorrencias/lote',
+                       json={'ids': pendentes + em_andamento, 'mensagem': 'Equipe a caminho'}).get_json()
+    assert corpo['respostas'] == 3
+    status = {item['id']: item['status'] for item in corpo['resultados']}
+    assert status == {i: 'Em Andamento' for i in pendentes + em_andamento}
+
+    with modulo.pool.conexao() as conn:
+        respostas = dict(conn.execute(
+            f"SELECT ocorrencia_id, COUNT(*) FROM respostas WHERE ocorrencia_id IN ({','.join('?' * 3)})"
+            " GROUP BY ocorrencia_id", pendentes + em_andamento).fetchall())
+        assert respostas == {i: 1 for i in pendentes + em_andamento}
+        # Resposta sem status não grava histórico, como /admin/api/responder
+        assert conn.execute(f"SELECT COUNT(*) FROM historico_status WHERE ocorrencia_id IN ({','.join('?' * 2)})",
+                            pendentes).fetchone()[0] == 0
+
+
+def test_lote_invalido(admin):
+    for corpo in ({}, {'ids': []}, {'ids': ['1'], 'status': 'Resolvido'}, {'ids': [True], 'status': 'Resolvido'},
+                  {'ids': [1]}, {'ids': [1], 'status': 'Arquivado'},
+                  {'ids': list(range(1, modulo.LOTE_ADMIN_MAXIMO + 2)), 'status': 'Resolvido'}):
+        assert admin.post('/admin/api/ocorrencias/lote', json=corpo).status_code == 400, corpo
+
+
+def test_falha_no_meio_nao_grava_nada(admin, monkeypatch):
+    pendentes = criar(2)
+
+    def falhar(*_, **__):
+        raise RuntimeError('queda no meio do lote')
+    monkeypatch.setattr(modulo.canal_eventos, 'publicar_lote', falhar)
+
+    resposta = admin.post('/admin/api/ocorrencias/lote',
+                          json={'ids': pendentes, 'status': 'Resolvido', 'mensagem': 'Feito'})
+    assert resposta.status_code == 500
+    with modulo.pool.conexao() as conn:
+        marcadores = ','.join('?' * 2)
+        assert conn.execute(f"SELECT COUNT(*) FROM ocorrencias WHERE status = 'Pendente' AND id IN ({marcadores})",
+                            pendentes).fetchone()[0] == 2
+        assert conn.execute(f'SELECT COUNT(*) FROM respostas WHERE ocorrencia_id IN ({marcadores})',
+                            pendentes).fetchone()[0] == 0
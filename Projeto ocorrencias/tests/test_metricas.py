@@ -0,0 +1,42 @@
+import sqlite3
+
+import pytest
+
+import metricas
+
+
+@pytest.fixture
+def medida():
+    conexao = sqlite3.connect(':memory:', factory=metricas.ConexaoInstrumentada)
+    conexao.execute('CREATE TABLE numeros (n INTEGER)')
+    conexao.executemany('INSERT INTO numeros VALUES (?)', [(n,) for n in range(1000)])
+    yield conexao
+    conexao.close()
+
+
+def observado(sql):
+    """(linhas somadas, consultas) registradas para `sql` em sio_sql_linhas"""
+    serie = metricas.linhas_lidas._series[(metricas.impressao_sql(sql),)]
+    return serie[-2], serie[-1]
+
+
+def test_fetchmany_conta_todos_os_blocos(medida):
+    sql = 'SELECT n FROM numeros WHERE n >= 0 -- fetchmany'
+    cursor = medida.execute(sql)
+    while cursor.fetchmany(300):
+        pass
+    assert observado(sql) == (1000, 1)
+
+
+def test_iteracao_conta_as_linhas(medida):
+    sql = 'SELECT n FROM numeros WHERE n >= 0 -- iteração'
+    assert sum(1 for _ in medida.execute(sql)) == 1000
+    assert observado(sql) == (1000, 1)
+
+
+def test_leitura_parcial_entra_ao_descartar_o_cursor(medida):
+    sql = 'SELECT n FROM numeros WHERE n >= 0 -- parcial'
+    cursor = medida.execute(sql)
+    assert cursor.fetchone() == (0,)
+    del cursor
+    assert observado(sql) == (1, 1)
@@ -0,0 +1,68 @@
+import os
+import sqlite3
+
+import pytest
+
+from migracoes import MIGRACOES, VERSAO_ATUAL, aplicar_migracoes, versao_do_banco
+
+from tests.conftest import BANCO_DISTRIBUIDO, RAIZ, copiar_banco
+
+BANCOS = {
+    'database': BANCO_DISTRIBUIDO,
+    # O antigo da raiz: coluna data_registro a mais, sem historico_status
+    'raiz': os.path.join(RAIZ, 'ocorrencias.db'),
+}
+
+
+@pytest.fixture(params=sorted(BANCOS))
+def banco(request, tmp_path):
+    return copiar_banco(BANCOS[request.param], tmp_path / 'ocorrencias.db')
+
+
+def test_numeracao_sem_buracos():
+    assert [numero for numero, _, _ in MIGRACOES] == list(range(1, VERSAO_ATUAL + 1))
+
+
+def test_leva_os_bancos_distribuidos_ate_a_versao_atual(banco):
+    conn = sqlite3.connect(banco)
+    ocorrencias = conn.execute('SELECT id, titulo, status FROM ocorrencias ORDER BY id').fetchall()
+
+    assert aplicar_migracoes(conn) == list(range(1, VERSAO_ATUAL + 1))
+    assert versao_do_banco(conn) == VERSAO_ATUAL
+    assert conn.execute('PRAGMA integrity_check').fetchone()[0] == 'ok'
+    # Os dados existentes passam intactos
+    assert conn.execute('SELECT id, titulo, status FROM ocorrencias ORDER BY id').fetchall() == ocorrencias
+
+    tabelas = {linha[0] for linha in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {'historico_status', 'contadores', 'busca_fts', 'fila_admin', 'rollup_diario',
+            'sessoes_admin', 'anexos', 'eventos'} <= tabelas
+
+
+def test_segunda_execucao_nao_faz_nada(banco):
+    conn = sqlite3.connect(banco)
+    aplicar_migracoes(conn)
+    assert aplicar_migracoes(conn) == []
+
+
+def test_listagem_usa_o_indice(banco):
+    conn = sqlite3.connect(banco)
+    aplicar_migracoes(conn)
+    plano = ' '.join(linha[3] for linha in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM ocorrencias WHERE status = 'Pendente' ORDER BY data DESC, id DESC LIMIT 20"))
+    assert 'idx_ocorrencias_status_data' in plano
+    assert 'TEMP B-TREE' not in plano
+
+
+def test_falha_desfaz_a_transacao(banco, monkeypatch):
+    import migracoes
+
+    def quebrar(conn):
+        raise RuntimeError('falhou')
+
+    numero, descricao, _ = MIGRACOES[-1]
+    monkeypatch.setattr(migracoes, 'MIGRACOES', MIGRACOES[:-1] + [(numero, descricao, quebrar)])
+    conn = sqlite3.connect(banco)
+    with pytest.raises(RuntimeError):
+        migracoes.aplicar_migracoes(conn)
+    assert versao_do_banco(conn) == 0
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'contadores'").fetchone()[0] == 0
@@ -0,0 +1,74 @@
+import io
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from anexos import sha_do_anexo
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def salvar_imagem(imagem, nome='foto.png'):
+    import app as modulo
+
+    dados = io.BytesIO()
+    imagem.save(dados, 'PNG')
+    dados.seek(0)
+    with modulo.pool.conexao() as conn:
+        caminho = modulo.armazenamento.salvar(conn, FileStorage(dados, filename=nome, content_type='image/png'))
+        conn.commit()
+    return caminho, sha_do_anexo(caminho)
+
+
+def abrir_miniatura(cliente, sha256):
+    resposta = cliente.get(f'/miniaturas/{sha256}/miniatura')
+    assert resposta.status_code == 200
+    assert resposta.mimetype == 'image/webp'
+    return Image.open(io.BytesIO(resposta.get_data()))
+
+
+@pytest.mark.parametrize('imagem', [
+    Image.new('LA', (400, 300), (128, 0)),
+    Image.new('RGBA', (400, 300), (255, 0, 0, 0)),
+], ids=['LA', 'RGBA'])
+def test_canal_alfa_preservado(cliente, imagem):
+    _, sha256 = salvar_imagem(imagem)
+    miniatura = abrir_miniatura(cliente, sha256)
+    assert miniatura.size == (320, 240)
+    assert miniatura.mode == 'RGBA'
+    assert miniatura.getpixel((10, 10))[3] == 0
+
+
+def test_paleta_com_transparencia_preservada(cliente):
+    imagem = Image.new('P', (400, 300), 1)
+    imagem.putpalette([0, 0, 0, 255, 255, 255] + [0] * 762)
+    imagem.info['transparency'] = 1
+    _, sha256 = salvar_imagem(imagem)
+    miniatura = abrir_miniatura(cliente, sha256)
+    assert miniatura.mode == 'RGBA'
+    assert miniatura.getpixel((10, 10))[3] == 0
+
+
+def test_imagem_grande_demais_cai_no_original(cliente, monkeypatch):
+    import app as modulo
+
+    caminho, sha256 = salvar_imagem(Image.new('RGB', (50, 50)))
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 100)
+
+    resposta = cliente.get(f'/miniaturas/{sha256}/previa')
+    assert resposta.status_code == 302
+    assert resposta.headers['Location'].endswith(f'/uploads/{caminho}')
+    with modulo.pool.conexao() as conn:
+        assert conn.execute('SELECT status FROM tarefas_miniaturas WHERE sha256 = ?',
+                            (sha256,)).fetchone()[0] == 'erro'
+
+    # Marcada como falha: os próximos pedidos nem tentam abrir a imagem
+    def nao_chamar(*_):
+        raise AssertionError('gerar() chamado de novo')
+    monkeypatch.setattr(modulo.gerador_miniaturas, 'gerar', nao_chamar)
+    assert cliente.get(f'/miniaturas/{sha256}/miniatura').status_code == 302
+
+
+def test_anexo_desconhecido(cliente):
+    assert cliente.get(f'/miniaturas/{"0" * 64}/miniatura').status_code == 404
+    assert cliente.get('/miniaturas/abc/miniatura').status_code == 404
@@ -0,0 +1,59 @@
+import app as modulo
+
+from tests.conftest import inserir_ocorrencia
+
+
+def percorrer(cliente, consulta=''):
+    ids, cursor = [], ''
+    while True:
+        resposta = cliente.get(f'/api/ocorrencias?limite=7&cursor={cursor}{consulta}')
+        assert resposta.status_code == 200
+        pagina = resposta.get_json()
+        ids.extend(item['id'] for item in pagina['ocorrencias'])
+        cursor = pagina['proximo_cursor']
+        if not cursor:
+            return ids
+
+
+def popular(quantidade=30):
+    with modulo.pool.conexao() as conn:
+        # Várias ocorrências com a mesma data: o id desempata no cursor
+        for i in range(quantidade):
+            inserir_ocorrencia(conn, titulo=f'Ocorrência {i}',
+                               categoria='Limpeza' if i % 3 == 0 else 'Outros',
+                               data=f'2024-05-{1 + i // 4:02d} 10:00:00')
+        conn.commit()
+        return [linha[0] for linha in conn.execute('SELECT id FROM ocorrencias ORDER BY data DESC, id DESC')]
+
+
+def test_paginas_cobrem_tudo_na_ordem(app, cliente):
+    esperado = popular()
+    ids = percorrer(cliente)
+    assert ids == esperado
+    assert len(set(ids)) == len(ids)
+
+
+def test_filtros_no_servidor(app, cliente):
+    popular()
+    with modulo.pool.conexao() as conn:
+        esperado = [linha[0] for linha in conn.execute(
+            "SELECT id FROM ocorrencias WHERE categoria = 'Limpeza' AND data >= '2024-05-02'"
+            " AND data < '2024-05-06' ORDER BY data DESC, id DESC")]
+    assert esperado
+    assert percorrer(cliente, '&categoria=Limpeza&data_inicio=2024-05-02&data_fim=2024-05-05') == esperado
+
+
+def test_insercao_entre_paginas_nao_repete(app, cliente):
+    popular()
+    primeira = cliente.get('/api/ocorrencias?limite=5').get_json()
+    with modulo.pool.conexao() as conn:
+        inserir_ocorrencia(conn, titulo='Nova', data='2030-01-01 00:00:00')
+        conn.commit()
+    segunda = cliente.get(f"/api/ocorrencias?limite=5&cursor={primeira['proximo_cursor']}").get_json()
+    vistos = [o['id'] for o in primeira['ocorrencias'] + segunda['ocorrencias']]
+    assert len(set(vistos)) == 10
+
+
+def test_parametros_invalidos(app, cliente):
+    assert cliente.get('/api/ocorrencias?cursor=lixo').status_code == 400
+    assert cliente.get('/api/ocorrencias?data_inicio=31-12-2024').status_code == 400
@@ -0,0 +1,80 @@
+import app as modulo
+
+from tests.conftest import inserir_ocorrencia
+
+
+def criar(titulo, descricao, anexo=None):
+    with modulo.pool.conexao() as conn:
+        ocorrencia = inserir_ocorrencia(conn, titulo=titulo, descricao=descricao, data='2030-01-01 09:00:00')
+        if anexo:
+            conn.execute('UPDATE ocorrencias SET anexo = ? WHERE id = ?', (anexo, ocorrencia))
+        conn.commit()
+        return ocorrencia
+
+
+def como_objetos(pagina):
+    # O mesmo que paraObjetos() em script.js e no painel
+    return [dict(zip(pagina['campos'], linha)) for linha in pagina['linhas']]
+
+
+def test_formato_colunas_equivale_aos_objetos(app, cliente):
+    criar('Com anexo', 'Foto do problema', anexo='ab/cd/foto.jpg')
+
+    colunas = cliente.get('/api/ocorrencias?limite=5&formato=colunas').get_json()
+    objetos = cliente.get('/api/ocorrencias?limite=5').get_json()
+
+    assert set(colunas) == {'campos', 'linhas', 'proximo_cursor', 'limite'}
+    assert colunas['campos'] == list(modulo.CAMPOS_LISTA)
+    assert all(len(linha) == len(colunas['campos']) for linha in colunas['linhas'])
+    assert como_objetos(colunas) == objetos['ocorrencias']
+    assert colunas['proximo_cursor'] == objetos['proximo_cursor']
+    assert como_objetos(colunas)[0]['anexo'] == '/uploads/ab/cd/foto.jpg'
+
+
+def test_projecao_por_campos_ou_fields(app, cliente):
+    criar('Projetada', 'Só alguns campos')
+
+    for parametro in ('campos', 'fields'):
+        pagina = cliente.get(f'/api/ocorrencias?limite=3&formato=colunas&{parametro}=titulo,id,titulo').get_json()
+        assert pagina['campos'] == ['titulo', 'id']   # na ordem pedida, sem repetir
+        assert pagina['linhas'][0][0] == 'Projetada'
+
+    objetos = cliente.get('/api/ocorrencias?limite=3&fields=id,status').get_json()['ocorrencias']
+    assert all(set(item) == {'id', 'status'} for item in objetos)
+
+
+def test_campo_ou_formato_desconhecido_da_400(app, cliente, admin):
+    for url in ('/api/ocorrencias?fields=id,senha', '/api/ocorrencias?campos=id;DROP',
+                '/admin/api/ocorrencias?fields=id,senha', '/api/ocorrencias?formato=xml',
+                '/api/ocorrencias?descricao_max=-1'):
+        resposta = (admin if url.startswith('/admin') else cliente).get(url)
+        assert resposta.status_code == 400, url
+        assert 'erro' in resposta.get_json()
+
+
+def test_descricao_truncada_no_servidor(app, cliente):
+    longa = 'x' * 500
+    criar('Curta', 'Poucas palavras')
+    criar('Longa', longa)
+
+    pagina = cliente.get('/api/ocorrencias?limite=2&formato=colunas&campos=titulo,descricao&descricao_max=300')
+    descricoes = dict(pagina.get_json()['linhas'])
+    assert descricoes['Longa'] == 'x' * 300 + '…'
+    assert descricoes['Curta'] == 'Poucas palavras'
+
+    inteira = cliente.get('/api/ocorrencias?limite=2&formato=colunas&campos=titulo,descricao').get_json()
+    assert dict(inteira['linhas'])['Longa'] == longa
+
+
+def test_lista_do_painel_em_colunas(app, admin):
+    ocorrencia = criar('No painel', 'y' * 400)
+    with modulo.pool.conexao() as conn:
+        conn.execute("INSERT INTO respostas (ocorrencia_id, administrador_id, mensagem) VALUES (?, 1, 'Visto')",
+                     (ocorrencia,))
+        conn.commit()
+
+    pagina = admin.get('/admin/api/ocorrencias?formato=colunas&descricao_max=300&limite=50').get_json()
+    assert pagina['campos'] == list(modulo.CAMPOS_ADMIN)
+    item = next(item for item in como_objetos(pagina) if item['id'] == ocorrencia)
+    assert item['resposta_count'] == 1
+    assert item['descricao'] == 'y' * 300 + '…'
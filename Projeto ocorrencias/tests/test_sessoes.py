@@ -0,0 +1,79 @@
+import pytest
+
+from sessoes import LimitadorTentativas
+
+
+def entrar(cliente, senha='admin123', ip='10.0.0.1'):
+    return cliente.post('/admin/login', json={'usuario': 'admin', 'senha': senha},
+                        environ_base={'REMOTE_ADDR': ip})
+
+
+def test_limitador_por_chave_e_capacidade_propria():
+    limitador = LimitadorTentativas(capacidade=2, reposicao=60)
+    assert limitador.consumir('a') == 0
+    assert limitador.consumir('a') == 0
+    assert limitador.consumir('a') > 0
+    assert limitador.consumir('b') == 0
+    # Balde maior para a chave do IP; a tentativa negada não gasta ficha de nenhuma chave
+    assert all(limitador.consumir(('ip', 3), f'u{i}') == 0 for i in range(3))
+    assert limitador.consumir(('ip', 3), 'u9') > 0
+    assert limitador.consumir('u9') == 0
+
+
+@pytest.fixture
+def configuracao():
+    return {'LOGIN_TENTATIVAS': 3, 'LOGIN_TENTATIVAS_IP': 10}
+
+
+def test_erros_de_outro_ip_nao_bloqueiam_o_administrador(cliente):
+    for _ in range(3):
+        assert entrar(cliente, senha='errada', ip='203.0.113.9').status_code == 401
+    bloqueado = entrar(cliente, senha='errada', ip='203.0.113.9')
+    assert bloqueado.status_code == 429
+    assert int(bloqueado.headers['Retry-After']) > 0
+
+    assert entrar(cliente, ip='10.0.0.1').status_code == 200
+
+
+def test_limite_por_ip_vale_para_qualquer_usuario(cliente):
+    for i in range(10):
+        resposta = cliente.post('/admin/login', json={'usuario': f'u{i}', 'senha': 'x'},
+                                environ_base={'REMOTE_ADDR': '198.51.100.7'})
+        assert resposta.status_code == 401
+    assert entrar(cliente, ip='198.51.100.7').status_code == 429
+
+
+def test_login_refaz_hash_com_outros_parametros(app, cliente):
+    import app as modulo
+
+    with modulo.pool.conexao() as conn:
+        antes = conn.execute("SELECT senha_hash FROM administradores WHERE usuario = 'admin'").fetchone()[0]
+    assert antes.startswith('scrypt:')
+
+    assert entrar(cliente).status_code == 200
+    with modulo.pool.conexao() as conn:
+        depois = conn.execute("SELECT senha_hash FROM administradores WHERE usuario = 'admin'").fetchone()[0]
+    assert depois.startswith('pbkdf2:sha256:1000$')
+    # O hash novo continua aceitando a mesma senha
+    cliente.get('/admin/logout')
+    assert entrar(cliente).status_code == 200
+
+
+def test_sessao_revogada_deixa_de_valer(app):
+    primeiro, segundo = app.test_client(), app.test_client()
+    assert entrar(primeiro).status_code == 200
+    assert entrar(segundo).status_code == 200
+
+    sessoes = primeiro.get('/admin/api/sessoes').get_json()['sessoes']
+    assert len(sessoes) == 2
+    outra = next(s for s in sessoes if not s['atual'])
+    assert primeiro.delete(f"/admin/api/sessoes/{outra['id']}").status_code == 200
+
+    assert segundo.get('/admin/api/sessoes').status_code in (302, 401)
+    assert primeiro.get('/admin/api/sessoes').status_code == 200
+
+
+def test_logout_revoga_a_sessao(admin):
+    assert admin.get('/admin/api/sessoes').status_code == 200
+    admin.get('/admin/logout')
+    assert admin.get('/admin/api/sessoes').status_code in (302, 401)